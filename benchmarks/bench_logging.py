@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the logging overhead of an agent cycle
+Runs full cycles (main.run_once) on a fake database against a local stand-in
+collector with logging off, then with each output mode writing to a file, and
+reports the cycle time each mode adds on the collection thread. The slow-sink
+modes add --sink-latency-ms to every write, as a stalled disk or a remote
+syslog would, to show what the queue listener keeps off that thread.
+
+Also times the push payload's debug line with DEBUG off, formatted eagerly
+(an f-string) and lazily (%s arguments).
+
+Usage: python3 benchmarks/bench_logging.py [--cycles N] [--level INFO]
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+# Add package to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pulse_agent_complete.standin_server import StandinCollector
+
+# (name, log format, through the queue listener, slow sink); None is logging off
+MODES = (
+    ("off", None, False, False),
+    ("text", "text", False, False),
+    ("text+queue", "text", True, False),
+    ("json+queue", "json", True, False),
+    ("text/slow", "text", False, True),
+    ("text+queue/slow", "text", True, True)
+)
+
+
+class RecordCounter(logging.Filter):
+    """Counts records reaching a handler"""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def filter(self, record):
+        self.count += 1
+        return True
+
+
+def run_mode(sites, dispatcher, log_file: Path, log_format, use_queue: bool, slow: bool,
+             args: argparse.Namespace) -> dict:
+    """Time --cycles cycles under one logging mode"""
+    from pulse_agent_complete.logging_setup import configure_logging, shutdown_logging
+    from pulse_agent_complete.main import run_once
+
+    counter = RecordCounter()
+    if log_format is None:
+        logging.disable(logging.CRITICAL)
+    else:
+        logging.disable(logging.NOTSET)
+        configure_logging(args.level, log_format, str(log_file), rate_limit=10, use_queue=use_queue)
+        # Only the file is measured; stderr output would dominate
+        root = logging.getLogger()
+        for handler in root.handlers:
+            handler.addFilter(counter)
+        for handler in _listener_handlers() if use_queue else root.handlers:
+            if isinstance(handler, logging.FileHandler):
+                if slow:
+                    handler.addFilter(lambda record: time.sleep(args.sink_latency_ms / 1000) or True)
+            elif isinstance(handler, logging.StreamHandler):
+                handler.setLevel(logging.CRITICAL + 1)
+
+    for _ in range(args.warmup):
+        run_once(sites, dispatcher, 1)
+    counter.count = 0
+
+    cycle_ms = []
+    for _ in range(args.cycles):
+        start = time.perf_counter()
+        run_once(sites, dispatcher, 1)
+        cycle_ms.append((time.perf_counter() - start) * 1000)
+
+    drain_start = time.perf_counter()
+    shutdown_logging()
+    drain_ms = (time.perf_counter() - drain_start) * 1000
+
+    return {
+        "cycle_p50_ms": round(statistics.median(cycle_ms), 3),
+        "cycle_mean_ms": round(statistics.mean(cycle_ms), 3),
+        "records_per_cycle": round(counter.count / args.cycles, 1),
+        "queue_drain_ms": round(drain_ms, 2) if use_queue else None,
+        "file_bytes": log_file.stat().st_size if log_file.exists() else 0
+    }
+
+
+def _listener_handlers() -> list:
+    """Output handlers of the running queue listener"""
+    from pulse_agent_complete import logging_setup
+    return list(logging_setup._listener.handlers) if logging_setup._listener else []
+
+
+def time_payload_debug_line(containers: int, number: int) -> dict:
+    """Cost per call of the payload debug line with DEBUG off"""
+    from bench_serializers import build_payload
+
+    logger = logging.getLogger("bench.payload")
+    logger.setLevel(logging.INFO)
+    payload = build_payload(containers)
+    eager = timeit.timeit(lambda: logger.debug(f"Request payload: {payload}"), number=number)
+    lazy = timeit.timeit(lambda: logger.debug("Request payload: %s", payload), number=number)
+    return {
+        "containers": containers,
+        "eager_us": round(eager / number * 1e6, 2),
+        "lazy_us": round(lazy / number * 1e6, 3)
+    }
+
+
+def main() -> int:
+    """Run every mode and print the overhead against logging off"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=200, help="timed cycles per mode")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed cycles before each mode")
+    parser.add_argument("--queries", type=int, default=20, help="queries per cycle")
+    parser.add_argument("--level", default="INFO", help="log level while logging is on")
+    parser.add_argument("--sink-latency-ms", type=float, default=0.5, help="added to each write in slow-sink modes")
+    parser.add_argument("--containers", type=int, default=1000, help="containers in the debug-line payload")
+    args = parser.parse_args()
+    args.sites = 1
+
+    from load_push import configure_agent
+
+    with StandinCollector() as collector, tempfile.TemporaryDirectory() as data_dir:
+        data_dir = Path(data_dir)
+        configure_agent(collector, data_dir, args)
+
+        from fakes import FakeDatabaseClient, FakeDriver
+        from pulse_agent_complete.aggregator import DEFAULT_SOURCE
+        from pulse_agent_complete.main import build_dispatcher
+        from pulse_agent_complete.sites import get_sites
+
+        driver = FakeDriver(latency_ms=0, connect_ms=0)
+        sites = get_sites()
+        for site in sites:
+            site.build_db_clients = lambda sources=None: {DEFAULT_SOURCE: FakeDatabaseClient(driver)}
+        dispatcher = build_dispatcher(pool_size=1)
+
+        results = {}
+        for name, log_format, use_queue, slow in MODES:
+            results[name] = run_mode(sites, dispatcher, data_dir / f"{name.replace('/', '-')}.log",
+                                     log_format, use_queue, slow, args)
+    logging.disable(logging.CRITICAL)
+
+    baseline = results["off"]["cycle_p50_ms"]
+    print(f"{'mode':<16} {'p50_ms':>8} {'overhead_ms':>12} {'records':>8} {'drain_ms':>9} {'bytes':>9}")
+    for name, metrics in results.items():
+        drain = metrics["queue_drain_ms"]
+        print(f"{name:<16} {metrics['cycle_p50_ms']:>8.3f} {metrics['cycle_p50_ms'] - baseline:>12.3f} "
+              f"{metrics['records_per_cycle']:>8} {drain if drain is not None else '-':>9} "
+              f"{metrics['file_bytes']:>9}")
+
+    line = time_payload_debug_line(args.containers, number=20)
+    print(f"payload debug line with DEBUG off ({line['containers']} containers): "
+          f"eager {line['eager_us']} us, lazy {line['lazy_us']} us per push")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
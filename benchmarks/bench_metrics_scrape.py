@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the local metrics endpoint
+Builds payloads with DataAggregator on offline fakes, renders them into a
+MetricsCache once per cycle, and scrapes the MetricsServer over a keep-alive
+connection - while idle, while the cache keeps re-rendering and while full
+cycles keep running - reporting render time per cycle and scrape p50/p99
+
+While a cycle runs, a scrape waits for the GIL behind the cycle's thread, so
+the p99 during cycles is bounded by the interpreter's switch interval
+(sys.getswitchinterval()) rather than by the render or by how often scrapes
+arrive.
+
+Scrapes must not reach the backends: the fake driver's statement count and
+the fake Docker daemon's list calls are checked to be unchanged by scraping.
+
+Usage: python3 benchmarks/bench_metrics_scrape.py [--containers 1000] [--scrapes 2000]
+"""
+
+import argparse
+import gzip
+import http.client
+import json
+import logging
+import math
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from fakes import FakeDatabaseClient, FakeDockerClient, FakeDriver, FakeSystemClient
+
+from pulse_agent_complete.aggregator import DataAggregator
+from pulse_agent_complete.db_client import QueryLoader
+from pulse_agent_complete.metrics_server import MetricsCache, MetricsServer
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Nearest-rank percentile of samples"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def write_queries_file(directory: Path, query_count: int) -> Path:
+    """Write a queries.json with count queries plus host metrics"""
+    queries = {f"metric_{i}_current": {"sql": f"SELECT COUNT(*) as count FROM table_{i}", "type": "count"}
+               for i in range(query_count)}
+    queries["docker_metrics"] = {"type": "docker"}
+    queries["system_metrics"] = {"type": "system"}
+    queries_file = directory / "queries.json"
+    queries_file.write_text(json.dumps({"queries": queries, "aggregation_order": list(queries)}))
+    return queries_file
+
+
+class CountingDockerClient(FakeDockerClient):
+    """FakeDockerClient counting calls that reach the daemon"""
+
+    def __init__(self, container_count: int):
+        super().__init__(container_count)
+        self.calls = 0
+
+    def get_detailed_metrics(self):
+        self.calls += 1
+        return super().get_detailed_metrics()
+
+
+def scrape(connection: http.client.HTTPConnection, gzipped: bool) -> float:
+    """Scrape once, returning the latency in microseconds"""
+    headers = {"Accept-Encoding": "gzip"} if gzipped else {}
+    start = time.perf_counter()
+    connection.request("GET", "/metrics", headers=headers)
+    response = connection.getresponse()
+    body = response.read()
+    elapsed = (time.perf_counter() - start) * 1e6
+    if response.status != 200 or not (gzip.decompress(body) if gzipped else body).endswith(b"# EOF\n"):
+        raise RuntimeError(f"Bad scrape: {response.status}")
+    return elapsed
+
+
+def scrape_many(server: MetricsServer, count: int, gzipped: bool) -> list:
+    """Scrape count times over one keep-alive connection"""
+    connection = http.client.HTTPConnection(server.host, server.port)
+    try:
+        return [scrape(connection, gzipped) for _ in range(count)]
+    finally:
+        connection.close()
+
+
+def summarize(latencies: list) -> str:
+    """p50/p99 of scrape latencies"""
+    return f"p50 {percentile(latencies, 0.50):7.0f} us  p99 {percentile(latencies, 0.99):7.0f} us"
+
+
+def main() -> int:
+    """Render, scrape and check that scrapes never reached the backends"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--containers", type=int, default=1000, help="fake Docker containers")
+    parser.add_argument("--queries", type=int, default=50, help="count queries per cycle")
+    parser.add_argument("--cycles", type=int, default=10, help="cycles rendered into the cache")
+    parser.add_argument("--scrapes", type=int, default=2000, help="scrapes per measurement")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        query_loader = QueryLoader(write_queries_file(Path(directory), args.queries))
+    driver = FakeDriver(latency_ms=0, connect_ms=0)
+    docker_client = CountingDockerClient(args.containers)
+    system_client = FakeSystemClient()
+    # No CPU sampling interval; the benchmark is about rendering and scraping
+    system_client.psutil.cpu_percent = lambda interval=None: 12.5
+
+    cache = MetricsCache("bench")
+
+    def collect(batch_index: int) -> dict:
+        aggregator = DataAggregator(FakeDatabaseClient(driver), query_loader, docker_client, system_client)
+        return {"batch_index": batch_index, "additional": {},
+                "stats": aggregator.fetch_stats("2026-02-10T12:00:00.000Z", "2026-02-10T12:01:00.000Z",
+                                                "client", "site")["stats"]}
+
+    def render(payload: dict):
+        cache.update("site", payload, {"collect_ms": 12, "push_ms": 30}, time.time(), True)
+        return cache.render_ms
+
+    def cycle(batch_index: int):
+        return render(collect(batch_index))
+
+    render_ms = [cycle(index) for index in range(1, args.cycles + 1)]
+    body = cache.body()
+    print(f"exposition: {len(body)} bytes, {len(cache.body(gzipped=True))} gzipped, "
+          f"{len(body.splitlines())} lines")
+    print(f"render per cycle: p50 {percentile(render_ms, 0.50):.2f} ms  max {max(render_ms):.2f} ms")
+
+    with MetricsServer(cache, port=0) as server:
+        statements, docker_calls = driver.statements, docker_client.calls
+        idle = scrape_many(server, args.scrapes, gzipped=False)
+        idle_gzip = scrape_many(server, args.scrapes, gzipped=True)
+        scrape_problems = []
+        if (driver.statements, docker_client.calls) != (statements, docker_calls):
+            scrape_problems.append("scrapes reached the database or Docker")
+
+        def while_running(work) -> list:
+            """Scrape while another thread keeps calling work"""
+            stop = threading.Event()
+
+            def keep_working():
+                index = args.cycles
+                while not stop.is_set():
+                    index += 1
+                    work(index)
+
+            worker = threading.Thread(target=keep_working, daemon=True)
+            worker.start()
+            try:
+                return scrape_many(server, args.scrapes, gzipped=True)
+            finally:
+                stop.set()
+                worker.join()
+
+        payload = collect(args.cycles)
+        rendering = while_running(lambda index: render(payload))
+        busy = while_running(cycle)
+
+    print(f"scrape idle            {summarize(idle)}")
+    print(f"scrape idle, gzip      {summarize(idle_gzip)}")
+    print(f"scrape during renders  {summarize(rendering)}")
+    print(f"scrape during cycles   {summarize(busy)}")
+    print(f"(GIL switch interval {sys.getswitchinterval() * 1e3:.0f} ms bounds the p99 while another thread runs)")
+    for problem in scrape_problems:
+        print(f"PROBLEM {problem}")
+    if scrape_problems:
+        return 1
+    print("OK: scrapes served from the cache without touching the backends")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
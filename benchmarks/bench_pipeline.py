@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the collection pipeline on offline fakes
+Runs DataAggregator.fetch_stats against a fake DB-API driver, Docker daemon and
+psutil at 10, 100 and 1,000 containers with 20 and 200 queries, and reports
+p50/p99 cycle latency, peak traced allocations and peak RSS per scenario
+
+Each scenario runs in its own process so peak RSS is not shared. Results are
+compared with a stored baseline and the exit code is 1 on a regression.
+
+Usage: python3 benchmarks/bench_pipeline.py [--cycles N] [--update-baseline]
+"""
+
+import argparse
+import json
+import logging
+import math
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from fakes import FakeDatabaseClient, FakeDockerClient, FakeDriver, FakeSystemClient
+
+from pulse_agent_complete.aggregator import DataAggregator
+from pulse_agent_complete.db_client import QueryLoader
+
+CONTAINER_COUNTS = (10, 100, 1000)
+QUERY_COUNTS = (20, 200)
+BASELINE_FILE = Path(__file__).parent / "pipeline_baseline.json"
+
+# Metrics checked against the baseline; lower is better for all of them
+COMPARED_METRICS = ("p50_ms", "p99_ms", "alloc_peak_kb", "peak_rss_kb")
+
+
+def write_queries_file(directory: Path, query_count: int) -> Path:
+    """Write a queries.json with query_count count queries plus host metrics"""
+    queries = {
+        f"metric_{i}_current": {
+            "sql": f"SELECT COUNT(*) as count FROM table_{i % 12} "
+                   f"WHERE updated_at >= %(start_time)s AND updated_at < %(end_time)s",
+            "type": "count",
+            "default": 0
+        }
+        for i in range(query_count)
+    }
+    queries["docker_metrics"] = {"type": "docker"}
+    queries["system_metrics"] = {"type": "system"}
+
+    queries_file = directory / "queries.json"
+    queries_file.write_text(json.dumps({
+        "timeout_ms": 30000,
+        "queries": queries,
+        "aggregation_order": list(queries)
+    }))
+    return queries_file
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Nearest-rank percentile of samples"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of this process in KiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_scenario(container_count: int, query_count: int, args: argparse.Namespace) -> dict:
+    """Measure one scenario in this process"""
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        query_loader = QueryLoader(write_queries_file(Path(directory), query_count))
+    driver = FakeDriver(args.db_latency_ms, args.rows, args.connect_ms)
+    docker_client = FakeDockerClient(container_count)
+    system_client = FakeSystemClient(args.processes, args.mounts)
+
+    def cycle():
+        aggregator = DataAggregator(FakeDatabaseClient(driver), query_loader, docker_client,
+                                    system_client, snapshot=args.execution == "snapshot")
+        return aggregator.fetch_stats("2026-02-10T12:00:00.000Z", "2026-02-10T12:01:00.000Z",
+                                      "client", "site")
+
+    for _ in range(args.warmup):
+        cycle()
+
+    latencies = []
+    for _ in range(args.cycles):
+        start = time.perf_counter()
+        cycle()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    # Allocations are traced in a separate cycle, as tracing slows it down
+    tracemalloc.start()
+    baseline_bytes = tracemalloc.get_traced_memory()[0]
+    cycle()
+    alloc_peak = tracemalloc.get_traced_memory()[1] - baseline_bytes
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "alloc_peak_kb": alloc_peak // 1024,
+        "peak_rss_kb": peak_rss_kb(),
+        "statements_per_cycle": driver.statements // (args.warmup + args.cycles + 1)
+    }
+
+
+def scenario_name(container_count: int, query_count: int) -> str:
+    """Name of a scenario in the results and the baseline"""
+    return f"containers={container_count} queries={query_count}"
+
+
+def settings(args: argparse.Namespace) -> dict:
+    """Settings a baseline is only comparable under"""
+    return {key: getattr(args, key) for key in
+            ("cycles", "db_latency_ms", "connect_ms", "rows", "processes", "mounts", "execution")}
+
+
+def run_isolated(container_count: int, query_count: int, args: argparse.Namespace) -> dict:
+    """Run one scenario in a child process and return its results"""
+    command = [sys.executable, __file__, "--scenario", f"{container_count},{query_count}"]
+    for key, value in settings(args).items():
+        command += [f"--{key.replace('_', '-')}", str(value)]
+    command += ["--warmup", str(args.warmup)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of results against the baseline, as messages"""
+    regressions = []
+    for name, metrics in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        for metric in COMPARED_METRICS:
+            limit = expected[metric] * (1 + tolerance)
+            if metrics[metric] > limit:
+                regressions.append(f"{name}: {metric} {metrics[metric]} > {expected[metric]} "
+                                   f"(+{tolerance:.0%} allowed)")
+    return regressions
+
+
+def main() -> int:
+    """Run all scenarios, print a results table and check the baseline"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=30, help="timed cycles per scenario")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed cycles before measuring")
+    parser.add_argument("--db-latency-ms", type=float, default=0.2, help="latency of each fake query")
+    parser.add_argument("--connect-ms", type=float, default=1.0, help="latency of each fake connect")
+    parser.add_argument("--rows", type=int, default=1, help="rows returned by each fake query")
+    parser.add_argument("--processes", type=int, default=300, help="fake host processes")
+    parser.add_argument("--mounts", type=int, default=8, help="fake host mounts")
+    parser.add_argument("--execution", choices=("sequential", "snapshot"), default="sequential",
+                        help="query execution mode (PA_QUERY_EXECUTION)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed increase over the baseline before failing")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        container_count, query_count = (int(value) for value in args.scenario.split(","))
+        print(json.dumps(run_scenario(container_count, query_count, args)))
+        return 0
+
+    results = {}
+    print(f"{'containers':>10} {'queries':>8} {'p50_ms':>8} {'p99_ms':>8} "
+          f"{'alloc_kb':>9} {'rss_kb':>8} {'stmts':>6}")
+    for container_count in CONTAINER_COUNTS:
+        for query_count in QUERY_COUNTS:
+            metrics = run_isolated(container_count, query_count, args)
+            results[scenario_name(container_count, query_count)] = metrics
+            print(f"{container_count:>10} {query_count:>8} {metrics['p50_ms']:>8.2f} "
+                  f"{metrics['p99_ms']:>8.2f} {metrics['alloc_peak_kb']:>9} "
+                  f"{metrics['peak_rss_kb']:>8} {metrics['statements_per_cycle']:>6}")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps({"settings": settings(args), "scenarios": results}, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline} - run with --update-baseline to create one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("settings") != settings(args):
+        print("Baseline was recorded with different settings - not compared")
+        return 0
+
+    regressions = compare(results, baseline["scenarios"], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        return 1
+    print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
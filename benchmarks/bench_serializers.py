@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for push payload serializers
+Compares encode time and encoded size for 10, 100 and 1,000 containers
+
+Usage: python3 benchmarks/bench_serializers.py [--repeat N]
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+# Add package to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pulse_agent_complete.serializers import (
+    ColumnarSerializer, JsonSerializer, OrjsonSerializer, orjson_available
+)
+
+CONTAINER_COUNTS = (10, 100, 1000)
+
+
+def build_payload(container_count: int, disk_count: int = 8) -> dict:
+    """Build a representative push payload"""
+    containers = []
+    for i in range(container_count):
+        container = {
+            "name": f"service-{i}",
+            "image": f"registry.local/app/service-{i % 20}:1.{i % 7}.0",
+            "state": "running" if i % 10 else "exited",
+            "status": "running" if i % 10 else "exited"
+        }
+        if i % 3 == 0:
+            container["health"] = "healthy"
+        containers.append(container)
+
+    disks = [
+        {
+            "device": f"/dev/sd{chr(97 + i)}1",
+            "mountpoint": "/" if i == 0 else f"/mnt/data{i}",
+            "fstype": "ext4",
+            "total_bytes": 500107862016,
+            "used_bytes": 123456789012 + i,
+            "free_bytes": 376651072004 - i,
+            "usage_percent": 24.69
+        }
+        for i in range(disk_count)
+    ]
+
+    stats = {
+        "status": "success",
+        "start_time": "2026-02-10T12:00:00.000Z",
+        "end_time": "2026-02-10T12:01:00.000Z",
+        "images_pending_current": 12,
+        "images_processed_current": 48211,
+        "tasks_pending_current": 3,
+        "system_metrics": {
+            "system": {"hostname": "edge-01", "cpu_count": 8, "load_average_1min": 0.42,
+                       "uptime_seconds": 864000, "os_version": "Ubuntu 22.04"},
+            "memory": {"total_bytes": 16777216000, "used_bytes": 8388608000, "usage_percent": 50.0},
+            "disks": disks,
+            "services": {"total_services": 180, "running_services": 60, "failed_services": 0}
+        },
+        "docker_metrics": {
+            "system": {"daemon_status": "running", "version": "24.0.7",
+                       "containers": {"total": container_count, "running": container_count, "stopped": 0}},
+            "summary": {"total_containers": container_count, "running_containers": container_count,
+                        "healthy_containers": container_count // 3},
+            "containers": containers
+        }
+    }
+
+    return {
+        "client_id": "client",
+        "site_id": "site",
+        "batch_index": 1,
+        "uuid": "00000000-0000-0000-0000-000000000000",
+        "stats": stats,
+        "additional": {}
+    }
+
+
+def get_serializers() -> list:
+    """Serializers to compare (orjson variants only when installed)"""
+    serializers = [("json", JsonSerializer()), ("columnar(json)", ColumnarSerializer(JsonSerializer()))]
+    if orjson_available():
+        serializers.append(("orjson", OrjsonSerializer()))
+        serializers.append(("columnar(orjson)", ColumnarSerializer(OrjsonSerializer())))
+    return serializers
+
+
+def main() -> int:
+    """Run the benchmark and print a results table"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    if not orjson_available():
+        print("orjson not installed - only stdlib json variants are measured")
+
+    print(f"{'containers':>10}  {'serializer':<18} {'encode_us':>10} {'bytes':>10} {'vs json':>8}")
+    for count in CONTAINER_COUNTS:
+        payload = build_payload(count)
+        baseline_bytes = None
+        for name, serializer in get_serializers():
+            number = max(1, 2000 // count)
+            best = min(timeit.repeat(lambda: serializer.encode(payload),
+                                     number=number, repeat=args.repeat)) / number
+            size = len(serializer.encode(payload))
+            if baseline_bytes is None:
+                baseline_bytes = size
+            print(f"{count:>10}  {name:<18} {best * 1e6:>10.1f} {size:>10} "
+                  f"{size / baseline_bytes:>7.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Bulk push check
+Runs one multi-site cycle against a local stand-in collector that rejects some
+sites' items, and verifies that only the rejected sites keep their payloads
+for retry while the others advance
+
+Usage: python3 benchmarks/check_bulk_push.py [--sites N]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add package to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pulse_agent_complete.standin_server import StandinCollector
+
+
+def main() -> int:
+    """Run the check"""
+    parser = argparse.ArgumentParser(description="Bulk push check")
+    parser.add_argument("--sites", type=int, default=6)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    rejected = {f"site-{i}" for i in range(0, args.sites, 3)}
+    collector = StandinCollector(ack_filter=lambda item: item.get("site_id") not in rejected)
+
+    with collector, tempfile.TemporaryDirectory() as data_dir:
+        sites_file = Path(data_dir) / "sites.json"
+        sites_file.write_text(json.dumps([
+            {"name": f"site-{i}", "client_id": "client", "site_id": f"site-{i}"}
+            for i in range(args.sites)
+        ]))
+
+        # Config is read at import time, so configure before importing the agent
+        os.environ.update({
+            "PA_DATA_DIR": data_dir,
+            "PA_SITES_FILE": str(sites_file),
+            "PA_PUSH_URL": collector.url,
+            "PA_BULK_PUSH_URL": collector.bulk_url,
+            "PA_BULK_PUSH": "true",
+            "PA_BULK_MAX_ITEMS": "4"
+        })
+        from pulse_agent_complete.config import Config
+        from pulse_agent_complete.main import run_sites_bulk, build_dispatcher
+        from pulse_agent_complete.sites import get_sites
+        from pulse_agent_complete.state_manager import StateManager
+
+        sites = get_sites()
+        run_sites_bulk(sites, build_dispatcher(pool_size=4), 4)
+
+        expected_requests = -(-args.sites // Config.BULK_MAX_ITEMS)
+        failures = []
+        if len(collector.requests) != expected_requests:
+            failures.append(f"expected {expected_requests} bulk requests, got {len(collector.requests)}")
+
+        for site in sites:
+            state = StateManager(site.data_filepath).read_state()
+            if site.site_id in rejected:
+                ok = state.get("batch_index", 0) == 0
+            else:
+                ok = state.get("batch_index") == 1
+            print(f"{site.name:<10} {'rejected' if site.site_id in rejected else 'acked':<9} "
+                  f"batch_index={state.get('batch_index', 0)} {'OK' if ok else 'FAIL'}")
+            if not ok:
+                failures.append(site.name)
+
+    if failures:
+        print(f"FAILED: {', '.join(failures)}")
+        return 1
+    print(f"OK: {len(collector.requests)} bulk request(s) for {args.sites} sites")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
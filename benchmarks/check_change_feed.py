@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Check of the PostgreSQL change feed against a local database
+Creates image_manager_image and job_manager_task in a scratch schema,
+installs the triggers from queries.json's change_feed section, and runs
+concurrent writers (batched inserts, state changes, soft deletes, deletes,
+multi-statement and rolled-back transactions, a TRUNCATE) while a ChangeFeed
+reconciles every --reconcile seconds. Then checks that:
+
+  - the feed's counts equal every feed query's SQL, without a reconcile
+  - reconciles found no drift while the listener stayed connected
+  - after the listener's backend is terminated, changes made meanwhile are
+    corrected by the reconcile on reconnect
+  - DataAggregator answers the feed queries from the feed and sends only
+    the remaining statements to the database
+
+and reports the notification latency and the cost of a feed lookup against
+the COUNT(*) queries it replaces. The schema is dropped at the end.
+
+Needs psycopg2 and a PostgreSQL 11+ database the PA_DB_* user may create a
+schema in (e.g. PA_DB_HOST=localhost PA_DB_NAME=postgres PA_DB_USER=postgres).
+
+Usage: python3 benchmarks/check_change_feed.py [--rows 50000] [--writers 4]
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+from fakes import FakeDatabaseClient, FakeDriver
+
+from pulse_agent_complete.aggregator import DataAggregator
+from pulse_agent_complete.change_feed import ChangeFeed, connect, install_sql
+from pulse_agent_complete.config import Config
+from pulse_agent_complete.db_client import QueryLoader
+
+REPO_QUERIES = Path(__file__).parent.parent / "queries.json"
+
+SCHEMA_DDL = """
+CREATE TABLE image_manager_image (
+    id bigserial PRIMARY KEY,
+    state text,
+    "patientID" text,
+    created_at timestamp NOT NULL DEFAULT now(),
+    updated_at timestamp NOT NULL DEFAULT now()
+);
+CREATE TABLE job_manager_task (
+    id bigserial PRIMARY KEY,
+    status integer,
+    soft_delete boolean NOT NULL DEFAULT false
+);
+"""
+
+IMAGE_STATES = ("PENDING", "PROCESSED", "FAILED")
+TASK_STATUSES = (0, 1, 2, 3)
+
+
+def seed(cursor, rows: int):
+    """Insert rows into both tables in every state"""
+    cursor.execute("INSERT INTO image_manager_image (state, \"patientID\") "
+                   "SELECT (ARRAY['PENDING','PROCESSED','FAILED'])[1 + i %% 3], 'p' || (i %% 1000) "
+                   "FROM generate_series(1, %s) AS i", (rows,))
+    cursor.execute("INSERT INTO job_manager_task (status, soft_delete) "
+                   "SELECT i %% 4, i %% 10 = 0 FROM generate_series(1, %s) AS i", (rows,))
+
+
+def random_change(cursor, rng: random.Random, rows: int):
+    """One random write statement on one of the tables"""
+    low = rng.randint(1, rows)
+    high = low + rng.randint(0, 50)
+    choice = rng.random()
+    if choice < 0.25:
+        cursor.execute("INSERT INTO image_manager_image (state) SELECT %s FROM generate_series(1, %s)",
+                       (rng.choice(IMAGE_STATES), rng.randint(1, 20)))
+    elif choice < 0.45:
+        cursor.execute("UPDATE image_manager_image SET state = %s, updated_at = now() "
+                       "WHERE id BETWEEN %s AND %s", (rng.choice(IMAGE_STATES), low, high))
+    elif choice < 0.55:
+        cursor.execute("UPDATE image_manager_image SET \"patientID\" = 'x' WHERE id BETWEEN %s AND %s",
+                       (low, high))
+    elif choice < 0.65:
+        cursor.execute("INSERT INTO job_manager_task (status) SELECT %s FROM generate_series(1, %s)",
+                       (rng.choice(TASK_STATUSES), rng.randint(1, 20)))
+    elif choice < 0.80:
+        cursor.execute("UPDATE job_manager_task SET status = %s WHERE id BETWEEN %s AND %s",
+                       (rng.choice(TASK_STATUSES), low, high))
+    elif choice < 0.90:
+        cursor.execute("UPDATE job_manager_task SET soft_delete = %s WHERE id BETWEEN %s AND %s",
+                       (rng.random() < 0.7, low, high))
+    elif choice < 0.95:
+        cursor.execute("DELETE FROM job_manager_task WHERE id BETWEEN %s AND %s", (low, high))
+    else:
+        cursor.execute("DELETE FROM image_manager_image WHERE id BETWEEN %s AND %s", (low, high))
+
+
+def writer(db: dict, seed_value: int, transactions: int, rows: int, errors: list):
+    """Run random transactions; some have several statements, some roll back"""
+    rng = random.Random(seed_value)
+    connection = connect(db)
+    connection.autocommit = False
+    cursor = connection.cursor()
+    try:
+        for _ in range(transactions):
+            try:
+                for _ in range(rng.choice((1, 1, 1, 2, 5))):
+                    random_change(cursor, rng, rows)
+                if rng.random() < 0.1:
+                    connection.rollback()
+                else:
+                    connection.commit()
+            except Exception as e:
+                # Deadlocks between writers are expected now and then
+                connection.rollback()
+                if "deadlock" not in str(e):
+                    errors.append(str(e))
+    finally:
+        connection.close()
+
+
+def sql_counts(cursor, query_loader: QueryLoader) -> dict:
+    """Values of the feed queries by their SQL"""
+    values = {}
+    for name, config in query_loader.get_all_queries().items():
+        if "feed" in config:
+            cursor.execute(config["sql"])
+            values[name] = cursor.fetchone()[0]
+    return values
+
+
+def feed_counts(feed: ChangeFeed, query_loader: QueryLoader) -> dict:
+    """Values of the feed queries from the feed"""
+    return {name: feed.count(config["feed"]["table"], config["feed"].get("state"))
+            for name, config in query_loader.get_all_queries().items() if "feed" in config}
+
+
+def wait_for(condition, timeout: float = 10.0) -> bool:
+    """Poll condition until it holds or timeout passes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.0005)
+    return False
+
+
+def settle(feed: ChangeFeed, cursor, query_loader: QueryLoader) -> tuple:
+    """Feed and SQL counts once the feed has caught up (or after a timeout)"""
+    expected = sql_counts(cursor, query_loader)
+    wait_for(lambda: feed_counts(feed, query_loader) == expected, timeout=5.0)
+    return feed_counts(feed, query_loader), expected
+
+
+def latency_ms(feed: ChangeFeed, cursor, samples: int) -> list:
+    """Milliseconds from a committed insert until the feed counts it"""
+    latencies = []
+    for _ in range(samples):
+        before = feed.count("image_manager_image", "PENDING")
+        start = time.perf_counter()
+        cursor.execute("INSERT INTO image_manager_image (state) VALUES ('PENDING')")
+        wait_for(lambda: feed.count("image_manager_image", "PENDING") == before + 1, timeout=5.0)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def check_aggregator(feed: ChangeFeed, query_loader: QueryLoader) -> tuple:
+    """Statements sent to the database per cycle with and without the feed"""
+    statements = []
+    for change_feed in (None, feed):
+        driver = FakeDriver(latency_ms=0, connect_ms=0)
+        aggregator = DataAggregator(FakeDatabaseClient(driver), query_loader, change_feed=change_feed)
+        response = aggregator.fetch_stats("2026-02-10T12:00:00.000Z", "2026-02-10T12:01:00.000Z",
+                                          "client", "site")
+        statements.append(driver.statements)
+    return statements, response
+
+
+def main() -> int:
+    """Run the writers and the checks, printing any problem"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000, help="rows seeded into each table")
+    parser.add_argument("--writers", type=int, default=4, help="concurrent writer connections")
+    parser.add_argument("--transactions", type=int, default=500, help="transactions per writer")
+    parser.add_argument("--reconcile", type=float, default=0.2, help="seconds between reconciles while writing")
+    parser.add_argument("--schema", default="pulse_feed_check", help="scratch schema, dropped at the end")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+    # Only the system metrics are left out; the check is about database statements
+    query_loader = QueryLoader(REPO_QUERIES)
+    query_loader.aggregation_order = [name for name in query_loader.aggregation_order
+                                      if query_loader.get_query(name).get("type") not in ("docker", "system")]
+    config = query_loader.get_change_feed()
+    db = {"host": Config.DB_HOST, "port": Config.DB_PORT, "name": Config.DB_NAME, "user": Config.DB_USER,
+          "password": Config.DB_PASSWORD, "ssl_mode": Config.DB_SSL_MODE,
+          "options": f"-c search_path={args.schema}"}
+
+    admin = connect(db)
+    cursor = admin.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE; CREATE SCHEMA {args.schema}")
+    problems = []
+    feed = None
+    try:
+        cursor.execute(SCHEMA_DDL)
+        cursor.execute(install_sql(config))
+        seed(cursor, args.rows)
+
+        feed = ChangeFeed("check", db, config, reconcile_seconds=args.reconcile)
+        feed.start()
+        if not wait_for(lambda: feed.status()["live"]):
+            raise RuntimeError("The change feed did not go live")
+
+        errors = []
+        threads = [threading.Thread(target=writer, args=(db, index, args.transactions, args.rows, errors))
+                   for index in range(args.writers)]
+        write_start = time.perf_counter()
+        for index, thread in enumerate(threads):
+            thread.start()
+        time.sleep(0.5)
+        cursor.execute("TRUNCATE job_manager_task")
+        for thread in threads:
+            thread.join()
+        write_s = time.perf_counter() - write_start
+        problems.extend(f"writer error: {error}" for error in errors[:5])
+
+        # No reconcile from here on: the counts must match on notifications alone
+        feed.reconcile_seconds = 3600
+        status = feed.status()
+        got, expected = settle(feed, cursor, query_loader)
+        print(f"writes: {args.writers} writers x {args.transactions} transactions in {write_s:.1f}s, "
+              f"{status['events']} notifications applied, {status['skipped']} already counted, "
+              f"{status['reconciles']} reconciles")
+        if got != expected:
+            problems.append(f"feed counts {got} != SQL {expected}")
+        if status["drift"]:
+            problems.append(f"reconcile found drift {status['drift']} with the listener connected")
+
+        latencies = latency_ms(feed, cursor, 200)
+        print(f"notification latency: p50 {statistics.median(latencies):.2f} ms  "
+              f"max {max(latencies):.2f} ms")
+
+        start = time.perf_counter()
+        sql_counts(cursor, query_loader)
+        sql_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for _ in range(1000):
+            feed_counts(feed, query_loader)
+        lookup_us = (time.perf_counter() - start) * 1000
+        print(f"feed queries per cycle: SQL {sql_ms:.2f} ms, feed {lookup_us:.2f} us "
+              f"({len(expected)} queries, {args.rows} rows per table)")
+
+        # Changes while the listener is gone are corrected on reconnect
+        reconciles = feed.status()["reconciles"]
+        cursor.execute("SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                       "WHERE application_name = 'pulse-agent-change-feed' AND pid <> pg_backend_pid()")
+        if not wait_for(lambda: not feed.status()["live"], timeout=5.0):
+            problems.append("the feed stayed live after its backend was terminated")
+        if any(value is not None for value in feed_counts(feed, query_loader).values()):
+            problems.append("counts were served while the feed was down")
+        cursor.execute("INSERT INTO image_manager_image (state) SELECT 'FAILED' FROM generate_series(1, 100)")
+        cursor.execute("UPDATE job_manager_task SET status = 2 WHERE status = 0")
+        if not wait_for(lambda: feed.status()["reconciles"] > reconciles, timeout=15.0):
+            problems.append("the feed did not reconnect")
+        got, expected = settle(feed, cursor, query_loader)
+        print(f"reconnect: reconciled with drift {feed.status()['drift']} (changes made while down)")
+        if got != expected:
+            problems.append(f"after reconnect feed counts {got} != SQL {expected}")
+
+        statements, response = check_aggregator(feed, query_loader)
+        fed = response.get("change_feed", {}).get("queries", [])
+        print(f"aggregator: {statements[0]} statements per cycle without the feed, {statements[1]} with it "
+              f"({len(fed)} queries fed)")
+        if sorted(fed) != sorted(expected) or statements[0] - statements[1] != len(expected):
+            problems.append(f"aggregator fed {fed} with {statements} statements")
+        for name in fed:
+            if response["stats"][name] != expected[name]:
+                problems.append(f"aggregator reported {name}={response['stats'][name]}, SQL {expected[name]}")
+    finally:
+        if feed is not None:
+            feed.stop()
+        cursor.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        admin.close()
+
+    for problem in problems:
+        print(f"PROBLEM {problem}")
+    if problems:
+        return 1
+    print("OK: feed counts match SQL through concurrent writes, rollbacks, TRUNCATE and a reconnect")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Cold-start check
+Verifies that importing the agent stays within the documented start-up budget
+and that collectors and drivers are only imported when a query needs them
+
+Usage: python3 benchmarks/check_cold_start.py [--runs N] [--budget-ms MS]
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+# Add package to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pulse_agent_complete.startup import LAZY_MODULES, STARTUP_BUDGET_MS, profile_startup
+
+
+def check_lazy_collectors() -> list:
+    """Run a database-only cycle and list heavy modules it imported"""
+    from fakes import FakeDatabaseClient, FakeDriver
+    from pulse_agent_complete.aggregator import DataAggregator
+    from pulse_agent_complete.db_client import QueryLoader
+
+    with tempfile.TemporaryDirectory() as directory:
+        queries_file = Path(directory) / "queries.json"
+        queries_file.write_text(json.dumps({"queries": {
+            "images_current": {"sql": "SELECT COUNT(*) as count FROM images", "type": "count"}
+        }}))
+        aggregator = DataAggregator(FakeDatabaseClient(FakeDriver()), QueryLoader(queries_file))
+        aggregator.fetch_stats("2026-02-10T12:00:00.000Z", "2026-02-10T12:01:00.000Z", "client", "site")
+    return [name for name in LAZY_MODULES if name in sys.modules]
+
+
+def main() -> int:
+    """Run the check"""
+    parser = argparse.ArgumentParser(description="Cold-start check")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure (median is checked)")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    reports = [profile_startup() for _ in range(args.runs)]
+    import_ms = statistics.median(report["import_ms"] for report in reports)
+    wall_ms = statistics.median(report["wall_ms"] for report in reports)
+    print(f"import {import_ms:.1f} ms (budget {args.budget_ms:.0f} ms), interpreter wall {wall_ms:.1f} ms")
+
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"import time {import_ms:.1f} ms over the {args.budget_ms:.0f} ms budget")
+        for module in reports[-1]["slowest_modules"][:5]:
+            print(f"  {module['module']:<40} self {module['self_ms']:.2f} ms")
+    eager = reports[-1]["eager_heavy_modules"]
+    if eager:
+        failures.append(f"imported at start-up: {', '.join(eager)}")
+    imported = check_lazy_collectors()
+    if imported:
+        failures.append(f"imported by a database-only cycle: {', '.join(imported)}")
+
+    if failures:
+        print(f"FAILED: {'; '.join(failures)}")
+        return 1
+    print("OK: within budget, collectors and drivers imported lazily")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
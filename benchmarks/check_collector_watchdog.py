@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Collector watchdog check
+Runs DataAggregator cycles with the docker and system collectors isolated in a
+CollectorPool backed by offline fakes, then makes the Docker collector hang
+(and crash) and verifies that the cycle still finishes on time, reports the
+killed collector, keeps the other collector's values and recovers on the
+next cycle with a fresh worker
+
+Usage: python3 benchmarks/check_collector_watchdog.py [--timeout 1.0] [--containers 200]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fakes import FakeDatabaseClient, FakeDockerClient, FakeDriver, FakeSystemClient
+
+from pulse_agent_complete.aggregator import DataAggregator
+from pulse_agent_complete.db_client import QueryLoader
+from pulse_agent_complete.isolation import CollectorPool
+
+# The scenario steers the workers through files, which they see across the fork
+HANG_FILE = Path(tempfile.gettempdir()) / f"pulse-watchdog-hang-{os.getpid()}"
+CRASH_FILE = Path(tempfile.gettempdir()) / f"pulse-watchdog-crash-{os.getpid()}"
+
+# Time a killed worker gets to exit before the cycle goes on
+REAP_ALLOWANCE = 0.5
+
+
+class SteeredDockerClient(FakeDockerClient):
+    """FakeDockerClient that blocks indefinitely or exits while a scenario file exists"""
+
+    def __init__(self):
+        super().__init__(int(os.environ["WATCHDOG_CONTAINERS"]))
+
+    def get_detailed_metrics(self):
+        if Path(os.environ["WATCHDOG_CRASH_FILE"]).exists():
+            os._exit(3)
+        while Path(os.environ["WATCHDOG_HANG_FILE"]).exists():
+            # Stands in for a call no thread timeout can interrupt
+            time.sleep(0.05)
+        return super().get_detailed_metrics()
+
+
+class QuickSystemClient(FakeSystemClient):
+    """FakeSystemClient without the CPU sampling interval"""
+
+    def __init__(self):
+        super().__init__()
+        self.psutil.cpu_percent = lambda interval=None: 12.5
+
+
+def write_queries_file(directory: Path) -> Path:
+    """Write a queries.json with a count query plus Docker and host metrics"""
+    queries = {"tasks_current": {"sql": "SELECT COUNT(*) as count FROM tasks", "type": "count"},
+               "docker_metrics": {"type": "docker"}, "system_metrics": {"type": "system"}}
+    queries_file = directory / "queries.json"
+    queries_file.write_text(json.dumps({"queries": queries, "aggregation_order": list(queries)}))
+    return queries_file
+
+
+def main() -> int:
+    """Run the check"""
+    parser = argparse.ArgumentParser(description="Collector watchdog check")
+    parser.add_argument("--timeout", type=float, default=1.0, help="collector timeout in seconds")
+    parser.add_argument("--containers", type=int, default=200, help="fake Docker containers")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    os.environ.update({"WATCHDOG_CONTAINERS": str(args.containers), "PA_LOG_LEVEL": "CRITICAL",
+                       "WATCHDOG_HANG_FILE": str(HANG_FILE), "WATCHDOG_CRASH_FILE": str(CRASH_FILE)})
+
+    with tempfile.TemporaryDirectory() as directory:
+        query_loader = QueryLoader(write_queries_file(Path(directory)))
+    driver = FakeDriver(latency_ms=0, connect_ms=0)
+
+    start = time.perf_counter()
+    pool = CollectorPool(["docker", "system"], args.timeout,
+                         factories={"docker": SteeredDockerClient, "system": QuickSystemClient})
+    pool.start()
+    print(f"pool started in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    results = []
+    failures = []
+
+    def cycle(name: str, expect_killed: list, expect_docker: str, budget: float, deadline: float = None):
+        """Run a cycle; under a deadline the hang may leave no time for the other collectors"""
+        aggregator = DataAggregator(FakeDatabaseClient(driver), query_loader, collector_pool=pool,
+                                    deadline=None if deadline is None else time.monotonic() + deadline)
+        start = time.perf_counter()
+        response = aggregator.fetch_stats("2026-02-10T12:00:00.000Z", "2026-02-10T12:01:00.000Z",
+                                          "client", "site")
+        elapsed = time.perf_counter() - start
+        stats = response["stats"]
+        killed = response.get("killed_collectors", [])
+        docker = stats["docker_metrics"]["system"]["daemon_status"]
+        problems = []
+        if killed != expect_killed:
+            problems.append(f"killed {killed}, expected {expect_killed}")
+        if docker != expect_docker:
+            problems.append(f"docker {docker}, expected {expect_docker}")
+        if deadline is None and not stats["system_metrics"].get("memory"):
+            problems.append("system metrics missing")
+        if deadline is None and stats.get("tasks_current") != 42:
+            problems.append("database value missing")
+        if elapsed > budget:
+            problems.append(f"took {elapsed:.2f}s, budget {budget:.2f}s")
+        results.append((name, elapsed, killed, not problems))
+        failures.extend(f"{name}: {problem}" for problem in problems)
+
+    # Direct, in-process collection for comparison
+    direct = DataAggregator(FakeDatabaseClient(driver), query_loader,
+                            SteeredDockerClient(), QuickSystemClient())
+    start = time.perf_counter()
+    direct.fetch_stats("2026-02-10T12:00:00.000Z", "2026-02-10T12:01:00.000Z", "client", "site")
+    print(f"in-process cycle: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    slack = 0.5 + REAP_ALLOWANCE
+    try:
+        cycle("warm-up", [], "running", args.timeout + slack)
+        cycle("isolated", [], "running", args.timeout + slack)
+
+        HANG_FILE.touch()
+        cycle("docker hangs", ["docker"], "error", args.timeout + slack)
+        HANG_FILE.unlink()
+        cycle("next cycle", [], "running", args.timeout + slack)
+
+        HANG_FILE.touch()
+        cycle("hang, 0.4s deadline", ["docker"], "error", 0.4 + slack, deadline=0.4)
+        HANG_FILE.unlink()
+
+        CRASH_FILE.touch()
+        cycle("docker worker exits", [], "error", args.timeout + slack)
+        CRASH_FILE.unlink()
+        cycle("after exit", [], "running", args.timeout + slack)
+    finally:
+        for path in (HANG_FILE, CRASH_FILE):
+            if path.exists():
+                path.unlink()
+        pool.stop()
+
+    for name, elapsed, killed, ok in results:
+        print(f"{name:<22} {elapsed * 1000:7.1f} ms  killed={killed}  {'OK' if ok else 'FAIL'}")
+    if failures:
+        for failure in failures:
+            print(f"FAILED: {failure}")
+        return 1
+    print(f"OK: hung collector killed {pool.killed['docker']} times, every cycle finished on time")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Host facts check
+Runs single-site cycles against a local stand-in collector with
+PA_SEND_HOST_FACTS=changed, an offline database and the host's real psutil,
+and verifies when host facts are recomputed (new boot id, new hostname, TTL)
+and when pushes carry them (first push, changed facts, after a failed push)
+
+Also reports the system collector's time with and without cached facts and
+the size of the system section with and without facts.
+
+Usage: python3 benchmarks/check_host_facts.py
+"""
+
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fakes import FakeDatabaseClient, FakeDriver
+
+from pulse_agent_complete.standin_server import Faults, StandinCollector
+
+
+def main() -> int:
+    """Run the check"""
+    logging.basicConfig(level=logging.CRITICAL)
+
+    with StandinCollector() as collector, tempfile.TemporaryDirectory() as data_dir:
+        boot_id_file = Path(data_dir) / "boot_id"
+        boot_id_file.write_text("boot-1\n")
+        queries_file = Path(data_dir) / "queries.json"
+        queries_file.write_text(json.dumps({"queries": {"system_metrics": {"type": "system"}},
+                                            "aggregation_order": ["system_metrics"]}))
+
+        # Config is read at import time, so configure before importing the agent
+        os.environ.update({
+            "PA_DATA_DIR": data_dir,
+            "PA_QUERIES_FILE": str(queries_file),
+            "PA_PUSH_URL": collector.url,
+            "PA_HISTORY_ENABLED": "false",
+            "PA_LOG_ASYNC": "false",
+            "PA_SEND_HOST_FACTS": "changed",
+            "PA_HOST_FACTS_TTL": "3600"
+        })
+        from pulse_agent_complete import system_client
+        from pulse_agent_complete.aggregator import DEFAULT_SOURCE
+        from pulse_agent_complete.main import build_dispatcher, run_site
+        from pulse_agent_complete.sites import get_sites
+        from pulse_agent_complete.state_manager import StateManager
+
+        system_client.BOOT_ID_PATH = str(boot_id_file)
+        computed = []
+        get_host_facts = system_client.SystemClient.get_host_facts
+        system_client.SystemClient.get_host_facts = lambda self: computed.append(1) or get_host_facts(self)
+        hostname = platform.node()
+        platform.node = lambda: hostname
+
+        driver = FakeDriver(latency_ms=0, connect_ms=0)
+        site = get_sites()[0]
+        site.build_db_clients = lambda sources=None: {DEFAULT_SOURCE: FakeDatabaseClient(driver)}
+        dispatcher = build_dispatcher(pool_size=1)
+
+        failures = []
+
+        def cycle(name: str, expect_computed: bool, expect_facts: bool):
+            computed.clear()
+            run_site(site, dispatcher)
+            # The last request: a failed payload is retried from the outbox first
+            system = collector.requests[-1]["payload"]["stats"]["system_metrics"]["system"]
+            has_facts = "hostname" in system
+            ok = bool(computed) == expect_computed and has_facts == expect_facts and "facts_hash" in system
+            print(f"{name:<28} computed={bool(computed)!s:<5} facts sent={has_facts!s:<5} "
+                  f"hash={system.get('facts_hash')}  {'OK' if ok else 'FAIL'}")
+            if not ok:
+                failures.append(name)
+
+        cycle("first cycle", True, True)
+        cycle("same boot", False, False)
+
+        boot_id_file.write_text("boot-2\n")
+        cycle("new boot id", True, False)
+
+        hostname = "renamed-host"
+        cycle("hostname changed", True, True)
+
+        state_manager = StateManager(site.data_filepath)
+        state = state_manager.read_state()
+        state["host_facts"]["computed_at"] -= 7200
+        state_manager.write_state(state)
+        cycle("TTL expired", True, False)
+
+        hostname = "renamed-again"
+        collector.faults = Faults(error_rate=1.0, error_status=400)
+        cycle("changed, push fails", True, True)
+        collector.faults = None
+        cycle("retry after failed push", False, True)
+        cycle("after it committed", False, False)
+
+        # Cost of the system collector and of the facts in the payload
+        client = system_client.SystemClient()
+        facts = get_host_facts(client)
+        rounds = 200
+        start = time.perf_counter()
+        for _ in range(rounds):
+            client.get_system_info(get_host_facts(client))
+        uncached = (time.perf_counter() - start) / rounds * 1e6
+        start = time.perf_counter()
+        for _ in range(rounds):
+            client.get_system_info(facts)
+        cached = (time.perf_counter() - start) / rounds * 1e6
+        full = client.get_system_info(facts)
+        slim = {key: value for key, value in full.items() if key not in system_client.HOST_FACT_FIELDS}
+        print(f"system info: {uncached:.0f} us computing facts, {cached:.0f} us with cached facts")
+        print(f"system section: {len(json.dumps(full))} bytes with facts, {len(json.dumps(slim))} without")
+
+    if failures:
+        print(f"FAILED: {', '.join(failures)}")
+        return 1
+    print("OK: facts recomputed on a new boot, hostname or TTL, and pushed only when changed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
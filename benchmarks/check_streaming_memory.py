@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Memory check for the streaming chunked upload
+Pushes large generated payloads to a local stand-in collector and verifies with
+tracemalloc that peak client memory stays bounded by the chunk size
+
+Usage: python3 benchmarks/check_streaming_memory.py [--chunk-size BYTES]
+"""
+
+import argparse
+import gc
+import logging
+import sys
+import tracemalloc
+from pathlib import Path
+
+# Add package to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pulse_agent_complete.http_client import HttpClient
+from pulse_agent_complete.serializers import JsonSerializer
+from pulse_agent_complete.standin_server import StandinCollector
+
+# Record counts; each record is ~130 bytes of JSON, so roughly 1.3, 6.5 and 26 MB
+RECORD_COUNTS = (10_000, 50_000, 200_000)
+
+# Allowed peak on top of the chunk size (encoder, zlib state, HTTP buffers)
+OVERHEAD_BYTES = 1024 * 1024
+
+
+def generate_records(count: int):
+    """Yield synthetic container records without materializing them"""
+    for i in range(count):
+        yield {
+            "name": f"service-{i}",
+            "image": f"registry.local/app/service-{i % 20}:1.{i % 7}.0",
+            "state": "running",
+            "status": "running",
+            "health": "healthy"
+        }
+
+
+def build_payload(count: int) -> dict:
+    """Build a payload whose container list is a generator"""
+    return {
+        "client_id": "client",
+        "site_id": "site",
+        "batch_index": 1,
+        "uuid": "00000000-0000-0000-0000-000000000000",
+        "stats": {"status": "success", "docker_metrics": {"containers": generate_records(count)}},
+        "additional": {}
+    }
+
+
+def measure(client: HttpClient, url: str, count: int, chunk_size: int) -> int:
+    """Return peak traced bytes for one streaming push"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        response = client.make_streaming_post_request(url, build_payload(count), chunk_size=chunk_size)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if response is None:
+        raise RuntimeError("Streaming push failed")
+    return peak
+
+
+def main() -> int:
+    """Run the memory check"""
+    parser = argparse.ArgumentParser(description="Streaming upload memory check")
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    limit = args.chunk_size + OVERHEAD_BYTES
+    failed = False
+
+    with StandinCollector(keep_payloads=False) as collector:
+        client = HttpClient(serializer=JsonSerializer())
+        # Warm up so lazy imports and connection setup are not measured
+        measure(client, collector.url, 10, args.chunk_size)
+
+        print(f"{'records':>8} {'decoded_MB':>11} {'wire_MB':>9} {'peak_KB':>9} {'limit_KB':>9}")
+        for count in RECORD_COUNTS:
+            peak = measure(client, collector.url, count, args.chunk_size)
+            record = collector.requests[-1]
+            ok = peak <= limit and record["chunked"]
+            failed = failed or not ok
+            print(f"{count:>8} {record['decoded_bytes'] / 1e6:>11.1f} {record['wire_bytes'] / 1e6:>9.2f} "
+                  f"{peak / 1024:>9.0f} {limit / 1024:>9.0f} {'OK' if ok else 'FAIL'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
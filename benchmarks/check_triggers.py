@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Trigger check
+Runs the agent in long-running mode with a one-minute cycle and a fast trigger
+tick against a local stand-in collector, offline fakes for the database and
+Docker, and a scenario that moves a metric and a container's health
+
+Verifies that an out-of-band push arrives within a tick of a rule firing,
+and that for_seconds, edge triggering, the cooldown and the hourly push
+limit hold back the pushes they should; reports alert latency.
+
+Usage: python3 benchmarks/check_triggers.py [--tick 0.2]
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from fakes import FakeDatabaseClient, FakeDockerClient, FakeDriver
+
+from pulse_agent_complete.standin_server import StandinCollector
+
+FOR_SECONDS = 0.5
+COOLDOWN_SECONDS = 4
+MAX_PUSHES = 3
+
+
+def write_queries_file(directory: Path) -> Path:
+    """Write a queries.json with one count query and two trigger rules"""
+    queries_file = directory / "queries.json"
+    queries_file.write_text(json.dumps({
+        "queries": {"failed_tasks_current": {
+            "sql": "SELECT COUNT(*) as count FROM tasks WHERE state = 'failed'", "type": "count"}},
+        "aggregation_order": ["failed_tasks_current"],
+        "triggers": {
+            "failed_tasks_high": {"metric": "failed_tasks_current", "above": 100,
+                                  "for_seconds": FOR_SECONDS, "cooldown_seconds": COOLDOWN_SECONDS},
+            "container_unhealthy": {"containers": "unhealthy", "match": "service-*"}
+        }
+    }))
+    return queries_file
+
+
+class Scenario:
+    """Drives the fakes and watches the collector from a background thread"""
+
+    def __init__(self, collector: StandinCollector, driver: FakeDriver, docker_client: FakeDockerClient,
+                 tick: float):
+        self.collector = collector
+        self.driver = driver
+        self.docker = docker_client.docker
+        self.tick = tick
+        self.results = []
+        self.failures = []
+
+    def pushes(self) -> list:
+        """Payloads received so far"""
+        return [request["payload"] for request in self.collector.requests]
+
+    def wait_for_push(self, count: int, timeout: float) -> float:
+        """Wait until count pushes arrived, returning when the last one did (or None)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if len(self.collector.requests) >= count:
+                return self.collector.requests[count - 1]["received_at"]
+            time.sleep(0.005)
+        return None
+
+    def expect_push(self, name: str, count: int, rule: str, since: float, earliest: float, latest: float):
+        """Expect push number count, fired by rule, between earliest and latest seconds after since"""
+        received_at = self.wait_for_push(count, latest + 2)
+        if received_at is None:
+            self.failures.append(f"{name}: no push")
+            return None
+        latency = received_at - since
+        fired = [detail["rule"] for detail in self.pushes()[count - 1]["additional"].get("triggers", [])]
+        ok = rule in fired and earliest <= latency <= latest
+        self.results.append((name, f"{latency * 1000:7.0f} ms", ok))
+        if not ok:
+            self.failures.append(f"{name}: fired {fired} after {latency:.2f}s, expected {rule} "
+                                 f"within {earliest:.2f}-{latest:.2f}s")
+        return received_at
+
+    def expect_quiet(self, name: str, count: int, seconds: float):
+        """Expect no push beyond count for seconds"""
+        time.sleep(seconds)
+        ok = len(self.collector.requests) == count
+        self.results.append((name, f"{seconds:5.1f} s quiet", ok))
+        if not ok:
+            self.failures.append(f"{name}: {len(self.collector.requests) - count} unexpected push(es)")
+
+    def set_health(self, index: int, status: str):
+        """Set a fake container's health check status"""
+        self.docker._containers[index].attrs["State"]["Health"] = {"Status": status}
+
+    def run(self):
+        """Play the scenario, then stop the agent"""
+        try:
+            self._run()
+        except Exception as e:
+            self.failures.append(f"scenario failed: {e}")
+        finally:
+            os.kill(os.getpid(), signal.SIGINT)
+
+    def _run(self):
+        slack = self.tick + 0.5
+        if self.wait_for_push(1, 10) is None:
+            self.failures.append("regular cycle: no push")
+            return
+        time.sleep(3 * self.tick)
+
+        # Metric crosses the threshold and must hold for FOR_SECONDS
+        raised = time.time()
+        self.driver.value = 500
+        fired_at = self.expect_push("metric above threshold", 2, "failed_tasks_high", raised,
+                                    FOR_SECONDS, FOR_SECONDS + slack)
+        if fired_at is None:
+            return
+        # Still above: edge-triggered, no repeat
+        self.expect_quiet("metric stays above", 2, 1.0)
+        # Clears and crosses again within the cooldown: held until it ends
+        self.driver.value = 10
+        time.sleep(5 * self.tick)
+        self.driver.value = 500
+        self.expect_push("re-cross during cooldown", 3, "failed_tasks_high", fired_at,
+                         COOLDOWN_SECONDS, COOLDOWN_SECONDS + slack)
+
+        # A container turns unhealthy: fires on the next tick
+        unhealthy = time.time()
+        self.set_health(3, "unhealthy")
+        # The hourly limit of MAX_PUSHES was reached by the two metric pushes and this one
+        self.expect_push("container turns unhealthy", 4, "container_unhealthy", unhealthy, 0, slack)
+
+        # Another container turns unhealthy, but the hourly limit is reached
+        self.set_health(6, "unhealthy")
+        self.expect_quiet("push limit reached", 4, 1.0)
+
+
+def main() -> int:
+    """Run the check"""
+    parser = argparse.ArgumentParser(description="Trigger check")
+    parser.add_argument("--tick", type=float, default=0.2, help="trigger tick in seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    with StandinCollector() as collector, tempfile.TemporaryDirectory() as data_dir:
+        # Config is read at import time, so configure before importing the agent
+        os.environ.update({
+            "PA_DATA_DIR": data_dir,
+            "PA_QUERIES_FILE": str(write_queries_file(Path(data_dir))),
+            "PA_PUSH_URL": collector.url,
+            "PA_HISTORY_ENABLED": "false",
+            "PA_LOG_ASYNC": "false",
+            "PA_TRIGGER_TICK": str(args.tick),
+            "PA_TRIGGER_MAX_PUSHES": str(MAX_PUSHES)
+        })
+        from pulse_agent_complete import triggers
+        from pulse_agent_complete.aggregator import DEFAULT_SOURCE
+        from pulse_agent_complete.main import build_dispatcher, run_forever
+        from pulse_agent_complete.sites import get_sites
+
+        driver = FakeDriver(latency_ms=1, connect_ms=0)
+        docker_client = FakeDockerClient(12)
+        triggers.DockerClient = lambda: docker_client
+        sites = get_sites()
+        for site in sites:
+            site.build_db_clients = lambda sources=None: {DEFAULT_SOURCE: FakeDatabaseClient(driver)}
+
+        scenario = Scenario(collector, driver, docker_client, args.tick)
+        threading.Thread(target=scenario.run, daemon=True).start()
+        run_forever(sites, build_dispatcher(pool_size=1), 1, 60)
+
+    for name, measured, ok in scenario.results:
+        print(f"{name:<28} {measured}  {'OK' if ok else 'FAIL'}")
+    if scenario.failures:
+        for failure in scenario.failures:
+            print(f"FAILED: {failure}")
+        return 1
+    print(f"OK: {len(collector.requests)} pushes, {len(collector.requests) - 1} out-of-band "
+          f"(tick {args.tick}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
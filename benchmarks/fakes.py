@@ -0,0 +1,258 @@
+"""
+Offline stand-ins for the collection backends
+A DB-API driver, a Docker SDK client and psutil, so the real DatabaseClient,
+DockerClient and SystemClient code can be measured without live services
+
+Only the backends are faked: the agent's own clients run unchanged on top.
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add package to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pulse_agent_complete.db_client import DatabaseClient
+from pulse_agent_complete.docker_client import DockerClient
+from pulse_agent_complete.system_client import SystemClient
+
+SCALAR_COLUMN = re.compile(r"\) AS (c\d+)")
+SESSION_STATEMENTS = ("SET ", "START ", "BEGIN", "KILL ")
+
+
+class QueryCanceledError(Exception):
+    """Stand-in for psycopg2.extensions.QueryCanceledError"""
+
+
+class FakeCursor:
+    """DB-API cursor returning generated rows after a fixed latency"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        if sql.lstrip().upper().startswith(SESSION_STATEMENTS):
+            self._rows = []
+            return
+        self.driver.statements += 1
+        if self.driver.latency:
+            time.sleep(self.driver.latency)
+        columns = SCALAR_COLUMN.findall(sql)
+        if columns:
+            # Combined scalar batch from execute_scalars()
+            self._rows = [{column: self.driver.value for column in columns}]
+        else:
+            self._rows = [{"count": self.driver.value} for _ in range(self.driver.row_count)]
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """DB-API connection handing out FakeCursors"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.status = driver.extensions.STATUS_READY
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.driver)
+
+    def is_connected(self):
+        return True
+
+    def rollback(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def set_session(self, **kwargs):
+        pass
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeDriver:
+    """
+    DB-API module stand-in (psycopg2 or mysql.connector shaped)
+
+    Every statement other than session statements (SET, START TRANSACTION)
+    sleeps for latency_ms and returns row_count rows of {"count": value}.
+    """
+
+    def __init__(self, latency_ms: float = 0.2, row_count: int = 1, connect_ms: float = 1.0,
+                 value: int = 42):
+        self.latency = latency_ms / 1000
+        self.row_count = row_count
+        self.value = value
+        self.connect_latency = connect_ms / 1000
+        self.statements = 0
+        self.extensions = SimpleNamespace(STATUS_READY=1, STATUS_IN_TRANSACTION=2,
+                                          QueryCanceledError=QueryCanceledError)
+
+    def connect(self, **kwargs):
+        if self.connect_latency:
+            time.sleep(self.connect_latency)
+        return FakeConnection(self)
+
+
+class FakeDatabaseClient(DatabaseClient):
+    """DatabaseClient running on a FakeDriver instead of a real driver"""
+
+    def __init__(self, driver: FakeDriver, db_type: str = "postgresql"):
+        self.db_type = db_type
+        self.host = "fake"
+        self.port = 0
+        self.database = "fake"
+        self.user = "fake"
+        self.password = ""
+        self.ssl_mode = "disable"
+        self.connection = None
+        self.cursor = None
+        self._timeout_ms = None
+        self._snapshot = False
+        self._cancelled = False
+        self._cancel_lock = threading.Lock()
+        self._active_query = None
+        if db_type == "postgresql":
+            self.psycopg2 = driver
+            self.RealDictCursor = None
+        else:
+            self.mysql = driver
+
+
+class FakeContainer:
+    """Docker SDK container with the attributes DockerClient reads"""
+
+    def __init__(self, index: int):
+        self.name = f"service-{index}"
+        self.status = "running" if index % 10 else "exited"
+        self.image = SimpleNamespace(tags=[f"registry.local/app/service-{index % 20}:1.{index % 7}.0"],
+                                     short_id=f"sha256:{index:012x}")
+        health = {"Status": "healthy"} if index % 3 == 0 else {}
+        self.attrs = {"State": {"Health": health}}
+
+    def summary(self) -> dict:
+        """The container as the daemon's list endpoint reports it"""
+        health = self.attrs["State"]["Health"].get("Status")
+        return {"Names": [f"/{self.name}"], "State": self.status,
+                "Status": f"Up 2 hours ({health})" if health else "Up 2 hours"}
+
+
+class FakeDockerAPI:
+    """docker.DockerClient stand-in with a fixed set of containers"""
+
+    def __init__(self, container_count: int):
+        self._containers = [FakeContainer(i) for i in range(container_count)]
+        self.containers = SimpleNamespace(list=lambda all=False: list(self._containers))
+        # Low-level API client: one request lists every container's summary
+        self.api = SimpleNamespace(containers=lambda all=False: [c.summary() for c in self._containers])
+
+    def ping(self):
+        return True
+
+    def version(self):
+        return {"Version": "24.0.7"}
+
+
+class FakeDockerClient(DockerClient):
+    """DockerClient talking to a FakeDockerAPI"""
+
+    def __init__(self, container_count: int):
+        self.docker = FakeDockerAPI(container_count)
+
+
+Partition = namedtuple("Partition", "device mountpoint fstype opts")
+Usage = namedtuple("Usage", "total used free percent")
+Memory = namedtuple("Memory", "total available percent used free")
+Swap = namedtuple("Swap", "total used free percent sin sout")
+
+
+class FakeProcess:
+    """psutil.Process stand-in exposing the info dict of process_iter()"""
+
+    def __init__(self, status: str):
+        self.info = {"status": status}
+
+
+class FakePsutil:
+    """
+    psutil module stand-in with a fixed number of processes and mounts
+
+    cpu_percent(interval) sleeps for the interval, as psutil does.
+    """
+
+    STATUS_RUNNING = "running"
+    STATUS_SLEEPING = "sleeping"
+    STATUS_ZOMBIE = "zombie"
+    STATUS_STOPPED = "stopped"
+
+    class NoSuchProcess(Exception):
+        pass
+
+    class AccessDenied(Exception):
+        pass
+
+    def __init__(self, process_count: int = 300, mount_count: int = 8):
+        statuses = (self.STATUS_SLEEPING,) * 8 + (self.STATUS_RUNNING, self.STATUS_ZOMBIE)
+        self._processes = [FakeProcess(statuses[i % len(statuses)]) for i in range(process_count)]
+        self._partitions = [Partition(f"/dev/sd{chr(97 + i % 26)}{i // 26 + 1}",
+                                      "/" if i == 0 else f"/mnt/data{i}", "ext4", "rw")
+                            for i in range(mount_count)]
+
+    def boot_time(self):
+        return time.time() - 864000
+
+    def cpu_count(self, logical=True):
+        return 8 if logical else 4
+
+    def cpu_percent(self, interval=None):
+        if interval:
+            time.sleep(interval)
+        return 12.5
+
+    def getloadavg(self):
+        return (0.42, 0.38, 0.35)
+
+    def virtual_memory(self):
+        return Memory(16777216000, 8388608000, 50.0, 8388608000, 4194304000)
+
+    def swap_memory(self):
+        return Swap(2147483648, 0, 2147483648, 0.0, 0, 0)
+
+    def disk_partitions(self):
+        return list(self._partitions)
+
+    def disk_usage(self, mountpoint):
+        return Usage(500107862016, 123456789012, 376651072004, 24.69)
+
+    def pids(self):
+        return list(range(1, len(self._processes) + 1))
+
+    def process_iter(self, attrs=None):
+        return iter(self._processes)
+
+
+class FakeSystemClient(SystemClient):
+    """SystemClient reading a FakePsutil; systemd services are a fixed result"""
+
+    def __init__(self, process_count: int = 300, mount_count: int = 8):
+        self.psutil = FakePsutil(process_count, mount_count)
+
+    def get_service_info(self):
+        # The real method shells out to systemctl, which depends on the host
+        return {"total_services": 180, "running_services": 60, "failed_services": 0}
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Push pipeline load driver
+Pushes payloads to a local stand-in collector that injects latency, errors,
+connection resets and Retry-After responses, and reports throughput, bytes on
+the wire, tail latency and - for full agent cycles - state correctness
+
+Two phases run against the same faults:
+  http:  --payloads payloads pushed with HttpClient from --concurrency threads
+  flow:  --cycles agent cycles (main.run_once) for --sites sites on a fake
+         database; afterwards every site's accepted batch_index sequence,
+         uuid reuse after failures and final state are checked
+
+Usage: python3 benchmarks/load_push.py [--error-rate 0.1] [--reset-rate 0.05] [--retry-after-rate 0.05]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add package to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pulse_agent_complete.standin_server import Faults, StandinCollector
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Nearest-rank percentile of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_http_phase(collector: StandinCollector, args: argparse.Namespace) -> dict:
+    """Push payloads with HttpClient from several threads"""
+    from bench_serializers import build_payload
+    from pulse_agent_complete.http_client import HttpClient
+
+    client = HttpClient(timeout=10, pool_size=args.concurrency)
+    payload = build_payload(args.containers)
+    first_request = len(collector.requests)
+
+    def push(index: int):
+        start = time.perf_counter()
+        response = client.make_post_request(collector.url, dict(payload, batch_index=index))
+        return response is not None, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        outcomes = list(executor.map(push, range(args.payloads)))
+    elapsed = time.perf_counter() - start
+
+    records = collector.requests[first_request:]
+    latencies = [latency for _, latency in outcomes]
+    delivered = sum(1 for ok, _ in outcomes if ok)
+    return {
+        "payloads": args.payloads,
+        "delivered": delivered,
+        "payloads_per_s": round(delivered / elapsed, 1),
+        "wire_bytes": sum(record["wire_bytes"] for record in records),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(max(latencies), 2),
+        "faults": dict(Counter(record["fault"] or "none" for record in records))
+    }
+
+
+def write_queries_file(directory: Path, query_count: int) -> Path:
+    """Write a queries.json with database count queries only"""
+    queries = {
+        f"metric_{i}_current": {"sql": f"SELECT COUNT(*) as count FROM table_{i}", "type": "count"}
+        for i in range(query_count)
+    }
+    queries_file = directory / "queries.json"
+    queries_file.write_text(json.dumps({"queries": queries, "aggregation_order": list(queries)}))
+    return queries_file
+
+
+def check_site(site_id: str, records: list, final_batch_index: int) -> list:
+    """
+    Check one site's push attempts, in the order the collector received them
+
+    Returns:
+        Problems found, as messages
+    """
+    problems = []
+    accepted = 0
+    previous = None
+    for record in records:
+        payload = record["payload"]
+        if previous is not None:
+            previous_payload = previous["payload"]
+            if previous["status"] == 200:
+                if payload["uuid"] == previous_payload["uuid"]:
+                    problems.append(f"{site_id}: uuid {payload['uuid']} reused after it was accepted")
+            elif (payload["uuid"], payload["batch_index"]) != (previous_payload["uuid"],
+                                                                 previous_payload["batch_index"]):
+                problems.append(f"{site_id}: batch {previous_payload['batch_index']} not retried "
+                                f"with the same uuid and batch_index")
+        if record["status"] == 200:
+            accepted += 1
+            if payload["batch_index"] != accepted:
+                problems.append(f"{site_id}: accepted batch_index {payload['batch_index']}, expected {accepted}")
+        previous = record
+
+    if final_batch_index != accepted:
+        problems.append(f"{site_id}: state batch_index {final_batch_index}, {accepted} batches accepted")
+    return problems
+
+
+def early_retries(records: list, retry_after: int) -> int:
+    """Attempts sent sooner than the Retry-After of the site's previous attempt"""
+    count = 0
+    for previous, record in zip(records, records[1:]):
+        if previous["fault"] == "retry_after" and record["received_at"] - previous["received_at"] < retry_after:
+            count += 1
+    return count
+
+
+def configure_agent(collector: StandinCollector, data_dir: Path, args: argparse.Namespace):
+    """
+    Point the agent at the collector with --sites sites in data_dir
+
+    Config is read at import time, so this runs before the agent is imported.
+    """
+    sites_file = data_dir / "sites.json"
+    queries_file = write_queries_file(data_dir, args.queries)
+    sites_file.write_text(json.dumps([
+        {"name": f"site-{i}", "client_id": "client", "site_id": f"site-{i}", "queries_file": str(queries_file)}
+        for i in range(args.sites)
+    ]))
+    os.environ.update({
+        "PA_DATA_DIR": str(data_dir),
+        "PA_SITES_FILE": str(sites_file),
+        "PA_PUSH_URL": collector.url,
+        "PA_HISTORY_ENABLED": "false"
+    })
+
+
+def run_flow_phase(collector: StandinCollector, args: argparse.Namespace) -> dict:
+    """Run agent cycles for several sites and check their state"""
+    from fakes import FakeDatabaseClient, FakeDriver
+    from pulse_agent_complete.aggregator import DEFAULT_SOURCE
+    from pulse_agent_complete.main import build_dispatcher, run_once
+    from pulse_agent_complete.sites import get_sites
+    from pulse_agent_complete.state_manager import StateManager
+
+    driver = FakeDriver(args.db_latency_ms)
+    sites = get_sites()
+    for site in sites:
+        site.build_db_clients = lambda sources=None: {DEFAULT_SOURCE: FakeDatabaseClient(driver)}
+
+    concurrency = min(args.sites, 8)
+    dispatcher = build_dispatcher(pool_size=concurrency)
+    first_request = len(collector.requests)
+
+    cycle_ms = []
+    for _ in range(args.cycles):
+        start = time.perf_counter()
+        run_once(sites, dispatcher, concurrency)
+        cycle_ms.append((time.perf_counter() - start) * 1000)
+        if args.interval:
+            time.sleep(args.interval)
+
+    records = collector.requests[first_request:]
+    problems = [] if records else ["no pushes reached the collector"]
+    retried_early = 0
+    for site in sites:
+        site_records = [record for record in records
+                        if record["payload"] and record["payload"].get("site_id") == site.site_id]
+        final_batch_index = StateManager(site.data_filepath).get_batch_index()
+        problems.extend(check_site(site.site_id, site_records, final_batch_index))
+        retried_early += early_retries(site_records, collector.faults.retry_after)
+
+    accepted = sum(1 for record in records if record["status"] == 200)
+    return {
+        "cycles": args.cycles,
+        "sites": args.sites,
+        "attempts": len(records),
+        "accepted": accepted,
+        "payloads_per_s": round(accepted / (sum(cycle_ms) / 1000), 1),
+        "wire_bytes": sum(record["wire_bytes"] for record in records),
+        "cycle_p50_ms": round(percentile(cycle_ms, 0.50), 2),
+        "cycle_p99_ms": round(percentile(cycle_ms, 0.99), 2),
+        "faults": dict(Counter(record["fault"] or "none" for record in records)),
+        "retried_before_retry_after": retried_early,
+        "problems": problems
+    }
+
+
+def main() -> int:
+    """Run both phases and print their results"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--payloads", type=int, default=500, help="payloads pushed in the http phase")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads in the http phase")
+    parser.add_argument("--containers", type=int, default=100, help="containers per payload")
+    parser.add_argument("--cycles", type=int, default=20, help="agent cycles in the flow phase")
+    parser.add_argument("--sites", type=int, default=4, help="sites in the flow phase")
+    parser.add_argument("--queries", type=int, default=20, help="queries per site in the flow phase")
+    parser.add_argument("--db-latency-ms", type=float, default=0.2, help="latency of each fake query")
+    parser.add_argument("--interval", type=float, default=0, help="seconds between flow cycles")
+    parser.add_argument("--latency-ms", type=float, default=5, help="collector delay before every response")
+    parser.add_argument("--jitter-ms", type=float, default=5, help="additional random collector delay")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--reset-rate", type=float, default=0.05)
+    parser.add_argument("--retry-after-rate", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status,
+                    args.reset_rate, args.retry_after_rate, args.retry_after, args.seed)
+    with StandinCollector(faults=faults) as collector, tempfile.TemporaryDirectory() as data_dir:
+        configure_agent(collector, Path(data_dir), args)
+        results = {
+            "http": run_http_phase(collector, args),
+            "flow": run_flow_phase(collector, args)
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for phase, metrics in results.items():
+            print(f"[{phase}]")
+            for key, value in metrics.items():
+                if key != "problems":
+                    print(f"  {key:<26} {value}")
+        for problem in results["flow"]["problems"]:
+            print(f"PROBLEM {problem}")
+
+    if results["flow"]["problems"]:
+        return 1
+    print("State consistent under failure")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
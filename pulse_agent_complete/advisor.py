@@ -0,0 +1,301 @@
+"""
+Index advisor for Pulse Agent
+Explains the configured queries against the live schema and suggests indexes
+
+`pulse-agent advise` runs EXPLAIN (never EXPLAIN ANALYZE, so nothing is
+executed) for every database query with representative parameters, walks
+the plan for full table scans, looks up the scanned tables' indexes in the
+catalog and suggests an index on the filtered columns where none covers
+them. The report is printed as JSON for fleet-wide tooling.
+"""
+
+import argparse
+import json
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from .aggregator import DEFAULT_SOURCE, NON_DB_TYPES, db_sources
+from .db_client import DatabaseClient, QueryLoader
+from .sites import SiteConfig
+
+logger = logging.getLogger(__name__)
+
+# Operators whose left-hand column can use a btree index; equality columns
+# are placed before range columns in a suggested index
+EQUALITY_OPERATORS = ("=", "IS", "IN")
+CONDITION = re.compile(
+    r"([A-Za-z_][A-Za-z0-9_]*)\)*(?:::[A-Za-z ]+?)?\)*\s*(>=|<=|<>|!=|=|>|<|~~|IS\b|IN\b|BETWEEN\b|LIKE\b)",
+    re.IGNORECASE
+)
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+# A boolean column used on its own: PostgreSQL prints col = true as "col"
+# and col = false as "NOT col"
+BOOLEAN_TERM = re.compile(r"(?:NOT\s+)?([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+CONJUNCTION = re.compile(r"\b(?:AND|OR)\b", re.IGNORECASE)
+
+# One row per index key column, in index order; INCLUDE columns are left out
+# and expression keys have no column name
+PG_INDEXES_SQL = """
+SELECT i.relname AS index_name, a.attname AS column_name
+FROM pg_index x
+JOIN pg_class t ON t.oid = x.indrelid
+JOIN pg_class i ON i.oid = x.indexrelid
+CROSS JOIN LATERAL unnest(x.indkey::smallint[]) WITH ORDINALITY AS k(attnum, position)
+LEFT JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum AND k.attnum > 0
+WHERE t.relname = %(table)s AND k.position <= x.indnkeyatts
+ORDER BY i.relname, k.position
+"""
+MYSQL_INDEXES_SQL = """
+SELECT INDEX_NAME AS index_name, COLUMN_NAME AS column_name
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %(table)s
+ORDER BY INDEX_NAME, SEQ_IN_INDEX
+"""
+PG_COLUMNS_SQL = "SELECT column_name FROM information_schema.columns WHERE table_name = %(table)s"
+MYSQL_COLUMNS_SQL = """
+SELECT COLUMN_NAME AS column_name FROM information_schema.columns
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %(table)s
+"""
+
+
+def add_advise_arguments(parser: argparse.ArgumentParser):
+    """Register the `advise` CLI options"""
+    parser.add_argument("--window", type=int, default=3600,
+                        help="seconds between start_time and end_time in the EXPLAIN parameters")
+    parser.add_argument("--query", action="append", dest="queries",
+                        help="only explain this query (repeatable)")
+
+
+def run_advise_command(args: argparse.Namespace, site: SiteConfig) -> int:
+    """
+    Execute the `advise` CLI command
+
+    Args:
+        args: Parsed arguments
+        site: Site whose queries and databases are checked
+
+    Returns:
+        Process exit code
+    """
+    query_loader = QueryLoader(site.queries_file)
+    advisor = IndexAdvisor(site.build_db_clients(db_sources(query_loader)), query_loader)
+    report = advisor.advise(args.queries, args.window)
+    report.update({"site": site.name, "client_id": site.client_id, "site_id": site.site_id})
+    print(json.dumps(report, indent=2, default=str))
+    return 1 if any("error" in query for query in report["queries"]) else 0
+
+
+class IndexAdvisor:
+    """Explains queries and inspects catalog indexes on each data source"""
+
+    def __init__(self, sources: Dict[str, DatabaseClient], query_loader: QueryLoader):
+        """
+        Initialize index advisor
+
+        Args:
+            sources: Database clients by data source name
+            query_loader: Loaded queries
+        """
+        self.sources = sources
+        self.query_loader = query_loader
+        self._indexes: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        self._columns: Dict[Tuple[str, str, str], List[str]] = {}
+
+    def advise(self, query_names: Optional[List[str]] = None, window_seconds: int = 3600) -> Dict[str, Any]:
+        """
+        Explain every database query and collect index suggestions
+
+        Args:
+            query_names: Queries to explain (all database queries if omitted)
+            window_seconds: Length of the time window used as parameters
+
+        Returns:
+            Report with one entry per query and the distinct suggested DDL
+        """
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(seconds=window_seconds)
+        params = {
+            "start_time": start.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+            "end_time": end.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+        }
+        # Keyset statements get a mark at the start of the window
+        params.update(last_id=0, last_time=params["start_time"], upper_time=params["end_time"])
+
+        by_source: Dict[str, List[str]] = {}
+        for query_name, query_config in self.query_loader.get_all_queries().items():
+            if query_names and query_name not in query_names:
+                continue
+            if query_config.get("type", "count") in NON_DB_TYPES:
+                continue
+            by_source.setdefault(query_config.get("source", DEFAULT_SOURCE), []).append(query_name)
+
+        results = []
+        for source, names in by_source.items():
+            results.extend(self._advise_source(source, names, params))
+
+        suggestions = []
+        for result in results:
+            for scan in result.get("seq_scans", []):
+                ddl = scan.get("suggested_index")
+                if ddl and ddl not in suggestions:
+                    suggestions.append(ddl)
+
+        return {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "parameters": {"start_time": params["start_time"], "end_time": params["end_time"]},
+            "queries": results,
+            "suggested_indexes": suggestions
+        }
+
+    def _advise_source(self, source: str, query_names: List[str],
+                       params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Explain one data source's queries on its own connection"""
+        db_client = self.sources.get(source)
+        if db_client is None or not db_client.connect() or not db_client.is_connected():
+            error = f"Data source '{source}' is not configured or unreachable"
+            return [{"query": name, "source": source, "error": error} for name in query_names]
+
+        try:
+            results = []
+            for query_name in query_names:
+                query_config = self.query_loader.get_query(query_name)
+                statements = [("sql", query_config["sql"])]
+                keyset = query_config.get("keyset")
+                if keyset:
+                    statements += [("keyset.sql", keyset["sql"]), ("keyset.seed_sql", keyset["seed_sql"])]
+                for statement, sql in statements:
+                    result = {"query": query_name, "source": source, "db_type": db_client.db_type}
+                    if statement != "sql":
+                        result["statement"] = statement
+                    try:
+                        result.update(self._explain(db_client, sql, params,
+                                                    self.query_loader.get_timeout_ms(query_name)))
+                    except Exception as e:
+                        logger.error(f"Failed to explain query '{query_name}': {e}")
+                        result["error"] = str(e)
+                    results.append(result)
+            return results
+        finally:
+            db_client.disconnect()
+
+    def _explain(self, db_client: DatabaseClient, sql: str, params: Dict[str, Any],
+                 timeout_ms: Optional[int]) -> Dict[str, Any]:
+        """Explain one statement and describe its full table scans"""
+        sql = sql.strip().rstrip(";")
+        if db_client.db_type == "postgresql":
+            rows = db_client.execute_query(f"EXPLAIN (FORMAT JSON) {sql}", params, timeout_ms=timeout_ms)
+            plan = _json_value(rows[0]["QUERY PLAN"])[0]["Plan"]
+            summary = {"estimated_cost": plan.get("Total Cost"), "estimated_rows": plan.get("Plan Rows")}
+            scans = [{"table": node["Relation Name"], "filter": node.get("Filter"),
+                      "estimated_rows": node.get("Plan Rows")}
+                     for node in _walk(plan) if node.get("Node Type") == "Seq Scan"]
+        else:
+            rows = db_client.execute_query(f"EXPLAIN FORMAT=JSON {sql}", params, timeout_ms=timeout_ms)
+            plan = _json_value(next(iter(rows[0].values())))["query_block"]
+            cost = plan.get("cost_info", {}).get("query_cost")
+            summary = {"estimated_cost": float(cost) if cost is not None else None}
+            scans = [{"table": node["table_name"], "filter": node.get("attached_condition"),
+                      "estimated_rows": node.get("rows_examined_per_scan")}
+                     for node in _walk(plan) if node.get("access_type") == "ALL" and "table_name" in node]
+
+        for scan in scans:
+            scan["indexes"] = self._table_indexes(db_client, scan["table"])
+            ddl = self._suggest_index(db_client, scan)
+            if ddl:
+                scan["suggested_index"] = ddl
+
+        summary["seq_scans"] = scans
+        return summary
+
+    def _table_indexes(self, db_client: DatabaseClient, table: str) -> List[Dict[str, Any]]:
+        """Indexes of a table as name and column list, cached per source"""
+        key = (db_client.host, db_client.database, table)
+        if key in self._indexes:
+            return self._indexes[key]
+
+        sql = PG_INDEXES_SQL if db_client.db_type == "postgresql" else MYSQL_INDEXES_SQL
+        by_name: Dict[str, List[Optional[str]]] = {}
+        for row in db_client.execute_query(sql, {"table": table}):
+            by_name.setdefault(row["index_name"], []).append(row["column_name"])
+        indexes = [{"name": name, "columns": columns} for name, columns in by_name.items()]
+
+        self._indexes[key] = indexes
+        return indexes
+
+    def _table_columns(self, db_client: DatabaseClient, table: str) -> List[str]:
+        """Column names of a table, cached per source"""
+        key = (db_client.host, db_client.database, table)
+        if key not in self._columns:
+            sql = PG_COLUMNS_SQL if db_client.db_type == "postgresql" else MYSQL_COLUMNS_SQL
+            self._columns[key] = [row["column_name"] for row in db_client.execute_query(sql, {"table": table})]
+        return self._columns[key]
+
+    def _suggest_index(self, db_client: DatabaseClient, scan: Dict[str, Any]) -> Optional[str]:
+        """
+        DDL for an index on a scanned table's filter columns
+
+        Equality columns come first, then range columns. Nothing is suggested
+        when the filter has no usable column or an existing index already
+        starts with the equality columns (in any order) followed by the range
+        column.
+        """
+        if not scan.get("filter"):
+            return None
+
+        table = scan["table"]
+        table_columns = set(self._table_columns(db_client, table))
+        equality, ranges = [], []
+        for column, operator in _filter_conditions(scan["filter"]):
+            if column not in table_columns or column in equality or column in ranges:
+                continue
+            (equality if operator.upper() in EQUALITY_OPERATORS else ranges).append(column)
+        columns = equality + ranges[:1]
+        if not columns:
+            return None
+
+        for index in scan["indexes"]:
+            leading = index["columns"][:len(columns)]
+            if set(leading[:len(equality)]) == set(equality) and leading[len(equality):] == ranges[:1]:
+                return None
+
+        name = f"idx_{table}_{'_'.join(columns)}"[:63]
+        if db_client.db_type == "postgresql":
+            return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)});"
+        return f"CREATE INDEX {name} ON {table} ({', '.join(columns)});"
+
+
+def _filter_conditions(condition: str) -> List[Tuple[str, str]]:
+    """Column and operator pairs of a plan's filter text"""
+    condition = STRING_LITERAL.sub("''", condition.replace("`", ""))
+    # Drop schema and table qualifiers (MySQL prints db.table.column)
+    condition = re.sub(r"\b\w+\.", "", condition)
+    conditions = []
+    for column, operator in CONDITION.findall(condition):
+        if operator in ("<>", "!="):
+            continue
+        conditions.append((column, operator))
+    for term in CONJUNCTION.split(condition):
+        match = BOOLEAN_TERM.fullmatch(term.strip("() \t\n"))
+        if match:
+            conditions.append((match.group(1), "="))
+    return conditions
+
+
+def _walk(node: Any):
+    """Yield every object in a JSON plan"""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def _json_value(value: Any) -> Any:
+    """Parse a plan returned as JSON text (drivers may already decode it)"""
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode()
+    return json.loads(value) if isinstance(value, str) else value
@@ -3,37 +3,116 @@ Data aggregator for Pulse Agent
 Executes SQL queries and aggregates results into the expected JSON format
 """
 
+import contextvars
 import logging
-from typing import Dict, Any, Optional
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
 
-from .db_client import DatabaseClient, QueryLoader
+from .change_feed import ChangeFeed
+from .db_client import DatabaseClient, QueryLoader, QueryTimeoutError
 from .docker_client import DockerClient
+from .expressions import ExpressionError
+from .profiling import CycleProfiler, phase
+from .scheduler import QueryScheduler
 from .system_client import SystemClient
 from .config import Config
 
+if TYPE_CHECKING:
+    from .isolation import CollectorPool
+
 logger = logging.getLogger(__name__)
 
+# Data source used by queries without a "source" field
+DEFAULT_SOURCE = "default"
+
+# Query types collected from the host rather than a data source
+HOST_TYPES = ("docker", "system")
+
+# Query types that never touch a database
+NON_DB_TYPES = HOST_TYPES + ("constant", "derived")
+
+
+def db_sources(query_loader: QueryLoader) -> Set[str]:
+    """Data sources the loaded database queries run on"""
+    return {config.get("source", DEFAULT_SOURCE) for config in query_loader.get_all_queries().values()
+            if config.get("type", "count") not in NON_DB_TYPES}
+
 
 class DataAggregator:
     """Aggregates data from database queries into JSON format"""
 
-    def __init__(self, db_client: DatabaseClient, query_loader: QueryLoader,
+    def __init__(self, db_client: Optional[DatabaseClient], query_loader: QueryLoader,
                  docker_client: Optional[DockerClient] = None,
-                 system_client: Optional[SystemClient] = None):
+                 system_client: Optional[SystemClient] = None,
+                 sources: Optional[Dict[str, DatabaseClient]] = None,
+                 scheduler: Optional[QueryScheduler] = None,
+                 deadline: Optional[float] = None,
+                 snapshot: bool = False,
+                 keyset_marks: Optional[Dict[str, Dict[str, Any]]] = None,
+                 profiler: Optional[CycleProfiler] = None,
+                 change_feed: Optional[ChangeFeed] = None,
+                 collector_pool: Optional["CollectorPool"] = None,
+                 host_facts: Optional[Dict[str, Any]] = None):
         """
         Initialize data aggregator
 
         Args:
-            db_client: Database client instance
+            db_client: Database client instance (the default data source; None
+                when no query uses it)
             query_loader: Query loader instance
-            docker_client: Docker client instance (optional)
-            system_client: System metrics client instance (optional)
+            docker_client: Docker client instance (created on first use if omitted)
+            system_client: System metrics client instance (created on first use if omitted)
+            sources: Additional named data sources (optional)
+            scheduler: Per-query scheduler; without it every query runs every cycle
+            deadline: time.monotonic() by which database queries must finish (optional)
+            snapshot: Run each source's queries in one read-only REPEATABLE READ
+                transaction, batched into a single round trip where possible
+            keyset_marks: Stored high-water marks of keyset queries
+            profiler: Cycle profiler timing the connect, queries, docker and
+                system phases (optional)
+            change_feed: Live counts answering queries with a "feed" instead
+                of their SQL (optional)
+            collector_pool: Worker processes running the isolated host
+                collectors (optional)
+            host_facts: Cached host facts for the system metrics; computed
+                when omitted
         """
         self.db_client = db_client
+        self.sources = {DEFAULT_SOURCE: db_client} if db_client is not None else {}
+        self.sources.update(sources or {})
+        self.scheduler = scheduler
+        self.deadline = deadline
+        self.snapshot = snapshot
+        self.keyset_marks = keyset_marks or {}
+        self.profiler = profiler
+        self.change_feed = change_feed
+        self.collector_pool = collector_pool
+        self.host_facts = host_facts
+        # Isolated collectors killed for missing their deadline this cycle
+        self.killed_collectors: List[str] = []
+        # Marks reached this cycle; the caller stores them once the push commits
+        self.new_keyset_marks: Dict[str, Dict[str, Any]] = {}
         self.query_loader = query_loader
-        self.docker_client = docker_client or DockerClient()
-        self.system_client = system_client or SystemClient()
+        # Host clients import docker / psutil and contact the daemon, so they
+        # are only created when a docker or system query runs
+        self._docker_client = docker_client
+        self._system_client = system_client
+
+    @property
+    def docker_client(self) -> DockerClient:
+        """Docker client, created on first use"""
+        if self._docker_client is None:
+            self._docker_client = DockerClient()
+        return self._docker_client
+
+    @property
+    def system_client(self) -> SystemClient:
+        """System metrics client, created on first use"""
+        if self._system_client is None:
+            self._system_client = SystemClient()
+        return self._system_client
 
     def fetch_stats(self, start_time: str, end_time: str,
                    client_id: str, site_id: str) -> Dict[str, Any]:
@@ -47,7 +126,17 @@ class DataAggregator:
             site_id: Site identifier
 
         Returns:
-            Dictionary containing aggregated stats in expected format
+            Dictionary containing aggregated stats in expected format, plus
+            "source_errors" naming data sources that failed (their queries
+            report defaults) and "carried_forward" giving the age in seconds
+            of values reused from an earlier cycle, "timeouts" listing
+            queries that were cancelled (they report defaults), and
+            "change_feed" with the queries answered by the change feed, and
+            "killed_collectors" naming isolated collectors that were killed, and
+            "host_facts" with the host facts the system metrics used
+
+        Raises:
+            ConnectionError: If no data source could be queried
         """
         start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
         end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
@@ -61,8 +150,60 @@ class DataAggregator:
 
         db_stats = {}
         system_metrics = None
+        host_facts = None
         docker_metrics = None
-        aggregation_order = self.query_loader.get_aggregation_order()
+        aggregation_order = (self.query_loader.get_aggregation_order()
+                             or list(self.query_loader.get_all_queries()))
+        evaluation_order, cyclic = self._evaluation_order(aggregation_order)
+
+        # Queries scheduled less often than every cycle and not due now carry
+        # their last value forward
+        scheduler = self.scheduler
+        skipped = set()
+        if scheduler is not None:
+            for query_name in evaluation_order:
+                query_config = self.query_loader.get_query(query_name)
+                if (query_config.get("type", "count") not in NON_DB_TYPES
+                        and not scheduler.is_due(query_name, query_config,
+                                                 self.query_loader.get_compiled(query_name).fingerprint)):
+                    skipped.add(query_name)
+            if skipped:
+                logger.info(f"Skipping {len(skipped)} queries not due this cycle: {', '.join(sorted(skipped))}")
+
+        # Count queries the change feed can answer skip their SQL
+        fed = {}
+        if self.change_feed is not None:
+            for query_name in evaluation_order:
+                feed = self.query_loader.get_query(query_name).get("feed")
+                if feed and query_name not in skipped:
+                    value = self.change_feed.count(feed["table"], feed.get("state"))
+                    if value is not None:
+                        fed[query_name] = value
+
+        # Queries cancelled by their timeout or the cycle deadline
+        timed_out: Set[str] = set()
+
+        # Group database queries by data source, keeping evaluation order
+        source_queries: Dict[str, List[str]] = {}
+        for query_name in evaluation_order:
+            query_config = self.query_loader.get_query(query_name)
+            if (query_config.get("type", "count") not in NON_DB_TYPES and query_name not in skipped
+                    and query_name not in fed):
+                source = query_config.get("source", DEFAULT_SOURCE)
+                source_queries.setdefault(source, []).append(query_name)
+
+        # Sources are queried concurrently, each on its own connection, while
+        # host metrics are collected on this thread
+        executor = None
+        futures = {}
+        if len(source_queries) > 1:
+            executor = ThreadPoolExecutor(max_workers=len(source_queries), thread_name_prefix="source")
+            futures = {
+                # In a copy of this thread's context, so log records keep the site tag
+                source: executor.submit(contextvars.copy_context().run, self._run_source,
+                                        source, names, params, timed_out)
+                for source, names in source_queries.items()
+            }
 
         # Execute queries in specified order
         for query_name in aggregation_order:
@@ -72,13 +213,13 @@ class DataAggregator:
                 continue
 
             query_type = query_config.get("type", "count")
-            default_value = query_config.get("default", 0)
 
             # Handle Docker queries - collect detailed metrics once
             if query_type == "docker":
                 if docker_metrics is None:
                     try:
-                        docker_metrics = self.docker_client.get_detailed_metrics()
+                        with phase(self.profiler, "docker"):
+                            docker_metrics = self._collect_host("docker", "get_detailed_metrics")
                         logger.info("Docker metrics collected successfully")
                     except Exception as e:
                         logger.error(f"Failed to get Docker metrics: {e}")
@@ -100,7 +241,9 @@ class DataAggregator:
             # Handle system metrics query
             if query_type == "system":
                 try:
-                    system_metrics = self.system_client.get_all_metrics()
+                    with phase(self.profiler, "system"):
+                        system_metrics = self._collect_host("system", "get_all_metrics", self.host_facts)
+                    host_facts = system_metrics.pop("facts", None)
                     logger.info("System metrics collected successfully")
                 except Exception as e:
                     logger.error(f"Failed to get system metrics: {e}")
@@ -113,45 +256,66 @@ class DataAggregator:
                     }
                 continue
 
-            # Handle database queries
-            sql = query_config.get("sql")
+        # Handle database queries
+        source_errors = {}
+        source_results = {}
+        for source, names in source_queries.items():
             try:
-                results = self.db_client.execute_query(sql, params)
-
-                if query_type == "count":
-                    # Extract count from result
-                    if results and len(results) > 0:
-                        # Handle different result formats
-                        result = results[0]
-                        if isinstance(result, dict):
-                            # Try common count column names
-                            count = result.get("count") or result.get("COUNT(*)") or result.get("total", 0)
-                        else:
-                            count = result[0] if isinstance(result, (list, tuple)) else result
-                        db_stats[query_name] = int(count) if count is not None else 0
-                    else:
-                        db_stats[query_name] = 0
-
-                elif query_type == "single_value":
-                    # Extract single value from result
-                    if results and len(results) > 0:
-                        result = results[0]
-                        if isinstance(result, dict):
-                            # Get first value from dictionary
-                            value = next(iter(result.values()), default_value)
-                        else:
-                            value = result[0] if isinstance(result, (list, tuple)) else result
-                        db_stats[query_name] = value
-                    else:
-                        db_stats[query_name] = default_value
-
+                if source in futures:
+                    source_results.update(futures[source].result())
                 else:
-                    logger.warning(f"Unknown query type: {query_type} for query '{query_name}'")
-                    db_stats[query_name] = default_value
-
+                    source_results.update(self._run_source(source, names, params, timed_out))
             except Exception as e:
-                logger.error(f"Failed to execute query '{query_name}': {e}")
-                db_stats[query_name] = default_value
+                logger.error(f"Data source '{source}' failed, using defaults for "
+                             f"{len(names)} queries: {e}")
+                source_errors[source] = str(e)
+        if executor is not None:
+            executor.shutdown()
+
+        if source_queries and len(source_errors) == len(source_queries):
+            # Nothing could be collected from any data source
+            raise ConnectionError("Database connection failed")
+
+        # Constants and derived metrics are evaluated in-process, each after
+        # the metrics it references
+        values = {}
+        carried_forward = {}
+        for query_name in evaluation_order:
+            query_config = self.query_loader.get_query(query_name)
+            query_type = query_config.get("type", "count")
+            default_value = query_config.get("default", 0)
+
+            if query_name in skipped:
+                values[query_name] = scheduler.carried_value(query_name)
+                carried_forward[query_name] = scheduler.age(query_name)
+            elif query_name in fed:
+                values[query_name] = fed[query_name]
+            elif query_type == "constant":
+                values[query_name] = query_config.get("value", default_value)
+            elif query_type == "derived":
+                if query_name in cyclic:
+                    values[query_name] = default_value
+                    continue
+                try:
+                    values[query_name] = self.query_loader.get_compiled(query_name).expression.evaluate(values)
+                except ExpressionError as e:
+                    logger.error(f"Failed to evaluate derived metric '{query_name}': {e}")
+                    values[query_name] = default_value
+            elif query_type not in HOST_TYPES:
+                values[query_name] = source_results.get(query_name, default_value)
+
+        for query_name in aggregation_order:
+            if query_name in values:
+                db_stats[query_name] = values[query_name]
+
+        if scheduler is not None:
+            scheduled = [name for name in evaluation_order
+                         if QueryScheduler.is_scheduled(self.query_loader.get_query(name))]
+            for query_name in scheduled:
+                if query_name in source_results or query_name in fed:
+                    scheduler.record(query_name, values[query_name],
+                                     self.query_loader.get_compiled(query_name).fingerprint)
+            scheduler.save(scheduled)
 
         # Build stats object with the new structure
         stats = {
@@ -175,5 +339,366 @@ class DataAggregator:
         response = {
             "stats": stats
         }
+        if source_errors:
+            response["source_errors"] = source_errors
+        if carried_forward:
+            response["carried_forward"] = carried_forward
+        if timed_out:
+            response["timeouts"] = sorted(timed_out)
+        if self.new_keyset_marks:
+            response["keyset_marks"] = dict(self.new_keyset_marks)
+        if self.change_feed is not None:
+            response["change_feed"] = dict(self.change_feed.status(), queries=sorted(fed))
+        if self.killed_collectors:
+            response["killed_collectors"] = self.killed_collectors
+        if host_facts:
+            response["host_facts"] = host_facts
 
         return response
+
+    def _collect_host(self, kind: str, method: str, *args: Any) -> Any:
+        """
+        Run a host collector's method, in a worker process when the kind is isolated
+
+        An isolated collector gets the pool's timeout, capped by the cycle
+        deadline; one that misses it is killed and recorded in killed_collectors.
+        """
+        pool = self.collector_pool
+        if pool is None or kind not in pool.kinds:
+            client = self.docker_client if kind == "docker" else self.system_client
+            return getattr(client, method)(*args)
+
+        from .isolation import CollectorKilled
+        timeout = pool.timeout
+        remaining_ms = self._remaining_ms()
+        if remaining_ms is not None:
+            timeout = min(timeout, max(0, remaining_ms) / 1000)
+        try:
+            return pool.collect(kind, method, timeout, args)
+        except CollectorKilled:
+            self.killed_collectors.append(kind)
+            raise
+
+    def sample(self, query_names: List[str], params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Current values of a few count or single_value queries, for trigger rules
+
+        Queries with a "feed" are read from the change feed when it is live.
+        The others run on their source's connection, which is opened if needed
+        and left open for the next sample with its transaction ended, so the
+        next sample reads fresh data and no locks are held in between; a source
+        none of whose queries succeeded is disconnected so the next sample
+        reconnects. Queries that fail are left out.
+
+        Args:
+            query_names: Queries to sample
+            params: Query parameters (start_time and end_time)
+
+        Returns:
+            Dictionary of query name to value for the queries that succeeded
+        """
+        values = {}
+        source_queries: Dict[str, List[str]] = {}
+        for query_name in query_names:
+            query_config = self.query_loader.get_query(query_name)
+            feed = query_config.get("feed")
+            if feed and self.change_feed is not None:
+                value = self.change_feed.count(feed["table"], feed.get("state"))
+                if value is not None:
+                    values[query_name] = value
+                    continue
+            source_queries.setdefault(query_config.get("source", DEFAULT_SOURCE), []).append(query_name)
+
+        for source, names in source_queries.items():
+            db_client = self.sources.get(source)
+            if db_client is None:
+                logger.warning(f"Data source '{source}' is not configured, not sampling {', '.join(names)}")
+                continue
+            if not db_client.is_connected():
+                db_client.connect()
+                if not db_client.is_connected():
+                    logger.warning(f"Failed to connect to data source '{source}', not sampling {', '.join(names)}")
+                    continue
+            for query_name in names:
+                try:
+                    values[query_name] = self._run_query(db_client, query_name,
+                                                         self.query_loader.get_query(query_name), params,
+                                                         self.query_loader.get_timeout_ms(query_name),
+                                                         keyset=False)
+                except Exception as e:
+                    logger.warning(f"Failed to sample query '{query_name}': {e}")
+            if not any(query_name in values for query_name in names):
+                # A broken connection can still look connected; the next sample reconnects
+                db_client.disconnect()
+            else:
+                db_client.end_transaction()
+        return values
+
+    def _evaluation_order(self, query_names: List[str]) -> Tuple[List[str], Set[str]]:
+        """
+        Order queries so every derived metric follows the metrics it references
+
+        Metrics referenced by derived expressions are included even when they
+        are not listed themselves. Otherwise the given order is kept.
+
+        Returns:
+            Tuple of (ordered query names, names in a dependency cycle)
+        """
+        dependencies: Dict[str, List[str]] = {}
+        pending = list(query_names)
+        while pending:
+            query_name = pending.pop(0)
+            query_config = self.query_loader.get_query(query_name)
+            if query_name in dependencies or not query_config:
+                continue
+            dependencies[query_name] = []
+            if query_config.get("type") == "derived":
+                names = self.query_loader.get_compiled(query_name).expression.names
+                known = [name for name in sorted(names) if self.query_loader.get_query(name)]
+                dependencies[query_name] = known
+                pending.extend(known)
+
+        # Kahn's algorithm, taking ready queries in their original order
+        remaining = {name: set(deps) for name, deps in dependencies.items()}
+        order = []
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                break
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+        cyclic = set(remaining)
+        if cyclic:
+            logger.error(f"Derived metrics with circular references use defaults: {', '.join(sorted(cyclic))}")
+            order.extend(name for name in dependencies if name in cyclic)
+        return order, cyclic
+
+    def _run_source(self, source: str, query_names: List[str],
+                    params: Dict[str, Any], timed_out: Set[str]) -> Dict[str, Any]:
+        """
+        Run a data source's queries on its own connection
+
+        Failing queries are left out of the result, so the caller falls back
+        to their defaults; those that hit their timeout, or would start after
+        the cycle deadline, are also added to timed_out. A source that cannot
+        be reached raises, so the caller can fall back for all of its queries.
+
+        Returns:
+            Dictionary of query name to value for the queries that succeeded
+        """
+        db_client = self.sources.get(source)
+        if db_client is None:
+            raise ValueError(f"Data source '{source}' is not configured or unavailable")
+
+        # Connect unless the caller already did
+        owns_connection = not db_client.is_connected()
+        if owns_connection:
+            with phase(self.profiler, "connect"):
+                db_client.connect()
+            if not db_client.is_connected():
+                raise ConnectionError(f"Failed to connect to data source '{source}'")
+
+        with phase(self.profiler, "queries"):
+            return self._query_source(db_client, source, query_names, params, timed_out, owns_connection)
+
+    def _query_source(self, db_client: DatabaseClient, source: str, query_names: List[str],
+                      params: Dict[str, Any], timed_out: Set[str], owns_connection: bool) -> Dict[str, Any]:
+        """Run a connected data source's queries, disconnecting afterwards if owns_connection"""
+        snapshot = False
+        if self.snapshot:
+            try:
+                db_client.begin_snapshot()
+                snapshot = True
+            except Exception as e:
+                logger.warning(f"Could not open a snapshot on data source '{source}', "
+                               f"running without one: {e}")
+
+        try:
+            # Keyset queries return their high-water mark too, so they are
+            # never batched
+            values = None
+            batch_names = [name for name in query_names
+                           if "keyset" not in self.query_loader.get_query(name)]
+            if snapshot and len(batch_names) > 1:
+                try:
+                    values = self._run_batch(db_client, batch_names, params)
+                except QueryTimeoutError as e:
+                    # Which query was slow is unknown; each reruns under its own timeout
+                    logger.warning(f"Batched queries on data source '{source}' timed out, "
+                                   f"running them one by one with their own timeouts: {e}")
+                except Exception as e:
+                    logger.warning(f"Batched queries on data source '{source}' failed, "
+                                   f"running them one by one: {e}")
+            if values is None:
+                values = self._run_each(db_client, query_names, params, timed_out)
+            else:
+                values.update(self._run_each(db_client, [name for name in query_names if name not in values],
+                                             params, timed_out))
+            return values
+        finally:
+            if snapshot:
+                db_client.end_snapshot()
+            if owns_connection:
+                db_client.disconnect()
+
+    def _run_each(self, db_client: DatabaseClient, query_names: List[str],
+                  params: Dict[str, Any], timed_out: Set[str]) -> Dict[str, Any]:
+        """Run queries one statement at a time, leaving out those that fail"""
+        values = {}
+        for query_name in query_names:
+            query_config = self.query_loader.get_query(query_name)
+            timeout_ms = self.query_loader.get_timeout_ms(query_name)
+            remaining_ms = self._remaining_ms()
+            if remaining_ms is not None:
+                if remaining_ms <= 0:
+                    logger.error(f"Cycle deadline reached, not running query '{query_name}'")
+                    timed_out.add(query_name)
+                    continue
+                timeout_ms = min(timeout_ms or remaining_ms, remaining_ms)
+            try:
+                values[query_name] = self._run_query(db_client, query_name, query_config,
+                                                     params, timeout_ms)
+            except QueryTimeoutError as e:
+                logger.error(f"Query '{query_name}' timed out: {e}")
+                timed_out.add(query_name)
+            except Exception as e:
+                # Left out so the caller falls back to the default
+                logger.error(f"Failed to execute query '{query_name}': {e}")
+        return values
+
+    def _run_batch(self, db_client: DatabaseClient, query_names: List[str],
+                   params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run queries as a single statement in one round trip
+
+        The batch gets the largest of the queries' timeouts, so one slow query
+        holds the cycle no longer than it would on its own. Any failure
+        raises, so the caller can rerun the queries one by one.
+        """
+        statements = [self.query_loader.get_compiled(name).sql for name in query_names]
+        timeouts = [self.query_loader.get_timeout_ms(name) for name in query_names]
+        timeout_ms = max(timeouts) if all(timeouts) else None
+        remaining_ms = self._remaining_ms()
+        if remaining_ms is not None:
+            if remaining_ms <= 0:
+                raise QueryTimeoutError("Cycle deadline reached")
+            timeout_ms = min(timeout_ms or remaining_ms, remaining_ms)
+
+        results = db_client.execute_scalars(statements, params, timeout_ms)
+
+        values = {}
+        for query_name, value in zip(query_names, results):
+            query_config = self.query_loader.get_query(query_name)
+            if query_config.get("type", "count") == "count":
+                values[query_name] = int(value) if value is not None else 0
+            else:
+                values[query_name] = value if value is not None else query_config.get("default", 0)
+        logger.info(f"Ran {len(query_names)} queries in one batch")
+        return values
+
+    def _remaining_ms(self) -> Optional[int]:
+        """Milliseconds left before the cycle deadline, or None without one"""
+        if self.deadline is None:
+            return None
+        return int((self.deadline - time.monotonic()) * 1000)
+
+    def _run_keyset_query(self, db_client: DatabaseClient, query_name: str,
+                          query_config: Dict[str, Any], params: Dict[str, Any],
+                          timeout_ms: Optional[int] = None) -> Any:
+        """
+        Count rows past a query's stored high-water mark
+
+        The keyset SQL gets %(last_id)s, %(last_time)s and %(upper_time)s and
+        returns the count plus the new mark as last_id (and last_time). Rows
+        newer than upper_time (end_time minus overlap_seconds) are left for
+        the next cycle, so late-arriving rows are not skipped. Without a
+        stored mark (or after the query changed) the regular SQL runs up to
+        upper_time and seed_sql sets the first mark.
+        """
+        keyset = query_config["keyset"]
+        fingerprint = self.query_loader.get_compiled(query_name).fingerprint
+        end_dt = datetime.fromisoformat(params["end_time"].replace('Z', '+00:00'))
+        upper_dt = end_dt - timedelta(seconds=float(keyset.get("overlap_seconds", 60)))
+        upper_time = upper_dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+        mark = self.keyset_marks.get(query_name)
+        if mark is None or mark.get("fingerprint") != fingerprint:
+            logger.info(f"Seeding keyset mark for '{query_name}' at {upper_time}")
+            value = self._run_query(db_client, query_name, query_config,
+                                    dict(params, end_time=upper_time), timeout_ms, keyset=False)
+            rows = db_client.execute_query(keyset["seed_sql"], dict(params, upper_time=upper_time),
+                                           timeout_ms=timeout_ms)
+            row = rows[0] if rows else {}
+            self.new_keyset_marks[query_name] = {
+                "last_id": row.get("last_id"),
+                "last_time": _mark_time(row.get("last_time"), upper_time),
+                "fingerprint": fingerprint
+            }
+            return value
+
+        keyset_params = dict(params, last_id=mark.get("last_id"),
+                             last_time=mark.get("last_time"), upper_time=upper_time)
+        rows = db_client.execute_query(keyset["sql"], keyset_params, timeout_ms=timeout_ms)
+        row = rows[0] if rows else {}
+
+        # No new rows keeps the previous mark
+        new_mark = dict(mark)
+        if row.get("last_id") is not None:
+            new_mark["last_id"] = row["last_id"]
+        if row.get("last_time") is not None:
+            new_mark["last_time"] = _mark_time(row["last_time"], upper_time)
+        self.new_keyset_marks[query_name] = new_mark
+
+        count = row.get("count")
+        return int(count) if count is not None else 0
+
+    def _run_query(self, db_client: DatabaseClient, query_name: str,
+                   query_config: Dict[str, Any], params: Dict[str, Any],
+                   timeout_ms: Optional[int] = None, keyset: bool = True) -> Any:
+        """Execute one database query and extract its value"""
+        if keyset and "keyset" in query_config:
+            return self._run_keyset_query(db_client, query_name, query_config, params, timeout_ms)
+
+        query_type = query_config.get("type", "count")
+        default_value = query_config.get("default", 0)
+        sql = query_config.get("sql")
+        results = db_client.execute_query(sql, params, timeout_ms=timeout_ms)
+
+        if query_type == "count":
+            # Extract count from result
+            if results and len(results) > 0:
+                # Handle different result formats
+                result = results[0]
+                if isinstance(result, dict):
+                    # Try common count column names
+                    count = result.get("count") or result.get("COUNT(*)") or result.get("total", 0)
+                else:
+                    count = result[0] if isinstance(result, (list, tuple)) else result
+                return int(count) if count is not None else 0
+            return 0
+
+        elif query_type == "single_value":
+            # Extract single value from result
+            if results and len(results) > 0:
+                result = results[0]
+                if isinstance(result, dict):
+                    # Get first value from dictionary
+                    return next(iter(result.values()), default_value)
+                return result[0] if isinstance(result, (list, tuple)) else result
+            return default_value
+
+        logger.warning(f"Unknown query type: {query_type} for query '{query_name}'")
+        return default_value
+
+
+def _mark_time(value: Any, fallback: str) -> str:
+    """Store a mark timestamp as an ISO 8601 string"""
+    if value is None:
+        return fallback
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,93 @@
+"""
+Bulk push envelopes for Pulse Agent
+Packs several payloads into one request and parses per-item acknowledgements
+
+Request body:  {"items": [payload, ...]}
+Response body: {"results": [{"uuid": "...", "status": "ok" | "error", "error": "..."}, ...]}
+"""
+
+import logging
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Item statuses that count as an acknowledgement
+ACK_STATUSES = ("ok", "accepted", "duplicate")
+
+ENVELOPE_PREFIX = b'{"items":['
+ENVELOPE_SUFFIX = b']}'
+
+
+def build_envelopes(payloads: List[Dict[str, Any]], serializer, max_items: int,
+                    max_bytes: int) -> List[Tuple[bytes, List[str]]]:
+    """
+    Pack payloads into bulk envelopes
+
+    Each payload is encoded once and envelopes are assembled from the encoded
+    bytes. A payload larger than max_bytes on its own still gets an envelope
+    of its own.
+
+    Args:
+        payloads: Push payloads (each with a uuid)
+        serializer: Serializer used to encode each payload
+        max_items: Maximum payloads per envelope
+        max_bytes: Maximum encoded envelope size
+
+    Returns:
+        List of (encoded envelope, uuids in the envelope)
+    """
+    envelopes = []
+    items: List[bytes] = []
+    uuids: List[str] = []
+    size = len(ENVELOPE_PREFIX) + len(ENVELOPE_SUFFIX)
+
+    for payload in payloads:
+        encoded = serializer.encode(payload)
+        item_size = len(encoded) + (1 if items else 0)
+        if items and (len(items) >= max_items or size + item_size > max_bytes):
+            envelopes.append((_join(items), uuids))
+            items, uuids = [], []
+            size = len(ENVELOPE_PREFIX) + len(ENVELOPE_SUFFIX)
+            item_size = len(encoded)
+        items.append(encoded)
+        uuids.append(payload["uuid"])
+        size += item_size
+
+    if items:
+        envelopes.append((_join(items), uuids))
+    return envelopes
+
+
+def _join(items: List[bytes]) -> bytes:
+    """Assemble an envelope from encoded items"""
+    return ENVELOPE_PREFIX + b",".join(items) + ENVELOPE_SUFFIX
+
+
+def parse_acks(response: Optional[Dict[str, Any]], uuids: List[str]) -> Set[str]:
+    """
+    Extract acknowledged uuids from a bulk response
+
+    Items missing from the response, or a response without a results list,
+    are treated as not acknowledged so they are retried.
+    """
+    if response is None:
+        return set()
+
+    results = response.get("results")
+    if not isinstance(results, list):
+        logger.warning("Bulk response has no per-item results, treating all items as failed")
+        return set()
+
+    expected = set(uuids)
+    acked = set()
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        uuid_str = result.get("uuid")
+        if uuid_str not in expected:
+            continue
+        if str(result.get("status", "")).lower() in ACK_STATUSES:
+            acked.add(uuid_str)
+        else:
+            logger.warning(f"Bulk item {uuid_str} rejected: {result.get('error', result.get('status'))}")
+    return acked
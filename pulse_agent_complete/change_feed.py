@@ -0,0 +1,506 @@
+"""
+PostgreSQL change feed for Pulse Agent
+Keeps per-state row counts of selected tables in memory from LISTEN/NOTIFY
+messages sent by triggers, so count queries marked with "feed" in
+queries.json are answered without a COUNT(*) each cycle in long-running mode
+
+The triggers are statement-level: each INSERT, UPDATE or DELETE statement
+sends one notification with the net change per state (nothing when no row
+changed state), so a bulk update costs one message rather than one per row.
+Notifications are only delivered on commit; a rolled-back change never
+reaches the counters.
+
+The counts are reconciled with a real COUNT(*) ... GROUP BY on start, after a
+reconnect and every PA_CHANGE_FEED_RECONCILE seconds. While the listener is
+not connected and reconciled, count() returns None and the queries run as
+SQL as before.
+
+psycopg2 is only imported when a feed connects or the triggers are installed.
+"""
+
+import argparse
+import json
+import logging
+import re
+import select
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = "pulse_agent_counts"
+
+# Names of the installed objects; triggers are <prefix>_<event> on each table
+FUNCTION_NAME = "pulse_agent_feed_notify"
+SEQUENCE_NAME = "pulse_agent_feed_seq"
+TRIGGER_PREFIX = "pulse_agent_feed"
+TRIGGER_EVENTS = ("insert", "update", "delete", "truncate")
+
+# Table, column and channel names are interpolated into SQL
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+
+# Reconnect delays after the listener connection fails, in seconds
+RECONNECT_BACKOFF = (1, 2, 5, 10, 30, 60)
+
+# Longest wait for a notification before checking for stop and reconcile
+POLL_SECONDS = 1.0
+
+INSTALL_FUNCTION = """
+CREATE SEQUENCE IF NOT EXISTS {sequence};
+
+-- TG_ARGV: channel, table name sent in the payload, state column,
+-- soft-delete column ('' when rows are never soft-deleted; otherwise only
+-- rows where it is false are counted)
+CREATE OR REPLACE FUNCTION {function}() RETURNS trigger
+LANGUAGE plpgsql AS $function$
+DECLARE
+    live text := CASE WHEN TG_ARGV[3] = '' THEN 'true'
+                      ELSE format('%I IS FALSE', TG_ARGV[3]) END;
+    changes text;
+    deltas jsonb;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify(TG_ARGV[0], jsonb_build_object(
+            't', TG_ARGV[1], 'x', txid_current(), 's', nextval('{sequence}'), 'truncate', true)::text);
+        RETURN NULL;
+    END IF;
+
+    changes := CASE TG_OP
+        WHEN 'INSERT' THEN format(
+            'SELECT coalesce(%I::text, '''') AS state, 1 AS delta FROM pulse_agent_new WHERE %s',
+            TG_ARGV[2], live)
+        WHEN 'DELETE' THEN format(
+            'SELECT coalesce(%I::text, '''') AS state, -1 AS delta FROM pulse_agent_old WHERE %s',
+            TG_ARGV[2], live)
+        ELSE format(
+            'SELECT coalesce(%1$I::text, '''') AS state, -1 AS delta FROM pulse_agent_old WHERE %2$s '
+            'UNION ALL SELECT coalesce(%1$I::text, '''') AS state, 1 AS delta FROM pulse_agent_new WHERE %2$s',
+            TG_ARGV[2], live)
+    END;
+    EXECUTE format('SELECT jsonb_object_agg(state, delta) FROM ('
+                   'SELECT state, sum(delta) AS delta FROM (%s) AS changes '
+                   'GROUP BY state HAVING sum(delta) <> 0) AS totals', changes)
+        INTO deltas;
+
+    -- The sequence keeps payloads unique: NOTIFY drops a duplicate payload
+    -- sent in the same transaction
+    IF deltas IS NOT NULL THEN
+        PERFORM pg_notify(TG_ARGV[0], jsonb_build_object(
+            't', TG_ARGV[1], 'x', txid_current(), 's', nextval('{sequence}'), 'd', deltas)::text);
+    END IF;
+    RETURN NULL;
+END
+$function$;
+"""
+
+INSTALL_TRIGGERS = """
+DROP TRIGGER IF EXISTS {prefix}_insert ON {table};
+CREATE TRIGGER {prefix}_insert AFTER INSERT ON {table}
+    REFERENCING NEW TABLE AS pulse_agent_new
+    FOR EACH STATEMENT EXECUTE FUNCTION {function}({arguments});
+DROP TRIGGER IF EXISTS {prefix}_update ON {table};
+CREATE TRIGGER {prefix}_update AFTER UPDATE ON {table}
+    REFERENCING OLD TABLE AS pulse_agent_old NEW TABLE AS pulse_agent_new
+    FOR EACH STATEMENT EXECUTE FUNCTION {function}({arguments});
+DROP TRIGGER IF EXISTS {prefix}_delete ON {table};
+CREATE TRIGGER {prefix}_delete AFTER DELETE ON {table}
+    REFERENCING OLD TABLE AS pulse_agent_old
+    FOR EACH STATEMENT EXECUTE FUNCTION {function}({arguments});
+DROP TRIGGER IF EXISTS {prefix}_truncate ON {table};
+CREATE TRIGGER {prefix}_truncate AFTER TRUNCATE ON {table}
+    FOR EACH STATEMENT EXECUTE FUNCTION {function}({arguments});
+"""
+
+
+def validate_feed_config(config: Any, query_sources: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Validate the "change_feed" section of queries.json
+
+    Args:
+        config: The section (an object with "tables" and optionally "channel"
+            and "source")
+        query_sources: Data source of each query with a "feed", by query name
+
+    Returns:
+        The section with defaults filled in
+
+    Raises:
+        ValueError: If the section or a query's feed does not fit it
+    """
+    if not isinstance(config, dict) or not isinstance(config.get("tables"), dict) or not config["tables"]:
+        raise ValueError("\"change_feed\" needs a non-empty \"tables\" object")
+    channel = config.get("channel", DEFAULT_CHANNEL)
+    if not isinstance(channel, str) or not IDENTIFIER.match(channel) or "." in channel:
+        raise ValueError("\"change_feed\" has an invalid channel")
+    for table, settings in config["tables"].items():
+        if not IDENTIFIER.match(table) or not isinstance(settings, dict):
+            raise ValueError(f"\"change_feed\" table '{table}' needs a valid name and an object")
+        for key in ("state_column", "deleted_column"):
+            column = settings.get(key)
+            if (column is None and key == "state_column") or (
+                    column is not None and (not isinstance(column, str) or not IDENTIFIER.match(column)
+                                            or "." in column)):
+                raise ValueError(f"\"change_feed\" table '{table}' has an invalid {key}")
+
+    source = config.get("source", "default")
+    for name, query_source in query_sources.items():
+        if query_source != source:
+            raise ValueError(f"Query '{name}' has a feed but runs on data source '{query_source}', "
+                             f"not the change feed's '{source}'")
+    return dict(config, channel=channel, source=source)
+
+
+def install_sql(config: Dict[str, Any]) -> str:
+    """DDL creating the notify function and the triggers of every feed table"""
+    statements = [INSTALL_FUNCTION.format(function=FUNCTION_NAME, sequence=SEQUENCE_NAME).strip()]
+    for table, settings in config["tables"].items():
+        arguments = ", ".join(f"'{value}'" for value in (
+            config["channel"], table, settings["state_column"], settings.get("deleted_column") or ""))
+        statements.append(INSTALL_TRIGGERS.format(prefix=TRIGGER_PREFIX, table=table,
+                                                  function=FUNCTION_NAME, arguments=arguments).strip())
+    return "BEGIN;\n\n" + "\n\n".join(statements) + "\n\nCOMMIT;\n"
+
+
+def uninstall_sql(config: Dict[str, Any]) -> str:
+    """DDL removing what install_sql() creates"""
+    lines = ["BEGIN;"]
+    for table in config["tables"]:
+        lines.extend(f"DROP TRIGGER IF EXISTS {TRIGGER_PREFIX}_{event} ON {table};" for event in TRIGGER_EVENTS)
+    lines.append(f"DROP FUNCTION IF EXISTS {FUNCTION_NAME}();")
+    lines.append(f"DROP SEQUENCE IF EXISTS {SEQUENCE_NAME};")
+    lines.append("COMMIT;")
+    return "\n".join(lines) + "\n"
+
+
+def parse_snapshot(snapshot: str) -> Tuple[int, int, frozenset]:
+    """Parse txid_current_snapshot() text (xmin:xmax:xip,...)"""
+    xmin, xmax, xip = snapshot.split(":")
+    return int(xmin), int(xmax), frozenset(int(txid) for txid in xip.split(",") if txid)
+
+
+def visible_in_snapshot(txid: int, snapshot: Tuple[int, int, frozenset]) -> bool:
+    """Whether a transaction had committed when the snapshot was taken"""
+    xmin, xmax, xip = snapshot
+    return txid < xmin or (txid < xmax and txid not in xip)
+
+
+def connect(db: Dict[str, Any]):
+    """Open an autocommit psycopg2 connection for db settings"""
+    try:
+        import psycopg2
+    except ImportError:
+        raise ImportError("psycopg2 is required for the change feed. Install with: pip install psycopg2-binary")
+    connection = psycopg2.connect(
+        host=db["host"],
+        port=db["port"],
+        database=db["name"],
+        user=db["user"],
+        password=db["password"],
+        sslmode=db.get("ssl_mode", "prefer"),
+        application_name="pulse-agent-change-feed",
+        connect_timeout=10,
+        # A listener only reads; keepalives detect a dead server or network
+        keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3,
+        **({"options": db["options"]} if db.get("options") else {})
+    )
+    connection.autocommit = True
+    return connection
+
+
+class ChangeFeed:
+    """
+    Per-state row counts of one database's feed tables, kept by a listener thread
+
+    Each notification carries the id of the transaction that sent it. A
+    reconcile counts the tables in a REPEATABLE READ transaction and keeps its
+    snapshot; notifications from transactions the snapshot already saw are
+    skipped, so a change committed while the counts were being taken is
+    applied exactly once.
+    """
+
+    def __init__(self, name: str, db: Dict[str, Any], config: Dict[str, Any],
+                 reconcile_seconds: float = 600.0):
+        """
+        Initialize change feed
+
+        Args:
+            name: Name used for the listener thread and in logs (the site name)
+            db: Settings of the data source with the feed tables (host, port,
+                name, user, password, ssl_mode)
+            config: Validated "change_feed" section of queries.json
+            reconcile_seconds: Seconds between reconciles with a real count
+        """
+        self.name = name
+        self.db = db
+        self.config = config
+        self.reconcile_seconds = reconcile_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._connection = None
+        # table -> state -> rows; only tables whose triggers are installed
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._snapshot = None
+        self._live = False
+        self._reconciled_at = 0.0
+        self.events = 0
+        self.skipped = 0
+        self.reconciles = 0
+        self.drift = 0
+
+    def start(self):
+        """Start the listener thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"change-feed-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the listener thread and close its connection"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def count(self, table: str, state: Any = None) -> Optional[int]:
+        """
+        Rows of a feed table in a state, or in any state when state is None
+
+        States are compared as text ("0" and 0 are the same state); rows whose
+        state is NULL are counted under "".
+
+        Returns:
+            The count, or None when the feed is not live or the table not fed
+        """
+        with self._lock:
+            counts = self._counts.get(table) if self._live else None
+            if counts is None:
+                return None
+            if state is None:
+                return sum(counts.values())
+            return counts.get(str(state), 0)
+
+    def status(self) -> Dict[str, Any]:
+        """Counters for the payload's additional.change_feed"""
+        with self._lock:
+            return {
+                "live": self._live,
+                "tables": sorted(self._counts),
+                "events": self.events,
+                "skipped": self.skipped,
+                "reconciles": self.reconciles,
+                "drift": self.drift,
+                "reconciled_age_s": int(time.monotonic() - self._reconciled_at) if self.reconciles else None
+            }
+
+    def _run(self):
+        """Listen, reconcile and apply notifications until stopped, reconnecting on failure"""
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                self._connection = connect(self.db)
+                self._listen()
+                failures = 0
+                self._serve()
+            except Exception as e:
+                delay = RECONNECT_BACKOFF[min(failures, len(RECONNECT_BACKOFF) - 1)]
+                failures += 1
+                logger.warning(f"[{self.name}] Change feed connection failed, counts run as SQL "
+                               f"until it reconnects (retry in {delay}s): {e}")
+                with self._lock:
+                    self._live = False
+                self._stop.wait(delay)
+            finally:
+                self._close()
+        with self._lock:
+            self._live = False
+
+    def _listen(self):
+        """LISTEN on the channel, then take the initial counts"""
+        cursor = self._connection.cursor()
+        cursor.execute(f"LISTEN {self.config['channel']}")
+        installed = self._installed_tables(cursor)
+        missing = sorted(set(self.config["tables"]) - set(installed))
+        if missing:
+            logger.error(f"[{self.name}] Change feed triggers are not installed on {', '.join(missing)}; "
+                         f"their queries run as SQL (install with: pulse-agent change-feed install)")
+        # Listening before counting: every change the counts miss is notified
+        self._reconcile(cursor, installed)
+        logger.info(f"[{self.name}] Change feed listening on '{self.config['channel']}' "
+                    f"for {', '.join(installed) or 'no tables'}")
+
+    def _installed_tables(self, cursor) -> List[str]:
+        """Feed tables carrying all of the feed's triggers"""
+        installed = []
+        for table in self.config["tables"]:
+            cursor.execute("SELECT count(*) FROM pg_trigger WHERE tgrelid = to_regclass(%s) "
+                           "AND tgname LIKE %s AND NOT tgisinternal",
+                           (table, f"{TRIGGER_PREFIX}\\_%"))
+            if cursor.fetchone()[0] >= len(TRIGGER_EVENTS):
+                installed.append(table)
+        return installed
+
+    def _serve(self):
+        """Apply notifications as they arrive and reconcile when due"""
+        connection = self._connection
+        cursor = connection.cursor()
+        while not self._stop.is_set():
+            due_in = self._reconciled_at + self.reconcile_seconds - time.monotonic()
+            if due_in <= 0:
+                self._reconcile(cursor, list(self._counts))
+                continue
+            if select.select([connection], [], [], min(POLL_SECONDS, due_in))[0]:
+                connection.poll()
+                self._drain()
+
+    def _reconcile(self, cursor, tables: List[str]):
+        """
+        Replace the counts with a real count of every table
+
+        Counts and snapshot come from one REPEATABLE READ transaction.
+        Notifications held back while it ran are delivered at its commit:
+        those of transactions the snapshot saw bring the previous counts up
+        to the same point to measure drift, the rest apply to the new counts.
+        """
+        self._drain()
+        cursor.execute("BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        try:
+            if tables:
+                # Before the snapshot: TRUNCATE is not MVCC-safe, so one
+                # committing mid-count would empty a table the snapshot
+                # still counts as full
+                cursor.execute(f"LOCK TABLE {', '.join(tables)} IN ACCESS SHARE MODE")
+            cursor.execute("SELECT txid_current_snapshot()::text")
+            snapshot = parse_snapshot(cursor.fetchone()[0])
+            counts = {}
+            for table in tables:
+                settings = self.config["tables"][table]
+                where = f"WHERE {settings['deleted_column']} IS FALSE" if settings.get("deleted_column") else ""
+                cursor.execute(f"SELECT coalesce({settings['state_column']}::text, '') AS state, count(*) "
+                               f"FROM {table} {where} GROUP BY 1")
+                counts[table] = {state: int(count) for state, count in cursor.fetchall()}
+        finally:
+            cursor.execute("COMMIT")
+
+        previous = {table: dict(states) for table, states in self._counts.items()}
+        later = []
+        for payload in self._pop_notifications():
+            if visible_in_snapshot(payload["x"], snapshot):
+                _apply(previous, payload)
+            else:
+                later.append(payload)
+
+        drift = sum(abs(counts[table].get(state, 0) - previous.get(table, {}).get(state, 0))
+                    for table in counts for state in set(counts[table]) | set(previous.get(table, {})))
+        with self._lock:
+            self._counts = counts
+            self._snapshot = snapshot
+            self._live = True
+            self._reconciled_at = time.monotonic()
+            for payload in later:
+                _apply(self._counts, payload)
+                self.events += 1
+            self.reconciles += 1
+            if self.reconciles > 1:
+                self.drift = drift
+        if drift and self.reconciles > 1:
+            logger.warning(f"[{self.name}] Change feed counts drifted by {drift} rows since the last "
+                           f"reconcile (notifications were missed); corrected")
+        else:
+            logger.debug(f"[{self.name}] Change feed reconciled {len(counts)} tables")
+
+    def _drain(self):
+        """Apply the notifications received so far"""
+        payloads = self._pop_notifications()
+        if not payloads:
+            return
+        with self._lock:
+            for payload in payloads:
+                if payload.get("t") not in self._counts:
+                    continue
+                if self._snapshot is not None and visible_in_snapshot(payload["x"], self._snapshot):
+                    self.skipped += 1
+                    continue
+                _apply(self._counts, payload)
+                self.events += 1
+
+    def _pop_notifications(self) -> List[Dict[str, Any]]:
+        """Parsed payloads of the connection's queued notifications"""
+        notifies = self._connection.notifies
+        payloads = []
+        while notifies:
+            notify = notifies.pop(0)
+            try:
+                payloads.append(json.loads(notify.payload))
+            except ValueError:
+                logger.warning(f"[{self.name}] Ignoring malformed change feed notification: {notify.payload!r}")
+        return payloads
+
+    def _close(self):
+        """Close the listener connection"""
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+
+def _apply(counts: Dict[str, Dict[str, int]], payload: Dict[str, Any]):
+    """Apply one notification's deltas to counts"""
+    states = counts.get(payload.get("t"))
+    if states is None:
+        return
+    if payload.get("truncate"):
+        states.clear()
+        return
+    for state, delta in payload.get("d", {}).items():
+        states[state] = states.get(state, 0) + delta
+
+
+def add_change_feed_arguments(parser: argparse.ArgumentParser):
+    """Register the `change-feed` CLI options"""
+    parser.add_argument("action", choices=("sql", "install", "uninstall"),
+                        help="print the install DDL, or install or remove the triggers")
+    parser.add_argument("--uninstall-sql", action="store_true",
+                        help="with sql: print the DDL removing the triggers instead")
+
+
+def run_change_feed_command(args: argparse.Namespace, site, query_loader) -> int:
+    """
+    Execute the `change-feed` CLI command
+
+    Args:
+        args: Parsed arguments
+        site: Site whose feed database is changed
+        query_loader: Loaded queries of the site
+
+    Returns:
+        Process exit code
+    """
+    config = query_loader.get_change_feed()
+    if not config:
+        logger.error(f"{query_loader.queries_file} has no \"change_feed\" section")
+        return 2
+
+    if args.action == "sql":
+        print(uninstall_sql(config) if args.uninstall_sql else install_sql(config), end="")
+        return 0
+
+    db = site.sources[config["source"]]
+    if db["type"] != "postgresql":
+        logger.error(f"The change feed needs PostgreSQL; data source '{config['source']}' is {db['type']}")
+        return 2
+    connection = connect(db)
+    try:
+        ddl = install_sql(config) if args.action == "install" else uninstall_sql(config)
+        connection.cursor().execute(ddl)
+    except Exception as e:
+        logger.error(f"Change feed {args.action} failed: {e}")
+        return 1
+    finally:
+        connection.close()
+    logger.info(f"Change feed {'installed on' if args.action == 'install' else 'removed from'} "
+                f"{', '.join(config['tables'])}")
+    return 0
@@ -3,25 +3,38 @@ Configuration management for Pulse Agent
 Supports environment variables with fallback to defaults
 """
 
+import json
 import os
 from pathlib import Path
-from typing import Optional
-
-# Load .env file if it exists
-try:
-    from dotenv import load_dotenv
-    # Look for .env file in current directory and parent directories
-    env_path = Path.cwd() / '.env'
-    if env_path.exists():
-        load_dotenv(env_path)
+from typing import Any, Dict, List, Optional
+
+
+def _load_env_file():
+    """
+    Load a .env file from the current or parent directory, if there is one
+
+    PA_ENV_FILE names the file directly and skips the search; set it to an
+    empty value to skip .env loading. python-dotenv is only imported when a
+    file is found.
+    """
+    if "PA_ENV_FILE" in os.environ:
+        candidates = [os.environ["PA_ENV_FILE"]] if os.environ["PA_ENV_FILE"] else []
     else:
-        # Try parent directory
-        env_path = Path.cwd().parent / '.env'
-        if env_path.exists():
+        cwd = os.getcwd()
+        candidates = [os.path.join(cwd, ".env"), os.path.join(os.path.dirname(cwd), ".env")]
+
+    for env_path in candidates:
+        if os.path.isfile(env_path):
+            try:
+                from dotenv import load_dotenv
+            except ImportError:
+                # python-dotenv not installed, rely on system environment variables
+                return
             load_dotenv(env_path)
-except ImportError:
-    # python-dotenv not installed, rely on system environment variables
-    pass
+            return
+
+
+_load_env_file()
 
 
 class Config:
@@ -34,6 +47,21 @@ class Config:
     TIMEOUT = int(os.getenv("PA_TIMEOUT", "30"))
     PULL_TOKEN = os.getenv("PA_PULL_TOKEN", "")
     PUSH_TOKEN = os.getenv("PA_PUSH_TOKEN", "")
+    PUSH_ENCODING = os.getenv("PA_PUSH_ENCODING", "auto").lower()  # json, orjson, auto, columnar
+    PUSH_STREAMING = os.getenv("PA_PUSH_STREAMING", "false").lower() in ("1", "true", "yes")
+    PUSH_CHUNK_SIZE = int(os.getenv("PA_PUSH_CHUNK_SIZE", "65536"))
+    PUSH_COMPRESS = os.getenv("PA_PUSH_COMPRESS", "true").lower() in ("1", "true", "yes")
+    PUSH_DESTINATIONS = os.getenv("PA_PUSH_DESTINATIONS", "")  # JSON list or path to a JSON file
+    PUSH_COMMIT_POLICY = os.getenv("PA_PUSH_COMMIT_POLICY", "all").lower()  # all, quorum, primary
+    OUTBOX_MAX_ITEMS = int(os.getenv("PA_OUTBOX_MAX_ITEMS", "1000"))
+    BULK_PUSH = os.getenv("PA_BULK_PUSH", "false").lower() in ("1", "true", "yes")
+    BULK_PUSH_URL = os.getenv("PA_BULK_PUSH_URL", "")
+    BULK_MAX_ITEMS = int(os.getenv("PA_BULK_MAX_ITEMS", "50"))
+    BULK_MAX_BYTES = int(os.getenv("PA_BULK_MAX_BYTES", str(5 * 1024 * 1024)))
+
+    # Run History Configuration
+    HISTORY_ENABLED = os.getenv("PA_HISTORY_ENABLED", "true").lower() in ("1", "true", "yes")
+    HISTORY_RETENTION_DAYS = int(os.getenv("PA_HISTORY_RETENTION_DAYS", "30"))
 
     # Database Configuration
     DB_TYPE = os.getenv("PA_DB_TYPE", "postgresql").lower()  # postgresql, mysql
@@ -47,6 +75,37 @@ class Config:
     # Client/Site Configuration
     CLIENT_ID = os.getenv("PA_CLIENT_ID", "pulse-agent-client")
     SITE_ID = os.getenv("PA_SITE_ID", "default-site")
+    DATA_SOURCES = os.getenv("PA_DATA_SOURCES", "")  # JSON object or path to a JSON file
+    QUERY_EXECUTION = os.getenv("PA_QUERY_EXECUTION", "sequential").lower()  # sequential or snapshot
+    CYCLE_DEADLINE = int(os.getenv("PA_CYCLE_DEADLINE", "0"))  # Seconds for a cycle's queries; 0 = none
+    RUN_INTERVAL = int(os.getenv("PA_RUN_INTERVAL", "0"))  # Seconds between cycles; 0 runs once
+    QUERIES_POLL_INTERVAL = float(os.getenv("PA_QUERIES_POLL_INTERVAL", "2"))
+    METRICS_PORT = int(os.getenv("PA_METRICS_PORT", "0"))  # Long-running mode: serve /metrics; 0 = off
+    METRICS_HOST = os.getenv("PA_METRICS_HOST", "127.0.0.1")
+    CHANGE_FEED = os.getenv("PA_CHANGE_FEED", "false").lower() in ("1", "true", "yes")  # Long-running mode
+    CHANGE_FEED_RECONCILE = float(os.getenv("PA_CHANGE_FEED_RECONCILE", "600"))  # Seconds between real counts
+    TRIGGER_TICK = float(os.getenv("PA_TRIGGER_TICK", "10"))  # Long-running mode: seconds between trigger samples; 0 = off
+    TRIGGER_MAX_PUSHES = int(os.getenv("PA_TRIGGER_MAX_PUSHES", "6"))  # Out-of-band pushes per site per hour; 0 = no limit
+    ISOLATE_COLLECTORS = [name.strip().lower() for name in os.getenv("PA_ISOLATE_COLLECTORS", "").split(",")
+                          if name.strip()]  # docker, system: run in killable worker processes
+    COLLECTOR_TIMEOUT = float(os.getenv("PA_COLLECTOR_TIMEOUT", "30"))  # Seconds before an isolated collector is killed
+    HOST_FACTS_TTL = float(os.getenv("PA_HOST_FACTS_TTL", "86400"))  # Seconds host facts are cached; 0 = every cycle
+    SEND_HOST_FACTS = os.getenv("PA_SEND_HOST_FACTS", "always").lower()  # always or changed
+    SITES_FILE = os.getenv("PA_SITES_FILE", "")  # Multi-site mode: JSON file listing sites
+    SITE_CONCURRENCY = int(os.getenv("PA_SITE_CONCURRENCY", "8"))
+
+    # Logging Configuration
+    LOG_LEVEL = os.getenv("PA_LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("PA_LOG_FORMAT", "text").lower()  # text or json
+    LOG_FILE = os.getenv("PA_LOG_FILE", "")
+    LOG_SYSLOG = os.getenv("PA_LOG_SYSLOG", "")  # /dev/log or host:port
+    LOG_RATE_LIMIT = int(os.getenv("PA_LOG_RATE_LIMIT", "10"))  # Warnings/errors per call site per minute; 0 = no limit
+    LOG_ASYNC = os.getenv("PA_LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+
+    # Profiling Configuration
+    PROFILE = os.getenv("PA_PROFILE", "").lower()  # cpu, mem, both; empty = off
+    PROFILE_KEEP = int(os.getenv("PA_PROFILE_KEEP", "10"))  # Reports of each kind kept
+    PROFILE_TOP = int(os.getenv("PA_PROFILE_TOP", "25"))  # Allocation sites per report
 
     # File System Configuration
     @staticmethod
@@ -73,6 +132,74 @@ class Config:
         filename = os.getenv("PA_DATA_FILENAME", "pulse.data")
         return data_dir / filename
 
+    @staticmethod
+    def get_outbox_dir() -> Path:
+        """Get directory holding per-destination outboxes"""
+        return Config.get_data_dir() / "outbox"
+
+    @staticmethod
+    def get_history_filepath() -> Path:
+        """Get path to the SQLite run-history database"""
+        return Config.get_data_dir() / "history.db"
+
+    @staticmethod
+    def get_push_destinations() -> List[Dict[str, Any]]:
+        """
+        Get push destinations
+
+        PA_PUSH_DESTINATIONS may hold a JSON list or the path to a JSON file
+        with a list of {"name", "url", "bulk_url", "token", "timeout", "primary"}
+        objects. Without it, PA_PUSH_URL/PA_BULK_PUSH_URL/PA_PUSH_TOKEN/PA_TIMEOUT
+        form a single destination.
+
+        Raises:
+            ValueError: If the destinations are not valid JSON or an entry has no url
+            OSError: If the destinations file cannot be read
+        """
+        value = Config.PUSH_DESTINATIONS.strip()
+        if not value:
+            return [{
+                "name": "default",
+                "url": Config.PUSH_URL,
+                "bulk_url": Config.BULK_PUSH_URL,
+                "token": Config.PUSH_TOKEN,
+                "timeout": Config.TIMEOUT,
+                "primary": True
+            }]
+
+        if value.startswith("["):
+            destinations = json.loads(value)
+        else:
+            with open(value, 'r') as f:
+                destinations = json.load(f)
+
+        if not isinstance(destinations, list) or not destinations:
+            raise ValueError("PA_PUSH_DESTINATIONS must be a non-empty JSON list")
+        for index, dest in enumerate(destinations):
+            if not isinstance(dest, dict) or not dest.get("url"):
+                raise ValueError(f"PA_PUSH_DESTINATIONS entry {index} has no url")
+            dest.setdefault("token", Config.PUSH_TOKEN)
+            dest.setdefault("timeout", Config.TIMEOUT)
+        return destinations
+
+    @staticmethod
+    def get_data_sources() -> Dict[str, Dict[str, Any]]:
+        """
+        Get named data sources besides the default PA_DB_* database
+
+        PA_DATA_SOURCES may hold a JSON object or the path to a JSON file
+        mapping source names to {"type", "host", "port", "name", "user",
+        "password", "ssl_mode"}; missing settings fall back to PA_DB_*.
+        """
+        value = Config.DATA_SOURCES.strip()
+        if not value:
+            return {}
+
+        if value.startswith("{"):
+            return json.loads(value)
+        with open(value, 'r') as f:
+            return json.load(f)
+
     @staticmethod
     def get_queries_filepath() -> Path:
         """Get path to SQL queries configuration file"""
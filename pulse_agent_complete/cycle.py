@@ -0,0 +1,321 @@
+"""
+Collection cycle for Pulse Agent
+Builds a site's push payload and applies the push outcome to its state
+"""
+
+import json
+import logging
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from .aggregator import DEFAULT_SOURCE, DataAggregator, db_sources
+from .config import Config
+from .db_client import QueryLoader
+from .history import HistoryStore
+from .profiling import CycleProfiler
+from .push import PushResult
+from .scheduler import QueryScheduler
+from .serializers import get_serializer
+from .sites import SiteConfig
+from .state_manager import StateManager
+from .system_client import HOST_FACT_FIELDS, cached_host_facts, facts_hash, read_boot_id
+
+logger = logging.getLogger(__name__)
+
+
+class Cycle:
+    """
+    One site's collect-and-push cycle
+
+    collect() builds the payload (including failure payloads when the
+    database is unreachable), record() stores it in history, and finish()
+    applies the push outcome to state. Pushing itself is left to the caller,
+    so payloads of several sites can be delivered together.
+    """
+
+    def __init__(self, site: SiteConfig, state_manager: StateManager,
+                 history: Optional[HistoryStore] = None,
+                 query_loader: Optional[QueryLoader] = None,
+                 triggers: Optional[List[Dict[str, Any]]] = None):
+        """
+        Initialize cycle
+
+        Args:
+            site: Site being collected
+            state_manager: Site state (lock already held by the caller)
+            history: Site run history (optional)
+            query_loader: Loaded queries (read from the site's queries file if omitted)
+            triggers: Trigger rules that fired, making this an out-of-band cycle (optional)
+        """
+        self.site = site
+        self.state_manager = state_manager
+        self.history = history
+        self.query_loader = query_loader
+        self.triggers = triggers
+        self.started_at = time.time()
+        self.started_monotonic = time.monotonic()
+        self.timings: Dict[str, Any] = {}
+        self.payload: Optional[Dict[str, Any]] = None
+        self.batch_index = 0
+        self.push_uuid = None
+        self.end_time = None
+        # How the push outcome is applied, set by collect()
+        self.save_timestamp = False
+        self.save_failed_uuid = True
+        self.exit_code = 0
+        self.cycle_id = None
+        # Keyset marks reached by this cycle, saved only once its push commits
+        self.keyset_marks: Dict[str, Any] = {}
+        # Hash of the host facts in the payload, saved as pushed once its push commits
+        self.facts_hash = None
+        # Profiles the cycle when PA_PROFILE is set
+        self.profiler = CycleProfiler.from_config(Config.PROFILE, site.data_filepath.parent / "profiles",
+                                                  Config.PROFILE_KEEP, Config.PROFILE_TOP)
+
+    def collect(self) -> Dict[str, Any]:
+        """Collect stats and build the push payload"""
+        collect_start = time.monotonic()
+        state_manager = self.state_manager
+        if self.profiler is not None:
+            self.profiler.start()
+
+        # Read current batch_index
+        batch_index = state_manager.get_batch_index()
+        logger.info(f"Current batch_index: {batch_index}")
+
+        # Display current state; serialized only when DEBUG is on
+        if logger.isEnabledFor(logging.DEBUG):
+            state = state_manager.read_state()
+            if state:
+                logger.debug("Current state: %s", json.dumps(state))
+            else:
+                logger.debug("No existing state file found")
+
+        try:
+            self._collect_stats(batch_index)
+        except ConnectionError as e:
+            logger.error(f"Connection error: {e}")
+            self._build_error_payload(batch_index, "failure", "Database connection failed")
+            self.save_failed_uuid = True
+            self.exit_code = 1
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}", exc_info=True)
+            self._build_error_payload(batch_index, "error", str(e))
+            self.save_failed_uuid = False
+            self.exit_code = 1
+
+        if self.triggers:
+            self.payload["additional"]["triggers"] = self.triggers
+        if self.profiler is not None:
+            self._add_profile()
+        self.timings["collect_ms"] = int((time.monotonic() - collect_start) * 1000)
+        return self.payload
+
+    def _add_profile(self):
+        """Stop collection profiling and add the phase summary to the payload"""
+        profiler = self.profiler
+        with profiler.phase("serialize"):
+            # Encoded once more only to time it; the push encodes its own copy
+            get_serializer(Config.PUSH_ENCODING).encode(self.payload)
+        profiler.stop_collect()
+        self.payload["additional"]["profile"] = profiler.summary(profiler.previous_push())
+
+    def profile_push(self):
+        """Context manager profiling the push on the calling thread"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.profiled_phase("push")
+
+    def _collect_stats(self, batch_index: int):
+        """Query the site and build the regular payload"""
+        site = self.site
+        state_manager = self.state_manager
+
+        # Get start and end times
+        start_time, end_time = state_manager.get_start_end_times()
+        logger.info(f"Query time range: {start_time} to {end_time}")
+
+        # Load SQL queries
+        query_loader = self.query_loader
+        if query_loader is None:
+            logger.info(f"Loading queries from: {site.queries_file}")
+            query_loader = QueryLoader(site.queries_file)
+
+        # Initialize database clients for the data sources the queries use;
+        # creating one imports its driver
+        db_clients = site.build_db_clients(db_sources(query_loader))
+
+        # Initialize aggregator
+        db_client = db_clients.pop(DEFAULT_SOURCE, None)
+        collector_pool = None
+        if Config.ISOLATE_COLLECTORS:
+            from .isolation import get_collector_pool
+            collector_pool = get_collector_pool()
+        deadline = None
+        if Config.CYCLE_DEADLINE > 0:
+            deadline = self.started_monotonic + Config.CYCLE_DEADLINE
+        facts_entry = state_manager.get_host_facts()
+        cached_facts = cached_host_facts(facts_entry, Config.HOST_FACTS_TTL)
+        aggregator = DataAggregator(db_client, query_loader, sources=db_clients,
+                                    scheduler=QueryScheduler(state_manager), deadline=deadline,
+                                    snapshot=Config.QUERY_EXECUTION == "snapshot",
+                                    keyset_marks=state_manager.get_keyset_marks(),
+                                    profiler=self.profiler, change_feed=site.change_feed,
+                                    collector_pool=collector_pool, host_facts=cached_facts)
+
+        # Connect to the data sources and fetch stats; raises ConnectionError
+        # only when none of them could be reached
+        logger.info("=== DATABASE QUERY ===")
+        pull_response = aggregator.fetch_stats(
+            start_time=start_time,
+            end_time=end_time,
+            client_id=site.client_id,
+            site_id=site.site_id
+        )
+
+        # Marks of queries no longer configured are dropped
+        marks = {name: mark for name, mark in state_manager.get_keyset_marks().items()
+                 if "keyset" in (query_loader.get_query(name) or {})}
+        marks.update(pull_response.get("keyset_marks", {}))
+        self.keyset_marks = marks
+
+        # Prepare push payload
+        self.batch_index = batch_index + 1
+        self.push_uuid = state_manager.get_or_generate_push_uuid()
+        self.end_time = end_time
+
+        self.payload = {
+            "client_id": site.client_id,
+            "site_id": site.site_id,
+            "batch_index": self.batch_index,
+            "uuid": self.push_uuid,
+            "stats": pull_response.get("stats", {}),
+            "additional": {}
+        }
+
+        # Update stats status based on success/failure
+        if not pull_response or not pull_response.get("stats"):
+            self.payload["stats"]["status"] = "failure"
+            self.payload["additional"] = {
+                "error_message": "Database query failed or returned no data"
+            }
+        else:
+            self.save_timestamp = True
+
+        if pull_response.get("source_errors"):
+            self.payload["additional"]["source_errors"] = pull_response["source_errors"]
+        if pull_response.get("carried_forward"):
+            self.payload["additional"]["carried_forward"] = pull_response["carried_forward"]
+        if pull_response.get("timeouts"):
+            self.payload["additional"]["timeouts"] = pull_response["timeouts"]
+        if pull_response.get("change_feed"):
+            self.payload["additional"]["change_feed"] = pull_response["change_feed"]
+        if pull_response.get("killed_collectors"):
+            self.payload["additional"]["killed_collectors"] = pull_response["killed_collectors"]
+        if pull_response.get("host_facts"):
+            self._update_host_facts(pull_response["host_facts"], facts_entry, cached_facts)
+
+    def _update_host_facts(self, facts: Dict[str, Any], entry: Dict[str, Any],
+                           cached: Optional[Dict[str, Any]]):
+        """
+        Cache newly computed host facts, and leave facts already pushed out of
+        the payload when PA_SEND_HOST_FACTS is "changed"
+
+        The payload keeps facts_hash, so the receiver can tell they are unchanged.
+        """
+        if cached is None:
+            entry = dict(entry, facts=facts, boot_id=read_boot_id(), computed_at=time.time())
+            self.state_manager.save_host_facts(entry)
+        self.facts_hash = facts_hash(facts)
+
+        system = (self.payload["stats"].get("system_metrics") or {}).get("system")
+        if Config.SEND_HOST_FACTS == "changed" and system and entry.get("pushed_hash") == self.facts_hash:
+            for field in HOST_FACT_FIELDS:
+                system.pop(field, None)
+
+    def _build_error_payload(self, batch_index: int, status: str, error_message: str):
+        """Build a payload reporting a failed collection"""
+        start_time, end_time = self.state_manager.get_start_end_times()
+        self.batch_index = batch_index + 1
+        self.push_uuid = self.state_manager.get_or_generate_push_uuid()
+        self.save_timestamp = False
+
+        self.payload = {
+            "client_id": self.site.client_id,
+            "site_id": self.site.site_id,
+            "batch_index": self.batch_index,
+            "uuid": self.push_uuid,
+            "stats": {
+                "status": status,
+                "start_time": start_time,
+                "end_time": end_time,
+                "error_message": error_message
+            },
+            "additional": {"error_message": error_message}
+        }
+
+    def record(self):
+        """Record the payload in history before it is pushed"""
+        if self.history is None:
+            return
+        try:
+            self.cycle_id = self.history.record_cycle(self.payload, self.started_at, self.timings)
+        except Exception as e:
+            logger.warning(f"Failed to record cycle in history: {e}")
+
+    def finish(self, push_result: PushResult) -> int:
+        """
+        Apply the push outcome to state and history
+
+        Returns:
+            Process exit code for this cycle
+        """
+        state_manager = self.state_manager
+
+        if self.profiler is not None:
+            started = datetime.fromtimestamp(self.started_at, timezone.utc)
+            self.profiler.write(f"{started:%Y%m%dT%H%M%S}-{self.batch_index:06d}")
+
+        if self.cycle_id is not None:
+            try:
+                self.history.record_push(self.cycle_id, push_result.acked, push_result.failed,
+                                         push_result.committed, self.timings)
+                self.history.purge()
+            except Exception as e:
+                logger.warning(f"Failed to record push outcome in history: {e}")
+
+        if push_result.committed:
+            logger.info(f"[SUCCESS] PUSH: Data delivered successfully (uuid {self.push_uuid})")
+
+            # Save timestamp if pull was successful
+            if self.save_timestamp:
+                state_manager.save_successful_timestamp(self.end_time)
+                logger.info("Saved successful timestamp")
+                state_manager.save_keyset_marks(self.keyset_marks)
+
+            if self.facts_hash is not None:
+                state_manager.save_host_facts(dict(state_manager.get_host_facts(), pushed_hash=self.facts_hash))
+
+            # Update batch_index
+            state_manager.update_batch_index(self.batch_index)
+            logger.info(f"Updated batch_index to {self.batch_index}")
+        else:
+            logger.error(f"[FAILED] PUSH: Could not deliver data to {', '.join(push_result.failed)}")
+
+            # Save failed UUID for retry; batch_index stays at its previous value
+            if self.save_failed_uuid:
+                state_manager.save_failed_push_uuid(self.push_uuid)
+                logger.info("Saved failed push UUID for retry")
+
+            logger.error("Pulse Agent execution failed - push operation unsuccessful")
+            return 1
+
+        if self.exit_code == 0:
+            # Display final state
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Final state: %s", json.dumps(state_manager.read_state()))
+
+            logger.info("Pulse Agent execution completed successfully")
+        return self.exit_code
@@ -3,14 +3,47 @@ Database client for Pulse Agent
 Supports PostgreSQL and MySQL with configurable queries
 """
 
+import hashlib
 import json
 import logging
+import re
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Set
 from datetime import datetime
 
+from .expressions import compile_expression
+
 logger = logging.getLogger(__name__)
 
+# Query types accepted in queries.json
+QUERY_TYPES = ("count", "single_value", "docker", "system", "constant", "derived")
+
+# The client-side watchdog cancels a query this long after its server-side
+# timeout should have fired
+WATCHDOG_GRACE_MS = 1000
+
+# pyformat parameter such as %(start_time)s
+NAMED_PARAM = re.compile(r"%\((\w+)\)s")
+
+# MySQL errors raised for queries stopped by max_execution_time or KILL QUERY
+MYSQL_TIMEOUT_ERRORS = (3024, 1317)
+
+# Savepoint set before each PostgreSQL statement in a snapshot, so a failed
+# statement does not end the snapshot transaction
+SNAPSHOT_SAVEPOINT = "pulse_statement"
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query exceeded its timeout and was cancelled"""
+
+
+def _param_names(params: Any) -> Any:
+    """Names of query parameters (or their count), for logging without the values"""
+    if isinstance(params, dict):
+        return sorted(params)
+    return f"{len(params)} positional" if params else "none"
+
 
 class DatabaseClient:
     """Database client for executing queries"""
@@ -38,6 +71,15 @@ class DatabaseClient:
         self.ssl_mode = ssl_mode
         self.connection = None
         self.cursor = None
+        # Statement timeout in effect on the connection (None = server default)
+        self._timeout_ms: Optional[int] = None
+        # Whether a begin_snapshot() transaction is open
+        self._snapshot = False
+        self._cancelled = False
+        # Token of the query the watchdog may cancel; swapped under the lock so
+        # a late watchdog never cancels the next statement
+        self._cancel_lock = threading.Lock()
+        self._active_query = None
 
         # Import appropriate database library
         if self.db_type == "postgresql":
@@ -89,6 +131,8 @@ class DatabaseClient:
 
     def disconnect(self):
         """Close database connection"""
+        self._timeout_ms = None
+        self._snapshot = False
         if self.cursor:
             self.cursor.close()
             self.cursor = None
@@ -109,42 +153,239 @@ class DatabaseClient:
         except:
             return False
 
-    def execute_query(self, sql: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    def execute_query(self, sql: str, params: Optional[Dict[str, Any]] = None,
+                      timeout_ms: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Execute a SQL query and return results
 
         Args:
             sql: SQL query string
             params: Query parameters (for parameterized queries)
+            timeout_ms: Statement timeout, enforced by the server and by a
+                client-side watchdog that cancels the query
 
         Returns:
             List of dictionaries representing rows
+
+        Raises:
+            QueryTimeoutError: If the query was cancelled for exceeding timeout_ms
         """
         if not self.is_connected():
             raise ConnectionError("Database connection not established")
 
+        watchdog = None
+        token = object()
+        with self._cancel_lock:
+            self._cancelled = False
+            self._active_query = token
+        original_params = params
         try:
+            self._set_statement_timeout(timeout_ms)
+            if timeout_ms:
+                watchdog = threading.Timer((timeout_ms + WATCHDOG_GRACE_MS) / 1000,
+                                           self._watchdog_cancel, args=(token,))
+                watchdog.daemon = True
+                watchdog.start()
+
             # Convert PostgreSQL-style parameters to MySQL-style if needed
-            if self.db_type == "mysql" and params:
-                # MySQL uses %s instead of %(name)s
-                # This is a simplified conversion - may need adjustment based on actual queries
-                sql_mysql = sql
-                for key, value in params.items():
-                    sql_mysql = sql_mysql.replace(f"%({key})s", "%s")
-                sql = sql_mysql
-                params = list(params.values()) if isinstance(params, dict) else params
+            if self.db_type == "mysql" and isinstance(params, dict):
+                # MySQL uses %s instead of %(name)s; one value per occurrence,
+                # in the order they appear
+                names = NAMED_PARAM.findall(sql)
+                sql = NAMED_PARAM.sub("%s", sql)
+                params = [params[name] for name in names]
 
-            self.cursor.execute(sql, params)
+            statement = sql
+            if self._snapshot and self.db_type == "postgresql":
+                # Sent with the statement, so it costs no extra round trip
+                statement = f"SAVEPOINT {SNAPSHOT_SAVEPOINT}; {sql}"
+            self.cursor.execute(statement, params)
 
             if self.db_type == "postgresql":
                 return self.cursor.fetchall()
             elif self.db_type == "mysql":
                 return self.cursor.fetchall()
         except Exception as e:
-            logger.error(f"Query execution failed: {e}")
-            logger.error(f"SQL: {sql}")
-            logger.error(f"Params: {params}")
+            # A failed statement aborts the PostgreSQL transaction; roll back
+            # so the following queries can run
+            if self._snapshot:
+                self._rollback_statement()
+            else:
+                self._rollback()
+            if self._cancelled or self._is_timeout(e):
+                raise QueryTimeoutError(f"Query cancelled after {timeout_ms} ms") from e
+            # Parameter names only; their values can be large or sensitive
+            logger.error("Query execution failed: %s\nSQL: %s\nParams: %s", e, sql, _param_names(original_params))
             raise
+        finally:
+            # Waits for a watchdog that is cancelling right now, so its cancel
+            # lands before the next statement starts
+            with self._cancel_lock:
+                self._active_query = None
+            if watchdog is not None:
+                watchdog.cancel()
+
+    def execute_scalars(self, statements: List[str], params: Optional[Dict[str, Any]] = None,
+                        timeout_ms: Optional[int] = None) -> List[Any]:
+        """
+        Run several single-value queries in one round trip
+
+        The statements are combined into SELECT (sql0) AS c0, (sql1) AS c1, ...
+        so each must return at most one row with one column.
+
+        Returns:
+            The value of each statement, in order (None for no rows)
+        """
+        columns = ", ".join(f"({sql}) AS c{index}" for index, sql in enumerate(statements))
+        rows = self.execute_query(f"SELECT {columns}", params, timeout_ms=timeout_ms)
+        row = rows[0]
+        if isinstance(row, dict):
+            return [row[f"c{index}"] for index in range(len(statements))]
+        return list(row)
+
+    def begin_snapshot(self):
+        """
+        Start a read-only REPEATABLE READ transaction
+
+        Queries until end_snapshot() see one consistent snapshot.
+        """
+        if self.db_type == "postgresql":
+            # Session characteristics can only change outside a transaction
+            self.connection.rollback()
+            self.connection.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        else:
+            # SET TRANSACTION only applies when no transaction is open
+            self.connection.rollback()
+            self.cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            self.cursor.execute("START TRANSACTION READ ONLY, WITH CONSISTENT SNAPSHOT")
+        self._reset_timeout()
+        self._snapshot = True
+
+    def end_snapshot(self):
+        """End the snapshot transaction and restore the default session"""
+        self._snapshot = False
+        try:
+            self.connection.rollback()
+            if self.db_type == "postgresql":
+                self.connection.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+        except Exception as e:
+            logger.warning(f"Failed to end snapshot transaction: {e}")
+        self._reset_timeout()
+
+    def end_transaction(self):
+        """
+        End the open read transaction of a connection kept between uses
+
+        The connection is not autocommit, so without this a kept connection
+        would stay in its first transaction: PostgreSQL would sit idle in
+        transaction holding its locks, and MySQL would keep reading the same
+        REPEATABLE READ view.
+        """
+        if not self.connection:
+            return
+        try:
+            self.connection.rollback()
+            self._reset_timeout()
+        except Exception as e:
+            logger.warning(f"Failed to end transaction: {e}")
+
+    def _set_statement_timeout(self, timeout_ms: Optional[int]):
+        """
+        Apply a server-side timeout to the next statement
+
+        The SET is skipped when the timeout in effect is already timeout_ms,
+        so queries sharing a timeout cost one round trip each.
+        """
+        timeout_ms = int(timeout_ms) if timeout_ms else None
+        if timeout_ms == self._timeout_ms:
+            return
+        if timeout_ms:
+            if self.db_type == "postgresql":
+                # Scoped to the current transaction
+                self.cursor.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+            else:
+                self.cursor.execute(f"SET SESSION max_execution_time = {timeout_ms}")
+        else:
+            # Undo the timeout of an earlier query
+            if self.db_type == "postgresql":
+                self.cursor.execute("SET LOCAL statement_timeout TO DEFAULT")
+            else:
+                self.cursor.execute("SET SESSION max_execution_time = DEFAULT")
+        self._timeout_ms = timeout_ms
+
+    def _reset_timeout(self):
+        """Forget the timeout after a rollback, which drops PostgreSQL's SET LOCAL"""
+        # A MySQL session variable survives the rollback
+        if self.db_type == "postgresql":
+            self._timeout_ms = None
+
+    def _is_timeout(self, error: Exception) -> bool:
+        """Whether an error reports a statement cancelled by its timeout"""
+        if self.db_type == "postgresql":
+            return isinstance(error, self.psycopg2.extensions.QueryCanceledError)
+        return getattr(error, "errno", None) in MYSQL_TIMEOUT_ERRORS
+
+    def _rollback(self):
+        """Roll back the current PostgreSQL transaction, ignoring errors"""
+        if self.db_type != "postgresql" or not self.connection:
+            return
+        try:
+            self.connection.rollback()
+            self._reset_timeout()
+        except Exception as e:
+            logger.warning(f"Rollback failed: {e}")
+
+    def _rollback_statement(self):
+        """
+        Undo a failed statement in a snapshot, keeping the snapshot
+
+        PostgreSQL rolls back to the statement's savepoint; a MySQL error does
+        not end the transaction. If the savepoint cannot be restored, the
+        transaction is rolled back and later queries read a new snapshot.
+        """
+        if self.db_type != "postgresql" or not self.connection:
+            return
+        try:
+            self.cursor.execute(f"ROLLBACK TO SAVEPOINT {SNAPSHOT_SAVEPOINT}")
+        except Exception as e:
+            logger.warning(f"Snapshot lost after a failed statement; the following queries on "
+                           f"{self.database} read a new snapshot: {e}")
+            self._rollback()
+
+    def _watchdog_cancel(self, token: object):
+        """Cancel a query that outlived its timeout (runs on the watchdog thread)"""
+        with self._cancel_lock:
+            if self._active_query is not token:
+                # The query finished while the timer fired
+                return
+            logger.warning(f"Query on {self.database} exceeded its timeout, cancelling")
+            self._cancelled = True
+            try:
+                self.cancel()
+            except Exception as e:
+                logger.error(f"Failed to cancel query: {e}")
+
+    def cancel(self):
+        """Cancel the query running on this connection from another thread"""
+        if not self.connection:
+            return
+        if self.db_type == "postgresql":
+            self.connection.cancel()
+        else:
+            # mysql-connector has no cancel; KILL QUERY from a second connection
+            killer = self.mysql.connect(
+                host=self.host,
+                port=self.port,
+                user=self.user,
+                password=self.password,
+                ssl_disabled=(self.ssl_mode == "disable")
+            )
+            try:
+                cursor = killer.cursor()
+                cursor.execute(f"KILL QUERY {int(self.connection.connection_id)}")
+                cursor.close()
+            finally:
+                killer.close()
 
     def __enter__(self):
         """Context manager entry"""
@@ -156,8 +397,65 @@ class DatabaseClient:
         self.disconnect()
 
 
+class CompiledQuery:
+    """A validated query definition ready to run"""
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        """
+        Validate and compile a query definition
+
+        Args:
+            name: Query name
+            config: Query definition from queries.json
+
+        Raises:
+            ValueError: If the definition is invalid
+        """
+        if not isinstance(config, dict):
+            raise ValueError(f"Query '{name}' must be an object")
+
+        query_type = config.get("type", "count")
+        if query_type not in QUERY_TYPES:
+            raise ValueError(f"Query '{name}' has unsupported type '{query_type}'. "
+                             f"Supported: {', '.join(QUERY_TYPES)}")
+        if query_type in ("count", "single_value") and not isinstance(config.get("sql"), str):
+            raise ValueError(f"Query '{name}' needs an \"sql\" string")
+        timeout_ms = config.get("timeout_ms")
+        if timeout_ms is not None and (not isinstance(timeout_ms, int) or timeout_ms < 0):
+            raise ValueError(f"Query '{name}' has an invalid timeout_ms")
+        keyset = config.get("keyset")
+        if keyset is not None:
+            if (query_type != "count" or not isinstance(keyset, dict)
+                    or not isinstance(keyset.get("sql"), str) or not isinstance(keyset.get("seed_sql"), str)):
+                raise ValueError(f"Query '{name}' needs to be a count query with a \"keyset\" object "
+                                 f"holding \"sql\" and \"seed_sql\" strings")
+            overlap = keyset.get("overlap_seconds", 60)
+            if isinstance(overlap, bool) or not isinstance(overlap, (int, float)) or overlap < 0:
+                raise ValueError(f"Query '{name}' has an invalid keyset overlap_seconds")
+        feed = config.get("feed")
+        if feed is not None and (query_type != "count" or not isinstance(feed, dict)
+                                 or not isinstance(feed.get("table"), str)
+                                 or not isinstance(feed.get("state", ""), (str, int))):
+            raise ValueError(f"Query '{name}' needs to be a count query with a \"feed\" object "
+                             f"holding a \"table\" string and optionally a \"state\"")
+
+        self.name = name
+        self.config = config
+        self.fingerprint = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+        self.expression = compile_expression(config.get("expression", "")) if query_type == "derived" else None
+        # Statement without a trailing semicolon, so it can be embedded in a batch
+        self.sql = config["sql"].strip().rstrip(";").strip() if query_type in ("count", "single_value") else None
+
+
 class QueryLoader:
-    """Load and manage SQL queries from configuration file"""
+    """
+    Load and manage SQL queries from configuration file
+
+    In long-running mode the file can be watched: a changed file is parsed,
+    validated and compiled on the watcher thread, and the new version is only
+    swapped in by apply_pending() between cycles. An invalid file is logged
+    and the previous version kept.
+    """
 
     def __init__(self, queries_file: Path):
         """
@@ -169,16 +467,19 @@ class QueryLoader:
         self.queries_file = queries_file
         self.queries = {}
         self.aggregation_order = []
+        self.compiled: Dict[str, CompiledQuery] = {}
+        self.timeout_ms = None
+        self.change_feed: Dict[str, Any] = {}
+        self.triggers: Dict[str, Dict[str, Any]] = {}
+        self._pending = None
+        self._lock = threading.Lock()
+        self._watcher = None
         self.load_queries()
 
     def load_queries(self):
         """Load queries from JSON file"""
         try:
-            with open(self.queries_file, 'r') as f:
-                data = json.load(f)
-
-            self.queries = data.get("queries", {})
-            self.aggregation_order = data.get("aggregation_order", [])
+            self._swap(self._read())
 
             logger.info(f"Loaded {len(self.queries)} queries from {self.queries_file}")
         except FileNotFoundError:
@@ -191,10 +492,135 @@ class QueryLoader:
             logger.error(f"Failed to load queries: {e}")
             raise
 
+    def _read(self, previous: Optional[Dict[str, CompiledQuery]] = None):
+        """
+        Parse, validate and compile the queries file
+
+        Compiled queries whose definition is unchanged are reused from previous.
+
+        Returns:
+            Tuple of (queries, aggregation_order, compiled queries, global timeout_ms,
+            change_feed section, triggers section)
+        """
+        with open(self.queries_file, 'r') as f:
+            data = json.load(f)
+
+        queries = data.get("queries", {})
+        if not isinstance(queries, dict):
+            raise ValueError("\"queries\" must be an object")
+        aggregation_order = data.get("aggregation_order", [])
+        if not isinstance(aggregation_order, list):
+            raise ValueError("\"aggregation_order\" must be a list")
+        timeout_ms = data.get("timeout_ms")
+        if timeout_ms is not None and (not isinstance(timeout_ms, int) or timeout_ms < 0):
+            raise ValueError("\"timeout_ms\" must be a non-negative integer")
+
+        previous = previous or {}
+        compiled = {}
+        for name, config in queries.items():
+            query = CompiledQuery(name, config)
+            old = previous.get(name)
+            compiled[name] = old if old is not None and old.fingerprint == query.fingerprint else query
+
+        for name in aggregation_order:
+            if name not in queries:
+                logger.warning(f"Query '{name}' in aggregation_order is not defined")
+
+        change_feed = {}
+        feeds = {name: config["feed"] for name, config in queries.items() if "feed" in config}
+        if "change_feed" in data:
+            from .change_feed import validate_feed_config
+            change_feed = validate_feed_config(data["change_feed"], {
+                name: queries[name].get("source", "default") for name in feeds})
+        for name, feed in feeds.items():
+            if feed["table"] not in change_feed.get("tables", {}):
+                raise ValueError(f"Query '{name}' has a feed on '{feed['table']}', "
+                                 f"which is not a \"change_feed\" table")
+
+        triggers = {}
+        if "triggers" in data:
+            from .triggers import validate_triggers
+            triggers = validate_triggers(data["triggers"], queries)
+        return queries, aggregation_order, compiled, timeout_ms, change_feed, triggers
+
+    def _swap(self, loaded):
+        """Make a result of _read() the current version"""
+        (self.queries, self.aggregation_order, self.compiled, self.timeout_ms,
+         self.change_feed, self.triggers) = loaded
+
+    def watch(self, poll_interval: float = 2.0):
+        """Start watching the queries file for changes"""
+        if self._watcher is None:
+            from .watcher import FileWatcher
+            self._watcher = FileWatcher(self.queries_file, self._prepare_reload, poll_interval)
+            self._watcher.start()
+
+    def stop_watching(self):
+        """Stop watching the queries file"""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _prepare_reload(self):
+        """Validate and compile a changed file, keeping it pending until applied"""
+        try:
+            pending = self._read(self.compiled)
+        except Exception as e:
+            logger.error(f"Ignoring invalid change to {self.queries_file}, keeping the previous queries: {e}")
+            return
+
+        changed = self._changed(self.compiled, pending[2])
+        if (not changed and pending[1] == self.aggregation_order and pending[3] == self.timeout_ms
+                and pending[4] == self.change_feed and pending[5] == self.triggers):
+            # Also drops an edit that was reverted before it was applied
+            with self._lock:
+                self._pending = None
+            logger.debug(f"{self.queries_file} changed on disk but its queries did not")
+            return
+
+        with self._lock:
+            self._pending = (pending, changed)
+        logger.info(f"Queries file changed ({len(changed)} queries changed), applying before the next cycle")
+
+    def apply_pending(self) -> Optional[Set[str]]:
+        """
+        Swap in a pending reload
+
+        Returns:
+            Names of added, removed or changed queries, or None when nothing was pending
+        """
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return None
+
+        loaded, changed = pending
+        self._swap(loaded)
+        logger.info(f"Reloaded {len(self.queries)} queries from {self.queries_file}"
+                    + (f"; changed: {', '.join(sorted(changed))}" if changed else ""))
+        return changed
+
+    @staticmethod
+    def _changed(old: Dict[str, CompiledQuery], new: Dict[str, CompiledQuery]) -> Set[str]:
+        """Names of queries added, removed or redefined between two versions"""
+        names = set(old) | set(new)
+        return {name for name in names
+                if name not in old or name not in new or old[name].fingerprint != new[name].fingerprint}
+
     def get_query(self, query_name: str) -> Optional[Dict[str, Any]]:
         """Get a specific query by name"""
         return self.queries.get(query_name)
 
+    def get_timeout_ms(self, query_name: str) -> Optional[int]:
+        """Timeout of a query: its own timeout_ms, else the file-wide one"""
+        query = self.queries.get(query_name) or {}
+        timeout_ms = query.get("timeout_ms", self.timeout_ms)
+        return int(timeout_ms) if timeout_ms else None
+
+    def get_compiled(self, query_name: str) -> Optional[CompiledQuery]:
+        """Get the compiled form of a query by name"""
+        return self.compiled.get(query_name)
+
     def get_all_queries(self) -> Dict[str, Dict[str, Any]]:
         """Get all queries"""
         return self.queries
@@ -202,3 +628,11 @@ class QueryLoader:
     def get_aggregation_order(self) -> List[str]:
         """Get the order in which queries should be executed"""
         return self.aggregation_order
+
+    def get_change_feed(self) -> Dict[str, Any]:
+        """The validated "change_feed" section, or {} when there is none"""
+        return self.change_feed
+
+    def get_triggers(self) -> Dict[str, Dict[str, Any]]:
+        """The validated "triggers" section, or {} when there is none"""
+        return self.triggers
@@ -4,10 +4,14 @@ Queries Docker daemon for container metrics
 """
 
 import logging
+import re
 from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+# Health in a container's status summary, e.g. "Up 5 minutes (unhealthy)"
+STATUS_HEALTH = re.compile(r"\((healthy|unhealthy|health: starting)\)")
+
 
 class DockerClient:
     """Docker client for querying container metrics"""
@@ -70,7 +74,7 @@ class DockerClient:
                 elif state == "paused":
                     stats["containers_paused"] += 1
 
-            logger.debug(f"Docker stats: {stats}")
+            logger.debug("Docker stats: %s", stats)
             return stats
 
         except Exception as e:
@@ -163,7 +167,7 @@ class DockerClient:
             metrics["summary"]["running_containers"] = running_count
             metrics["summary"]["healthy_containers"] = healthy_count
 
-            logger.debug(f"Docker detailed metrics: {metrics}")
+            logger.debug("Docker detailed metrics: %s", metrics)
             return metrics
 
         except Exception as e:
@@ -171,6 +175,35 @@ class DockerClient:
             metrics["system"]["daemon_status"] = "error"
             return metrics
 
+    def get_container_health(self) -> Dict[str, Dict[str, str]]:
+        """
+        State and health of every container in a single daemon request
+
+        Unlike get_detailed_metrics(), which inspects each container, this
+        reads the list endpoint's status summary only, so it is cheap enough
+        to call every few seconds.
+
+        Returns:
+            Container name -> {"state": ..., "health": ...}; health is
+            healthy, unhealthy, starting or none (no health check)
+
+        Raises:
+            ConnectionError: If the Docker daemon is not connected
+        """
+        if not self.is_connected():
+            raise ConnectionError("Docker not connected")
+
+        containers = {}
+        for summary in self.docker.api.containers(all=True):
+            names = summary.get("Names") or [summary.get("Id", "")[:12]]
+            match = STATUS_HEALTH.search(summary.get("Status", ""))
+            health = match.group(1) if match else "none"
+            containers[names[0].lstrip("/")] = {
+                "state": summary.get("State", "unknown").lower(),
+                "health": "starting" if health == "health: starting" else health
+            }
+        return containers
+
     def get_running_containers(self) -> int:
         """Get count of running containers"""
         stats = self.get_container_stats()
@@ -0,0 +1,195 @@
+"""
+Expressions for derived metrics
+A small, safe subset of Python expressions evaluated over other metric values
+
+Supported: numbers, strings, metric names, + - * / // % **, unary + -,
+comparisons, and/or/not, `a if cond else b`, and min/max/abs/round.
+Anything else (attribute access, subscripts, other calls) is rejected when
+the expression is compiled.
+"""
+
+import ast
+import logging
+import operator
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet
+
+logger = logging.getLogger(__name__)
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Not: operator.not_
+}
+
+COMPARE_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge
+}
+
+FUNCTIONS = {
+    "min": min,
+    "max": max,
+    "abs": abs,
+    "round": round
+}
+
+# Guards against expressions like 10 ** 10 ** 10
+MAX_EXPONENT = 100
+
+
+class ExpressionError(ValueError):
+    """Raised for expressions that are invalid or cannot be evaluated"""
+
+
+class Expression:
+    """A validated expression and the metric names it depends on"""
+
+    def __init__(self, source: str, tree: ast.Expression, names: FrozenSet[str]):
+        """
+        Initialize expression
+
+        Args:
+            source: Expression text
+            tree: Validated syntax tree
+            names: Metric names referenced by the expression
+        """
+        self.source = source
+        self.tree = tree
+        self.names = names
+
+    def evaluate(self, values: Dict[str, Any]) -> Any:
+        """
+        Evaluate the expression
+
+        Args:
+            values: Metric values by name
+
+        Returns:
+            Expression result
+
+        Raises:
+            ExpressionError: If a referenced metric is missing or evaluation fails
+        """
+        try:
+            return _evaluate(self.tree.body, values)
+        except ExpressionError:
+            raise
+        except Exception as e:
+            raise ExpressionError(f"Cannot evaluate '{self.source}': {e}") from e
+
+
+@lru_cache(maxsize=256)
+def compile_expression(source: str) -> Expression:
+    """
+    Parse and validate an expression
+
+    Compiled expressions are cached by their text.
+
+    Raises:
+        ExpressionError: If the expression is not valid or uses unsupported syntax
+    """
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression '{source}': {e.msg}") from e
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                raise ExpressionError(f"Unsupported call in '{source}'")
+        elif isinstance(node, ast.Name):
+            if node.id not in FUNCTIONS:
+                names.add(node.id)
+        elif not isinstance(node, _ALLOWED_NODES):
+            raise ExpressionError(f"Unsupported syntax in '{source}': {type(node).__name__}")
+
+    # Function names are only valid in call position
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in FUNCTIONS and not _is_called(tree, node):
+            raise ExpressionError(f"'{node.id}' can only be called in '{source}'")
+
+    return Expression(source, tree, frozenset(names))
+
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.Constant, ast.Name, ast.Load,
+    ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+    ast.And, ast.Or
+) + tuple(BINARY_OPERATORS) + tuple(UNARY_OPERATORS) + tuple(COMPARE_OPERATORS)
+
+
+def _is_called(tree: ast.AST, name: ast.Name) -> bool:
+    """Whether a name node is the function of a call"""
+    return any(isinstance(node, ast.Call) and node.func is name for node in ast.walk(tree))
+
+
+def _evaluate(node: ast.AST, values: Dict[str, Any]) -> Any:
+    """Evaluate a validated expression node"""
+    if isinstance(node, ast.Constant):
+        return node.value
+
+    if isinstance(node, ast.Name):
+        if node.id not in values:
+            raise ExpressionError(f"Unknown metric '{node.id}'")
+        return values[node.id]
+
+    if isinstance(node, ast.BinOp):
+        left = _evaluate(node.left, values)
+        right = _evaluate(node.right, values)
+        if isinstance(node.op, ast.Pow) and isinstance(right, (int, float)) and abs(right) > MAX_EXPONENT:
+            raise ExpressionError(f"Exponent {right} too large")
+        return BINARY_OPERATORS[type(node.op)](left, right)
+
+    if isinstance(node, ast.UnaryOp):
+        return UNARY_OPERATORS[type(node.op)](_evaluate(node.operand, values))
+
+    if isinstance(node, ast.BoolOp):
+        if isinstance(node.op, ast.And):
+            result = True
+            for value in node.values:
+                result = _evaluate(value, values)
+                if not result:
+                    return result
+            return result
+        result = False
+        for value in node.values:
+            result = _evaluate(value, values)
+            if result:
+                return result
+        return result
+
+    if isinstance(node, ast.Compare):
+        left = _evaluate(node.left, values)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _evaluate(comparator, values)
+            if not COMPARE_OPERATORS[type(op)](left, right):
+                return False
+            left = right
+        return True
+
+    if isinstance(node, ast.IfExp):
+        if _evaluate(node.test, values):
+            return _evaluate(node.body, values)
+        return _evaluate(node.orelse, values)
+
+    if isinstance(node, ast.Call):
+        args = [_evaluate(arg, values) for arg in node.args]
+        return FUNCTIONS[node.func.id](*args)
+
+    raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
@@ -0,0 +1,496 @@
+"""
+Run history for Pulse Agent
+Embedded SQLite store recording every cycle's metrics, timings and push outcome
+"""
+
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cycles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    batch_index INTEGER,
+    uuid TEXT,
+    status TEXT,
+    committed INTEGER,
+    timings TEXT,
+    payload BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_cycles_started_at ON cycles (started_at);
+CREATE INDEX IF NOT EXISTS idx_cycles_uuid ON cycles (uuid);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    cycle_id INTEGER NOT NULL REFERENCES cycles (id) ON DELETE CASCADE,
+    ts REAL NOT NULL,
+    name TEXT NOT NULL,
+    value REAL,
+    text_value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_metrics_name_ts ON metrics (name, ts);
+CREATE INDEX IF NOT EXISTS idx_metrics_ts ON metrics (ts);
+CREATE INDEX IF NOT EXISTS idx_metrics_cycle ON metrics (cycle_id);
+
+CREATE TABLE IF NOT EXISTS deliveries (
+    cycle_id INTEGER NOT NULL REFERENCES cycles (id) ON DELETE CASCADE,
+    destination TEXT NOT NULL,
+    delivered INTEGER NOT NULL,
+    PRIMARY KEY (cycle_id, destination)
+);
+
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    destination TEXT NOT NULL,
+    cycle_id INTEGER NOT NULL REFERENCES cycles (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_destination ON outbox (destination, id);
+"""
+
+AGGREGATES = ("avg", "min", "max", "sum", "count")
+
+
+class HistoryStore:
+    """SQLite (WAL mode) store of past cycles"""
+
+    def __init__(self, db_path: Path, retention_days: int = 30):
+        """
+        Initialize history store
+
+        Args:
+            db_path: Path to the SQLite database file
+            retention_days: Cycles older than this are purged (0 keeps everything)
+        """
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """SQLite connection, opened and migrated on first use"""
+        if self._connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def close(self):
+        """Close the database connection"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def record_cycle(self, payload: Dict[str, Any], started_at: float,
+                     timings: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Record a cycle's payload and metrics in one transaction
+
+        Args:
+            payload: Push payload built for this cycle
+            started_at: Cycle start (epoch seconds)
+            timings: Phase timings in milliseconds
+
+        Returns:
+            Cycle id
+        """
+        stats = payload.get("stats", {})
+        finished_at = time.time()
+        blob = zlib.compress(json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8"))
+
+        rows = []
+        for name, value in flatten_metrics(stats):
+            if isinstance(value, str):
+                rows.append((name, None, value))
+            else:
+                rows.append((name, float(value), None))
+
+        with self._lock, self.connection as conn:
+            cursor = conn.execute(
+                "INSERT INTO cycles (started_at, finished_at, batch_index, uuid, status, timings, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (started_at, finished_at, payload.get("batch_index"), payload.get("uuid"),
+                 stats.get("status"), json.dumps(timings or {}), blob)
+            )
+            cycle_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO metrics (cycle_id, ts, name, value, text_value) VALUES (?, ?, ?, ?, ?)",
+                [(cycle_id, started_at, name, value, text) for name, value, text in rows]
+            )
+        return cycle_id
+
+    def record_push(self, cycle_id: int, acked: List[str], failed: List[str],
+                    committed: bool, timings: Optional[Dict[str, Any]] = None):
+        """Record the push outcome of a cycle"""
+        with self._lock, self.connection as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO deliveries (cycle_id, destination, delivered) VALUES (?, ?, ?)",
+                [(cycle_id, name, 1) for name in acked] + [(cycle_id, name, 0) for name in failed]
+            )
+            if timings is not None:
+                conn.execute("UPDATE cycles SET committed = ?, finished_at = ?, timings = ? WHERE id = ?",
+                             (int(committed), time.time(), json.dumps(timings), cycle_id))
+            else:
+                conn.execute("UPDATE cycles SET committed = ?, finished_at = ? WHERE id = ?",
+                             (int(committed), time.time(), cycle_id))
+
+    def record_delivery(self, cycle_id: int, destination: str, delivered: bool):
+        """Record one destination's delivery of a cycle, leaving the cycle itself untouched"""
+        with self._lock, self.connection as conn:
+            conn.execute("INSERT OR REPLACE INTO deliveries (cycle_id, destination, delivered) VALUES (?, ?, ?)",
+                         (cycle_id, destination, int(delivered)))
+
+    def purge(self) -> int:
+        """
+        Delete cycles older than the retention period
+
+        Returns:
+            Number of cycles deleted
+        """
+        if self.retention_days <= 0:
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock, self.connection as conn:
+            deleted = conn.execute("DELETE FROM cycles WHERE started_at < ?", (cutoff,)).rowcount
+        if deleted:
+            logger.info(f"Purged {deleted} cycle(s) older than {self.retention_days} days from history")
+        return deleted
+
+    def load_payload(self, cycle_id: int) -> Optional[Dict[str, Any]]:
+        """Load the payload recorded for a cycle"""
+        with self._lock:
+            row = self.connection.execute("SELECT payload FROM cycles WHERE id = ?", (cycle_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def find_cycle(self, uuid_str: str) -> Optional[int]:
+        """Latest cycle id recorded with a push uuid"""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT id FROM cycles WHERE uuid = ? ORDER BY id DESC LIMIT 1", (uuid_str,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def cycles(self, since: float, until: float, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Cycles started in [since, until], newest first"""
+        sql = ("SELECT id, started_at, finished_at, batch_index, uuid, status, committed, timings "
+               "FROM cycles WHERE started_at BETWEEN ? AND ? ORDER BY started_at DESC")
+        params = [since, until]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self.connection.execute(sql, params).fetchall()
+        return [
+            {
+                "id": row[0],
+                "started_at": _format_ts(row[1]),
+                "duration_ms": int((row[2] - row[1]) * 1000) if row[2] else None,
+                "batch_index": row[3],
+                "uuid": row[4],
+                "status": row[5],
+                "committed": None if row[6] is None else bool(row[6]),
+                "timings": json.loads(row[7] or "{}")
+            }
+            for row in rows
+        ]
+
+    def metric_range(self, name: str, since: float, until: float) -> List[Dict[str, Any]]:
+        """Values of one metric in [since, until], oldest first"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT ts, value, text_value FROM metrics WHERE name = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                (name, since, until)
+            ).fetchall()
+        return [{"ts": _format_ts(ts), "value": text if value is None else value} for ts, value, text in rows]
+
+    def metric_aggregate(self, name: str, func: str, since: float, until: float,
+                         bucket_seconds: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Aggregate one metric over [since, until]
+
+        Args:
+            name: Metric name (nested metrics use dotted names)
+            func: One of avg, min, max, sum, count
+            since: Range start (epoch seconds)
+            until: Range end (epoch seconds)
+            bucket_seconds: Group into time buckets of this size
+
+        Returns:
+            List of {"bucket", "value", "samples"} rows
+        """
+        if func not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregate: {func}. Supported: {', '.join(AGGREGATES)}")
+
+        if bucket_seconds:
+            bucket = f"CAST(ts / {int(bucket_seconds)} AS INTEGER) * {int(bucket_seconds)}"
+        else:
+            bucket = "MIN(ts)"
+        sql = (f"SELECT {bucket} AS bucket, {func.upper()}(value), COUNT(*) FROM metrics "
+               f"WHERE name = ? AND ts BETWEEN ? AND ?")
+        if bucket_seconds:
+            sql += " GROUP BY bucket ORDER BY bucket"
+
+        with self._lock:
+            rows = self.connection.execute(sql, (name, since, until)).fetchall()
+        return [
+            {"bucket": _format_ts(row[0]) if row[0] is not None else None, "value": row[1], "samples": row[2]}
+            for row in rows if row[2]
+        ]
+
+    def metric_names(self) -> List[str]:
+        """Distinct metric names recorded"""
+        with self._lock:
+            rows = self.connection.execute("SELECT DISTINCT name FROM metrics ORDER BY name").fetchall()
+        return [row[0] for row in rows]
+
+    def payloads(self, since: float, until: float) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (cycle_id, payload) for cycles in [since, until], oldest first"""
+        with self._lock:
+            ids = [row[0] for row in self.connection.execute(
+                "SELECT id FROM cycles WHERE started_at BETWEEN ? AND ? ORDER BY started_at", (since, until)
+            ).fetchall()]
+        for cycle_id in ids:
+            payload = self.load_payload(cycle_id)
+            if payload is not None:
+                yield cycle_id, payload
+
+
+class HistoryOutbox:
+    """
+    Outbox backed by the history store
+
+    Queued entries reference cycles, so payloads are stored only once and
+    the outbox is replayed straight from history.
+    """
+
+    def __init__(self, store: HistoryStore, destination: str, max_items: int = 1000):
+        """
+        Initialize history-backed outbox
+
+        Args:
+            store: History store
+            destination: Destination name
+            max_items: Maximum queued payloads; the oldest are dropped beyond this
+        """
+        self.store = store
+        self.destination = destination
+        self.max_items = max_items
+
+    def add(self, payload: Dict[str, Any]):
+        """Queue a recorded payload for later delivery"""
+        cycle_id = self.store.find_cycle(payload.get("uuid"))
+        if cycle_id is None:
+            cycle_id = self.store.record_cycle(payload, time.time())
+
+        with self.store._lock, self.store.connection as conn:
+            conn.execute("INSERT INTO outbox (destination, cycle_id) VALUES (?, ?)",
+                         (self.destination, cycle_id))
+            conn.execute(
+                "DELETE FROM outbox WHERE destination = ? AND id NOT IN "
+                "(SELECT id FROM outbox WHERE destination = ? ORDER BY id DESC LIMIT ?)",
+                (self.destination, self.destination, self.max_items)
+            )
+
+    def entries(self) -> List[Tuple[int, int]]:
+        """Queued (outbox id, cycle id) pairs, oldest first"""
+        with self.store._lock:
+            return self.store.connection.execute(
+                "SELECT id, cycle_id FROM outbox WHERE destination = ? ORDER BY id", (self.destination,)
+            ).fetchall()
+
+    def load(self, entry: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+        """Load a queued payload, dropping it if its cycle is gone"""
+        payload = self.store.load_payload(entry[1])
+        if payload is None:
+            self.remove(entry)
+        return payload
+
+    def remove(self, entry: Tuple[int, int]):
+        """Remove a delivered payload and mark the delivery"""
+        with self.store._lock, self.store.connection as conn:
+            conn.execute("DELETE FROM outbox WHERE id = ?", (entry[0],))
+            conn.execute("INSERT OR REPLACE INTO deliveries (cycle_id, destination, delivered) VALUES (?, ?, 1)",
+                         (entry[1], self.destination))
+
+    def __len__(self) -> int:
+        """Number of queued payloads"""
+        return len(self.entries())
+
+
+def flatten_metrics(stats: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (name, value) for scalar metrics, using dotted names for nested dicts
+
+    Lists (containers, disks) and None values are skipped.
+    """
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten_metrics(value, f"{name}.")
+        elif isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float, str)):
+            yield name, value
+        elif value is not None and not isinstance(value, (list, tuple)):
+            try:
+                yield name, float(value)
+            except (TypeError, ValueError):
+                yield name, str(value)
+
+
+def parse_time(value: Optional[str], default: float) -> float:
+    """
+    Parse a CLI time argument into epoch seconds
+
+    Accepts ISO 8601 timestamps, relative durations ('30m', '24h', '7d')
+    meaning that long ago, or 'now'.
+
+    Raises:
+        ValueError: If the value is none of these
+    """
+    if not value:
+        return default
+    if value == "now":
+        return time.time()
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return time.time() - seconds
+    dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def parse_duration(value: str) -> Optional[int]:
+    """Parse '90s', '30m', '24h' or '7d' into seconds"""
+    match = re.fullmatch(r"(\d+)([smhd])", value.strip())
+    if not match:
+        return None
+    return int(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+
+
+def _format_ts(ts: float) -> str:
+    """Format epoch seconds as ISO 8601 UTC"""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def add_history_arguments(parser: argparse.ArgumentParser):
+    """Register the `history` CLI subcommands"""
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--json", action="store_true", help="print results as JSON")
+    commands = parser.add_subparsers(dest="history_command", required=True)
+
+    cycles = commands.add_parser("cycles", parents=[output], help="list recorded cycles")
+    cycles.add_argument("--limit", type=int, default=20)
+
+    metric_range = commands.add_parser("range", parents=[output], help="values of a metric over time")
+    metric_range.add_argument("--metric", required=True)
+
+    aggregate = commands.add_parser("agg", parents=[output], help="aggregate a metric over time")
+    aggregate.add_argument("--metric", required=True)
+    aggregate.add_argument("--fn", choices=AGGREGATES, default="avg")
+    aggregate.add_argument("--bucket", help="bucket size, e.g. 5m, 1h, 1d")
+
+    commands.add_parser("metrics", parents=[output], help="list recorded metric names")
+
+    backfill = commands.add_parser("backfill", help="re-push recorded payloads to a destination")
+    backfill.add_argument("--destination", required=True)
+
+    for command in (cycles, metric_range, aggregate, backfill):
+        command.add_argument("--since", help="ISO 8601 time or duration ago (e.g. 24h); default 24h")
+        command.add_argument("--until", help="ISO 8601 time or duration ago; default now")
+
+
+def run_history_command(args: argparse.Namespace, store: HistoryStore, dispatcher=None) -> int:
+    """
+    Execute a `history` CLI subcommand
+
+    Args:
+        args: Parsed arguments
+        store: History store
+        dispatcher: PushDispatcher used by `backfill`
+
+    Returns:
+        Process exit code
+    """
+    now = time.time()
+    try:
+        since = parse_time(getattr(args, "since", None), now - 86400)
+        until = parse_time(getattr(args, "until", None), now)
+    except ValueError as e:
+        print(f"Invalid --since or --until (ISO 8601 time, duration such as 24h, or now): {e}")
+        return 2
+
+    if args.history_command == "cycles":
+        rows = store.cycles(since, until, args.limit)
+    elif args.history_command == "range":
+        rows = store.metric_range(args.metric, since, until)
+    elif args.history_command == "agg":
+        bucket = parse_duration(args.bucket) if args.bucket else None
+        if args.bucket and not bucket:
+            print(f"Invalid bucket size: {args.bucket}")
+            return 2
+        rows = store.metric_aggregate(args.metric, args.fn, since, until, bucket)
+    elif args.history_command == "metrics":
+        rows = [{"name": name} for name in store.metric_names()]
+    elif args.history_command == "backfill":
+        return _backfill(store, dispatcher, args.destination, since, until)
+    else:
+        return 2
+
+    _print_rows(rows, args.json)
+    return 0
+
+
+def _backfill(store: HistoryStore, dispatcher, destination_name: str, since: float, until: float) -> int:
+    """Re-push recorded payloads in [since, until] to one destination"""
+    destination = dispatcher.get_destination(destination_name) if dispatcher else None
+    if destination is None:
+        print(f"Unknown destination: {destination_name}")
+        return 2
+
+    delivered = failed = 0
+    for cycle_id, payload in store.payloads(since, until):
+        response = destination.http_client.make_post_request(destination.url, payload, destination.headers())
+        ok = response is not None
+        store.record_delivery(cycle_id, destination.name, ok)
+        if ok:
+            delivered += 1
+        else:
+            failed += 1
+
+    print(f"Backfill to {destination.name}: {delivered} delivered, {failed} failed")
+    return 0 if failed == 0 else 1
+
+
+def _print_rows(rows: List[Dict[str, Any]], as_json: bool):
+    """Print result rows as a JSON array or a tab-separated table"""
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print("No results")
+        return
+    columns = list(rows[0].keys())
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if row[col] is None else
+                        json.dumps(row[col]) if isinstance(row[col], dict) else str(row[col])
+                        for col in columns))
@@ -4,29 +4,71 @@ Handles HTTP POST requests for pushing data
 """
 
 import logging
-import requests
-from typing import Dict, Any, Optional
+import threading
+import zlib
+from typing import Dict, Any, Iterator, Optional
 
 from .config import Config
+from .serializers import get_serializer
 
 logger = logging.getLogger(__name__)
 
+# requests is imported on first use (see import_requests), so commands that
+# never push do not pay for it at start-up
+requests = None
+
+
+def import_requests():
+    """Import requests on first use and return the module"""
+    global requests
+    if requests is None:
+        import requests as module
+        requests = module
+    return requests
+
 
 class HttpClient:
     """HTTP client for making requests"""
 
-    def __init__(self, timeout: int = 30, user_agent: str = "pulse-agent/1.0"):
+    def __init__(self, timeout: int = 30, user_agent: str = "pulse-agent/1.0",
+                 serializer=None, streaming: Optional[bool] = None,
+                 pool_size: Optional[int] = None):
         """
         Initialize HTTP client
 
         Args:
             timeout: Request timeout in seconds
             user_agent: User agent string
+            serializer: Payload serializer (defaults to Config.PUSH_ENCODING)
+            streaming: Send make_post_request payloads with the streaming
+                chunked upload (defaults to Config.PUSH_STREAMING)
+            pool_size: Connections kept per host, for clients shared by
+                concurrent pushes (requests defaults to 10)
         """
         self.timeout = timeout
         self.user_agent = user_agent
-        self.session = requests.Session()
-        self.session.headers.update({"User-Agent": self.user_agent})
+        self.serializer = serializer or get_serializer(Config.PUSH_ENCODING)
+        self.streaming = Config.PUSH_STREAMING if streaming is None else streaming
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """requests session, created on first use"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import_requests()
+                    session = requests.Session()
+                    session.headers.update({"User-Agent": self.user_agent})
+                    if self.pool_size:
+                        adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size,
+                                                                pool_maxsize=self.pool_size)
+                        session.mount("http://", adapter)
+                        session.mount("https://", adapter)
+                    self._session = session
+        return self._session
 
     def make_post_request(self, url: str, json_data: Dict[str, Any],
                          headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
@@ -41,33 +83,123 @@ class HttpClient:
         Returns:
             Response JSON as dictionary, or None on failure
         """
-        request_headers = {}
+        if self.streaming:
+            return self.make_streaming_post_request(url, json_data, headers)
+
+        import_requests()
+        try:
+            logger.info(f"POST request to: {url}")
+            logger.debug("Request payload: %s", json_data)
+
+            response = self._post_encoded(url, json_data, headers)
+
+            # Server does not understand our encoding, negotiate down and retry
+            if self._negotiate_down(response):
+                response = self._post_encoded(url, json_data, headers)
+
+            return self._handle_response(response)
+
+        except requests.exceptions.Timeout:
+            logger.error(f"Request timeout after {self.timeout} seconds")
+            return None
+        except requests.exceptions.ConnectionError as e:
+            logger.error(f"Connection error: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error during HTTP request: {e}")
+            return None
+
+    def make_raw_post_request(self, url: str, body: bytes,
+                              headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Make HTTP POST request with a body already encoded by self.serializer
+
+        Args:
+            url: Target URL
+            body: Encoded request body
+            headers: Additional headers (e.g., Authorization)
+
+        Returns:
+            Response JSON as dictionary, or None on failure
+        """
+        request_headers = {"Content-Type": self.serializer.content_type}
         if headers:
             request_headers.update(headers)
 
+        import_requests()
         try:
-            logger.info(f"POST request to: {url}")
-            logger.debug(f"Request payload: {json_data}")
+            logger.info(f"POST request to: {url} ({len(body)} bytes)")
+
+            response = self.session.post(
+                url,
+                data=body,
+                headers=request_headers,
+                timeout=self.timeout
+            )
+
+            # The body was encoded by the caller, so a rejected encoding is
+            # only switched for the next attempt
+            self._negotiate_down(response)
+
+            return self._handle_response(response)
+
+        except requests.exceptions.Timeout:
+            logger.error(f"Request timeout after {self.timeout} seconds")
+            return None
+        except requests.exceptions.ConnectionError as e:
+            logger.error(f"Connection error: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error during HTTP request: {e}")
+            return None
+
+    def make_streaming_post_request(self, url: str, json_data: Dict[str, Any],
+                                    headers: Optional[Dict[str, str]] = None,
+                                    chunk_size: Optional[int] = None,
+                                    compress: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """
+        Make HTTP POST request with a streaming chunked body
+
+        The payload is serialized incrementally, optionally gzip-compressed on
+        the fly and sent with Transfer-Encoding: chunked, so peak memory is
+        bounded by the chunk size rather than the payload size. Lists inside
+        the payload may be generators (e.g. records read from disk).
+
+        Args:
+            url: Target URL
+            json_data: JSON data to send
+            headers: Additional headers (e.g., Authorization)
+            chunk_size: Uncompressed bytes per chunk (defaults to Config.PUSH_CHUNK_SIZE)
+            compress: Gzip the body (defaults to Config.PUSH_COMPRESS)
+
+        Returns:
+            Response JSON as dictionary, or None on failure
+        """
+        chunk_size = chunk_size or Config.PUSH_CHUNK_SIZE
+        compress = Config.PUSH_COMPRESS if compress is None else compress
+
+        request_headers = {"Content-Type": self.serializer.content_type}
+        if compress:
+            request_headers["Content-Encoding"] = "gzip"
+        if headers:
+            request_headers.update(headers)
+
+        import_requests()
+        try:
+            logger.info(f"Streaming POST request to: {url}")
 
             response = self.session.post(
                 url,
-                json=json_data,
+                data=self._iter_body(json_data, chunk_size, compress),
                 headers=request_headers,
                 timeout=self.timeout
             )
 
-            logger.info(f"HTTP Status Code: {response.status_code}")
+            # The body generator is consumed, so a rejected encoding is only
+            # switched for the next attempt rather than retried here
+            self._negotiate_down(response)
 
-            if response.status_code >= 200 and response.status_code < 300:
-                try:
-                    return response.json()
-                except ValueError:
-                    logger.warning("Response is not valid JSON")
-                    return {}
-            else:
-                logger.error(f"HTTP request failed with status {response.status_code}")
-                logger.error(f"Response: {response.text}")
-                return None
+            return self._handle_response(response)
 
         except requests.exceptions.Timeout:
             logger.error(f"Request timeout after {self.timeout} seconds")
@@ -78,3 +210,63 @@ class HttpClient:
         except Exception as e:
             logger.error(f"Unexpected error during HTTP request: {e}")
             return None
+
+    def _iter_body(self, json_data: Dict[str, Any], chunk_size: int,
+                   compress: bool) -> Iterator[bytes]:
+        """Yield the encoded (and optionally gzipped) body in bounded chunks"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        buffer = bytearray()
+
+        for fragment in self.serializer.iter_encode(json_data):
+            buffer += fragment
+            if len(buffer) >= chunk_size:
+                chunk = compressor.compress(buffer) if compressor else bytes(buffer)
+                buffer.clear()
+                # Empty chunks would terminate the chunked body early
+                if chunk:
+                    yield chunk
+
+        tail = bytes(buffer)
+        if compressor:
+            tail = compressor.compress(tail) + compressor.flush()
+        if tail:
+            yield tail
+
+    def _negotiate_down(self, response: "requests.Response") -> bool:
+        """Switch to the fallback serializer if the server rejected our encoding"""
+        if response.status_code != 415 or self.serializer.fallback is None:
+            return False
+
+        logger.warning(f"Server rejected {self.serializer.content_type}, "
+                       f"falling back to {self.serializer.fallback.content_type}")
+        self.serializer = self.serializer.fallback
+        return True
+
+    def _handle_response(self, response: "requests.Response") -> Optional[Dict[str, Any]]:
+        """Convert an HTTP response into the make_post_request return value"""
+        logger.info(f"HTTP Status Code: {response.status_code}")
+
+        if response.status_code >= 200 and response.status_code < 300:
+            try:
+                return response.json()
+            except ValueError:
+                logger.warning("Response is not valid JSON")
+                return {}
+        else:
+            logger.error(f"HTTP request failed with status {response.status_code}")
+            logger.error(f"Response: {response.text}")
+            return None
+
+    def _post_encoded(self, url: str, json_data: Dict[str, Any],
+                      headers: Optional[Dict[str, str]] = None) -> "requests.Response":
+        """Encode payload with the current serializer and POST it"""
+        request_headers = {"Content-Type": self.serializer.content_type}
+        if headers:
+            request_headers.update(headers)
+
+        return self.session.post(
+            url,
+            data=self.serializer.encode(json_data),
+            headers=request_headers,
+            timeout=self.timeout
+        )
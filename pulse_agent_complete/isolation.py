@@ -0,0 +1,245 @@
+"""
+Collector isolation for Pulse Agent
+Runs the Docker and system collectors named in PA_ISOLATE_COLLECTORS in
+pre-forked worker processes that send results back over a pipe
+
+The Docker SDK and disk_usage() on a stale NFS mount can block in calls no
+thread timeout can interrupt. A worker that misses its deadline is killed and
+a fresh one forked in its place, so the cycle goes on with the collector's
+fallback values and reports it under additional.killed_collectors.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .config import Config
+from .docker_client import DockerClient
+from .system_client import SystemClient
+
+logger = logging.getLogger(__name__)
+
+# Collector kind -> methods a worker may run on its client
+COLLECTOR_METHODS = {
+    "docker": ("get_detailed_metrics", "get_container_health"),
+    "system": ("get_all_metrics",),
+}
+
+# Seconds to wait for a killed worker to exit; one stuck in an uninterruptible
+# call only exits when the call returns, so it is left to exit on its own
+REAP_SECONDS = 0.5
+
+_pool: Optional["CollectorPool"] = None
+_pool_lock = threading.Lock()
+
+
+class CollectorKilled(TimeoutError):
+    """A collector missed its deadline and its worker was killed"""
+
+
+class _Worker:
+    """One worker process and the parent's end of its pipe"""
+
+    def __init__(self, context, kind: str, factory: Callable[[], Any]):
+        self.kind = kind
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn, factory),
+                                       name=f"pulse-collector-{kind}", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self) -> bool:
+        """Kill the worker, returning whether it has exited"""
+        self.conn.close()
+        self.process.kill()
+        self.process.join(REAP_SECONDS)
+        return not self.process.is_alive()
+
+
+class CollectorPool:
+    """
+    Pre-forked worker processes, one per isolated collector kind
+
+    Workers are forked from a fork server, so they start from a clean
+    process rather than a copy of the agent's threads, and each keeps its
+    Docker or system client between calls. Calls for the same kind wait for
+    its worker; the wait counts against the call's timeout.
+    """
+
+    def __init__(self, kinds: Iterable[str], timeout: float = 30.0,
+                 factories: Optional[Dict[str, Callable[[], Any]]] = None):
+        """
+        Initialize collector pool
+
+        Args:
+            kinds: Collector kinds to isolate (docker, system)
+            timeout: Seconds a collector may run before its worker is killed
+            factories: Kind -> picklable callable creating the worker's client
+                (defaults to DockerClient and SystemClient)
+
+        Raises:
+            ValueError: If a kind is unknown
+        """
+        self.kinds = set(kinds)
+        unknown = self.kinds - set(COLLECTOR_METHODS)
+        if unknown:
+            raise ValueError(f"Unknown collectors to isolate: {', '.join(sorted(unknown))} "
+                             f"(known: {', '.join(COLLECTOR_METHODS)})")
+        self.timeout = timeout
+        self._factories = dict({"docker": DockerClient, "system": SystemClient}, **(factories or {}))
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._context = multiprocessing.get_context(method)
+        if method == "forkserver":
+            # Imported once in the fork server instead of in every worker
+            self._context.set_forkserver_preload([__name__])
+        self._workers: Dict[str, _Worker] = {}
+        self._locks = {kind: threading.Lock() for kind in self.kinds}
+        # Killed workers that had not exited yet
+        self._abandoned: List[_Worker] = []
+        self.killed: Dict[str, int] = {kind: 0 for kind in self.kinds}
+
+    def start(self):
+        """Fork a worker for every kind"""
+        for kind in sorted(self.kinds):
+            self._workers[kind] = _Worker(self._context, kind, self._factories[kind])
+        logger.info(f"Collector workers started for: {', '.join(sorted(self.kinds))}")
+
+    def collect(self, kind: str, method: str, timeout: Optional[float] = None, args: tuple = ()) -> Any:
+        """
+        Run a collector method in its kind's worker
+
+        Args:
+            kind: Collector kind
+            method: Client method to run (see COLLECTOR_METHODS)
+            timeout: Seconds before the worker is killed (defaults to the pool's)
+            args: Picklable arguments for the method
+
+        Returns:
+            The method's result
+
+        Raises:
+            CollectorKilled: If the worker missed the deadline and was killed
+            TimeoutError: If no time was left, or the worker stayed busy with another call
+            RuntimeError: If the method raised or the worker exited
+        """
+        if method not in COLLECTOR_METHODS.get(kind, ()):
+            raise ValueError(f"Collector '{kind}' has no method '{method}'")
+        timeout = self.timeout if timeout is None else timeout
+        if timeout <= 0:
+            raise TimeoutError(f"No time left for the {kind} collector")
+
+        deadline = time.monotonic() + timeout
+        if not self._locks[kind].acquire(timeout=timeout):
+            raise TimeoutError(f"The {kind} collector is still busy with another call")
+        try:
+            self._reap()
+            worker = self._workers.get(kind)
+            if worker is None or not worker.process.is_alive():
+                worker = self._respawn(kind)
+            try:
+                worker.conn.send((method, args))
+                ready = worker.conn.poll(max(0.0, deadline - time.monotonic()))
+                if ready:
+                    status, value = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                self._respawn(kind)
+                raise RuntimeError(f"The {kind} collector worker exited: {e}") from None
+
+            if not ready:
+                self.killed[kind] += 1
+                if not worker.kill():
+                    logger.warning(f"Killed {kind} collector worker {worker.process.pid} has not exited "
+                                   f"(uninterruptible call?); leaving it to exit on its own")
+                    self._abandoned.append(worker)
+                self._workers[kind] = _Worker(self._context, kind, self._factories[kind])
+                raise CollectorKilled(f"The {kind} collector did not finish within {timeout:.1f}s; "
+                                      f"its worker was killed and replaced")
+            if status == "error":
+                raise RuntimeError(value)
+            return value
+        finally:
+            self._locks[kind].release()
+
+    def _respawn(self, kind: str) -> _Worker:
+        """Replace a kind's worker that exited"""
+        worker = self._workers.get(kind)
+        if worker is not None:
+            worker.kill()
+            logger.warning(f"The {kind} collector worker exited (code {worker.process.exitcode}), "
+                           f"starting a new one")
+        self._workers[kind] = _Worker(self._context, kind, self._factories[kind])
+        return self._workers[kind]
+
+    def _reap(self):
+        """Forget killed workers that have exited since"""
+        for worker in list(self._abandoned):
+            worker.process.join(0)
+            if not worker.process.is_alive():
+                self._abandoned.remove(worker)
+
+    def stop(self):
+        """Stop every worker"""
+        for worker in list(self._workers.values()) + self._abandoned:
+            worker.kill()
+        self._workers = {}
+        self._abandoned = []
+
+
+def get_collector_pool() -> Optional[CollectorPool]:
+    """
+    The process's collector pool for PA_ISOLATE_COLLECTORS, started on first use
+
+    Returns:
+        The pool, or None when no collector is isolated
+    """
+    global _pool
+    if not Config.ISOLATE_COLLECTORS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            pool = CollectorPool(Config.ISOLATE_COLLECTORS, Config.COLLECTOR_TIMEOUT)
+            pool.start()
+            _pool = pool
+    return _pool
+
+
+def shutdown_collector_pool():
+    """Stop the process's collector pool, if started"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.stop()
+            _pool = None
+
+
+atexit.register(shutdown_collector_pool)
+
+
+def _serve(conn, factory: Callable[[], Any]):
+    """Worker loop: run the requested client methods until the pipe closes"""
+    # Ctrl-C and SIGTERM are for the agent; it stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    from .logging_setup import configure_logging
+    configure_logging(Config.LOG_LEVEL, Config.LOG_FORMAT, rate_limit=Config.LOG_RATE_LIMIT, use_queue=False)
+
+    client = None
+    while True:
+        try:
+            method, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            if client is None:
+                client = factory()
+            result = ("ok", getattr(client, method)(*args))
+        except Exception as e:
+            result = ("error", f"{type(e).__name__}: {e}")
+        try:
+            conn.send(result)
+        except (BrokenPipeError, OSError):
+            return
@@ -0,0 +1,234 @@
+"""
+Logging setup for Pulse Agent
+Text or JSON-lines output; records are queued and written by a listener thread
+so file and syslog I/O stays off the collection threads, repeated warnings
+and errors from one call site are rate-limited, and records logged during a
+site's cycle are tagged with the site
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Listener writing queued records, while configure_logging() is in effect
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Site whose cycle the current thread (or task) is running
+_site: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("pulse_log_site", default=None)
+
+
+@contextmanager
+def log_site(name: Optional[str]) -> Iterator[None]:
+    """
+    Tag records logged inside the block with a site name (None leaves them untagged)
+
+    The tag follows contextvars, so worker threads only carry it when they
+    run in a copy of the caller's context (contextvars.copy_context().run).
+    """
+    token = _site.set(name)
+    try:
+        yield
+    finally:
+        _site.reset(token)
+
+
+class SiteFilter(logging.Filter):
+    """Sets record.site from log_site(); runs on the logging thread, where the context is"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "site"):
+            record.site = _site.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line
+
+    Fields: ts (UTC, milliseconds), level, logger, message and thread, plus
+    site when logged during a site's cycle, exc_info when the record carries
+    a traceback, suppressed when the rate limit dropped earlier records from
+    the same call site, and the keys of a `fields` dict passed with
+    extra={"fields": {...}}.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        site = getattr(record, "site", None)
+        if site:
+            entry["site"] = site
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The agent's text format, prefixing the site and noting records dropped by the rate limit"""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        site = getattr(record, "site", None)
+        if site and not record.message.startswith(f"[{site}]"):
+            record = copy.copy(record)
+            record.message = f"[{site}] {record.message}"
+        message = super().formatMessage(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            message += f" ({suppressed} similar messages suppressed)"
+        return message
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `burst` WARNING-or-above records per call site per
+    `window` seconds
+
+    A call site is the file and line of the logging call, so an error repeated
+    every cycle with a different message still counts as one. The first record
+    let through after a window carries the number dropped in `suppressed`.
+    Records below WARNING are never limited.
+    """
+
+    def __init__(self, burst: int = 10, window: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.clock = clock
+        # (pathname, lineno) -> [window start, records let through, records dropped]
+        self._sites: Dict[Tuple[str, int], List] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = self.clock()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                if site is not None and site[2]:
+                    record.suppressed = site[2]
+                self._sites[key] = [now, 1, 0]
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that only renders the message and traceback before queueing
+
+    The stock handler formats the whole record on the logging thread; here the
+    formatter runs on the listener, so text and JSON output both get the
+    record's fields.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def build_handlers(log_format: str = "text", log_file: str = "", syslog: str = "") -> List[logging.Handler]:
+    """
+    Build the output handlers: stderr, plus a file and syslog when configured
+
+    Args:
+        log_format: "text" or "json"
+        log_file: Path of a log file; reopened when logrotate moves it
+        syslog: Syslog socket path (e.g. /dev/log) or host:port for UDP
+    """
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(logging.handlers.WatchedFileHandler(log_file))
+    if syslog:
+        host, _, port = syslog.rpartition(":")
+        address = (host, int(port)) if host and port.isdigit() else syslog
+        handlers.append(logging.handlers.SysLogHandler(address=address))
+
+    formatter = JsonFormatter() if log_format == "json" else TextFormatter(TEXT_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def configure_logging(level: str = "INFO", log_format: str = "text", log_file: str = "",
+                      syslog: str = "", rate_limit: int = 10, use_queue: bool = True) -> None:
+    """
+    Configure the root logger, replacing any earlier configuration
+
+    Args:
+        level: Root level name (DEBUG, INFO, WARNING, ...)
+        log_format: "text" or "json"
+        log_file: Also write to this file
+        syslog: Also send to this syslog address
+        rate_limit: WARNING-or-above records per call site per minute (0 = no limit)
+        use_queue: Write from a listener thread instead of the logging thread
+    """
+    global _listener
+    shutdown_logging()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    handlers = build_handlers(log_format, log_file, syslog)
+    if use_queue:
+        entry_handlers = [_QueueHandler(queue.SimpleQueue())]
+        _listener = logging.handlers.QueueListener(entry_handlers[0].queue, *handlers,
+                                                    respect_handler_level=True)
+        _listener.start()
+    else:
+        entry_handlers = handlers
+
+    for handler in entry_handlers:
+        handler.addFilter(SiteFilter())
+        if rate_limit > 0:
+            # On the entry handler, so dropped records are never queued
+            handler.addFilter(RateLimitFilter(burst=rate_limit))
+        root.addHandler(handler)
+
+
+def shutdown_logging() -> None:
+    """Stop the listener thread after it has written every queued record"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
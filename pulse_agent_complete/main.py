@@ -4,240 +4,502 @@ Pulse Agent - Main entry point
 Lightweight Python agent for data collection and synchronization
 """
 
-import sys
+import argparse
 import json
+import signal
+import sys
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
+from .advisor import add_advise_arguments, run_advise_command
+from .change_feed import ChangeFeed, add_change_feed_arguments, run_change_feed_command
 from .config import Config
-from .db_client import DatabaseClient, QueryLoader
-from .aggregator import DataAggregator
-from .http_client import HttpClient
+from .cycle import Cycle
+from .db_client import QueryLoader
+from .history import HistoryOutbox, HistoryStore, add_history_arguments, run_history_command
+from .http_client import import_requests
+from .logging_setup import configure_logging, log_site
+from .push import Outbox, PushDispatcher
+from .sites import SiteConfig, get_sites
 from .state_manager import StateManager
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+if TYPE_CHECKING:
+    from .metrics_server import MetricsCache
+    from .triggers import TriggerSampler
+
 logger = logging.getLogger(__name__)
 
 
-def main():
+def build_history(history_filepath: Path) -> Optional[HistoryStore]:
+    """Build the run-history store, or None when disabled"""
+    if not Config.HISTORY_ENABLED:
+        return None
+    return HistoryStore(history_filepath, Config.HISTORY_RETENTION_DAYS)
+
+
+def build_outbox_factory(history: Optional[HistoryStore], outbox_dir: Path):
+    """Build the per-destination outbox factory for a site"""
+    if history is not None:
+        # Outboxes reference cycles recorded in history instead of copying payloads
+        return lambda name: HistoryOutbox(history, name, Config.OUTBOX_MAX_ITEMS)
+    return lambda name: Outbox(outbox_dir / name, Config.OUTBOX_MAX_ITEMS)
+
+
+def build_dispatcher(history: Optional[HistoryStore] = None,
+                     pool_size: Optional[int] = None) -> PushDispatcher:
+    """Build the push dispatcher for the configured destinations"""
+    return PushDispatcher.from_config(
+        Config.get_push_destinations(),
+        Config.PUSH_COMMIT_POLICY,
+        build_outbox_factory(history, Config.get_outbox_dir()),
+        pool_size
+    )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(prog="pulse-agent", description="Pulse Agent")
+    commands = parser.add_subparsers(dest="command")
+
+    history_parser = commands.add_parser("history", help="query the local run history")
+    history_parser.add_argument("--site", help="site name (multi-site mode)")
+    add_history_arguments(history_parser)
+
+    advise_parser = commands.add_parser("advise", help="explain the configured queries and suggest indexes")
+    advise_parser.add_argument("--site", help="site name (multi-site mode)")
+    add_advise_arguments(advise_parser)
+
+    feed_parser = commands.add_parser("change-feed", help="install the PostgreSQL change feed triggers")
+    feed_parser.add_argument("--site", help="site name (multi-site mode)")
+    add_change_feed_arguments(feed_parser)
+
+    parser.add_argument("--interval", type=int, default=Config.RUN_INTERVAL,
+                        help="keep running, starting a cycle every INTERVAL seconds (0 runs once)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report the import cost of a fresh start as JSON and exit")
+
+    return parser.parse_args(argv)
+
+
+def find_site(sites: List[SiteConfig], name: Optional[str]) -> Optional[SiteConfig]:
+    """Find a site by name; without a name only a single configured site matches"""
+    if name is None:
+        return sites[0] if len(sites) == 1 else None
+    return next((site for site in sites if site.name == name), None)
+
+
+def main(argv=None):
     """Main entry point"""
+    args = parse_args(argv)
+    configure_logging(Config.LOG_LEVEL, Config.LOG_FORMAT, Config.LOG_FILE, Config.LOG_SYSLOG,
+                      Config.LOG_RATE_LIMIT, Config.LOG_ASYNC)
+
+    if args.profile_startup:
+        from .startup import profile_startup
+        report = profile_startup()
+        print(json.dumps(report, indent=2))
+        return 0 if report["import_ms"] <= report["budget_ms"] and not report["eager_heavy_modules"] else 1
+
+    try:
+        sites = get_sites()
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Invalid site configuration: {e}")
+        return 2
+
+    if args.command in ("history", "advise", "change-feed"):
+        site = find_site(sites, args.site)
+        if site is None:
+            logger.error(f"Use --site with one of: {', '.join(s.name for s in sites)}")
+            return 2
+
+    if args.command == "advise":
+        return run_advise_command(args, site)
+
+    if args.command == "change-feed":
+        return run_change_feed_command(args, site, QueryLoader(site.queries_file))
+
+    try:
+        destinations = Config.get_push_destinations()
+    except (OSError, ValueError) as e:
+        logger.error(f"Invalid PA_PUSH_DESTINATIONS: {e}")
+        return 2
+
+    if args.command == "history":
+        history = HistoryStore(site.history_filepath, Config.HISTORY_RETENTION_DAYS)
+        try:
+            dispatcher = build_dispatcher().with_outboxes(
+                build_outbox_factory(history, site.data_filepath.parent / "outbox"))
+            return run_history_command(args, history, dispatcher)
+        finally:
+            history.close()
+
     logger.info(f"Pulse Agent v{Config.get_version()}")
     logger.info(f"Pull URL: {Config.PULL_URL} (deprecated - using direct DB)")
-    logger.info(f"Push URL: {Config.PUSH_URL}")
+    for destination in destinations:
+        logger.info(f"Push URL: {destination['url']} ({destination.get('name', 'unnamed')})")
+    logger.info(f"Push commit policy: {Config.PUSH_COMMIT_POLICY}")
     logger.info(f"Data Directory: {Config.get_data_dir()}")
-    logger.info(f"Data File Path: {Config.get_data_filepath()}")
-    logger.info(f"Database: {Config.DB_TYPE}://{Config.DB_USER}@{Config.DB_HOST}:{Config.DB_PORT}/{Config.DB_NAME}")
 
-    # Initialize state manager
-    state_manager = StateManager(Config.get_data_filepath())
+    # One dispatcher (and HTTP connection pool) is shared by all sites
+    concurrency = max(1, min(Config.SITE_CONCURRENCY, len(sites)))
+    dispatcher = build_dispatcher(pool_size=concurrency)
 
-    # Read current batch_index
-    batch_index = state_manager.get_batch_index()
-    logger.info(f"Current batch_index: {batch_index}")
+    if Config.ISOLATE_COLLECTORS:
+        # Fork the collector workers before the first cycle needs them
+        from .isolation import get_collector_pool
+        get_collector_pool()
 
-    # Display current state
-    state = state_manager.read_state()
-    if state:
-        logger.info(f"Current state: {json.dumps(state, indent=2)}")
-    else:
-        logger.info("No existing state file found")
+    # Import the HTTP stack while the first cycle waits on the databases
+    threading.Thread(target=import_requests, name="import-requests", daemon=True).start()
 
-    try:
-        # Get start and end times
-        start_time, end_time = state_manager.get_start_end_times()
-        logger.info(f"Query time range: {start_time} to {end_time}")
-
-        # Initialize database client
-        db_client = DatabaseClient(
-            db_type=Config.DB_TYPE,
-            host=Config.DB_HOST,
-            port=Config.DB_PORT,
-            database=Config.DB_NAME,
-            user=Config.DB_USER,
-            password=Config.DB_PASSWORD,
-            ssl_mode=Config.DB_SSL_MODE
-        )
-
-        # Load SQL queries
-        queries_file = Config.get_queries_filepath()
-        logger.info(f"Loading queries from: {queries_file}")
-        query_loader = QueryLoader(queries_file)
-
-        # Initialize aggregator
-        aggregator = DataAggregator(db_client, query_loader)
-
-        # Connect to database and fetch stats
-        logger.info("=== DATABASE QUERY ===")
-        with db_client:
-            if not db_client.is_connected():
-                logger.error("Failed to connect to database")
-                raise ConnectionError("Database connection failed")
-
-            pull_response = aggregator.fetch_stats(
-                start_time=start_time,
-                end_time=end_time,
-                client_id=Config.CLIENT_ID,
-                site_id=Config.SITE_ID
-            )
-
-        # Prepare push payload
-        batch_index += 1
-        push_uuid = state_manager.get_or_generate_push_uuid()
-
-        push_payload = {
-            "client_id": Config.CLIENT_ID,
-            "site_id": Config.SITE_ID,
-            "batch_index": batch_index,
-            "uuid": push_uuid,
-            "stats": pull_response.get("stats", {}),
-            "additional": {}
-        }
-
-        # Update stats status based on success/failure
-        if not pull_response or not pull_response.get("stats"):
-            push_payload["stats"]["status"] = "failure"
-            push_payload["additional"] = {
-                "error_message": "Database query failed or returned no data"
-            }
-
-        # Push data to destination
-        logger.info("=== PUSH REQUEST ===")
-        logger.info(f"Pushing data to: {Config.PUSH_URL}")
-        logger.info(f"Using UUID: {push_uuid}")
-        logger.info(f"Using batch_index: {batch_index}")
-
-        http_client = HttpClient(timeout=Config.TIMEOUT, user_agent=Config.USER_AGENT)
-        push_headers = {
-            "Authorization": f"Bearer {Config.PUSH_TOKEN}"
-        }
-
-        push_response = http_client.make_post_request(
-            Config.PUSH_URL,
-            push_payload,
-            push_headers
-        )
-
-        if push_response is not None:
-            logger.info("[SUCCESS] PUSH: Data delivered successfully")
-
-            # Save timestamp if pull was successful
-            if pull_response and pull_response.get("stats"):
-                state_manager.save_successful_timestamp(end_time)
-                logger.info("Saved successful timestamp")
-
-            # Update batch_index
-            state_manager.update_batch_index(batch_index)
-            logger.info(f"Updated batch_index to {batch_index}")
-        else:
-            logger.error(f"[FAILED] PUSH: Could not deliver data to {Config.PUSH_URL}")
-
-            # Save failed UUID for retry
-            state_manager.save_failed_push_uuid(push_uuid)
-            logger.info("Saved failed push UUID for retry")
-
-            # Revert batch_index
-            batch_index -= 1
-            state_manager.update_batch_index(batch_index)
-
-            logger.error("Pulse Agent execution failed - push operation unsuccessful")
-            return 1
+    if args.interval > 0:
+        return run_forever(sites, dispatcher, concurrency, args.interval)
+    return run_once(sites, dispatcher, concurrency)
 
-        # Display final state
-        final_state = state_manager.read_state()
-        if final_state:
-            logger.info("Final state:")
-            logger.info(json.dumps(final_state, indent=2))
-
-        logger.info("Pulse Agent execution completed successfully")
-        return 0
-
-    except ConnectionError as e:
-        logger.error(f"Connection error: {e}")
-        # Create failure status data
-        start_time, end_time = state_manager.get_start_end_times()
-
-        # Try to push failure status
-        batch_index += 1
-        push_uuid = state_manager.get_or_generate_push_uuid()
-
-        error_payload = {
-            "client_id": Config.CLIENT_ID,
-            "site_id": Config.SITE_ID,
-            "batch_index": batch_index,
-            "uuid": push_uuid,
-            "stats": {
-                "status": "failure",
-                "start_time": start_time,
-                "end_time": end_time,
-                "error_message": "Database connection failed"
-            },
-            "additional": {"error_message": "Database connection failed"}
-        }
-
-        http_client = HttpClient(timeout=Config.TIMEOUT, user_agent=Config.USER_AGENT)
-        push_headers = {"Authorization": f"Bearer {Config.PUSH_TOKEN}"}
-
-        logger.info("Attempting to push failure status...")
-        push_response = http_client.make_post_request(
-            Config.PUSH_URL,
-            error_payload,
-            push_headers
-        )
-
-        if push_response:
-            state_manager.update_batch_index(batch_index)
-            logger.info("Failure status pushed successfully")
-        else:
-            batch_index -= 1
-            state_manager.save_failed_push_uuid(push_uuid)
 
-        return 1
+def run_once(sites: List[SiteConfig], dispatcher: PushDispatcher, concurrency: int,
+             query_loaders: Optional[Dict[Path, QueryLoader]] = None,
+             metrics: Optional["MetricsCache"] = None) -> int:
+    """Run one cycle for every site, returning the process exit code"""
+    query_loaders = query_loaders or {}
 
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}", exc_info=True)
+    if len(sites) == 1:
+        return run_site(sites[0], dispatcher, query_loaders.get(sites[0].queries_file), metrics)
 
-        # Try to send error payload
-        try:
-            start_time, end_time = state_manager.get_start_end_times()
-            batch_index += 1
-            push_uuid = state_manager.get_or_generate_push_uuid()
-
-            error_payload = {
-                "client_id": Config.CLIENT_ID,
-                "site_id": Config.SITE_ID,
-                "batch_index": batch_index,
-                "uuid": push_uuid,
-                "stats": {
-                    "status": "error",
-                    "start_time": start_time,
-                    "end_time": end_time,
-                    "error_message": str(e)
-                },
-                "additional": {"error_message": str(e)}
-            }
-
-            http_client = HttpClient(timeout=Config.TIMEOUT, user_agent=Config.USER_AGENT)
-            push_headers = {"Authorization": f"Bearer {Config.PUSH_TOKEN}"}
-
-            push_response = http_client.make_post_request(
-                Config.PUSH_URL,
-                error_payload,
-                push_headers
-            )
-
-            if push_response:
-                state_manager.update_batch_index(batch_index)
-            else:
-                batch_index -= 1
-        except Exception as e2:
-            logger.error(f"Failed to send error payload: {e2}")
+    logger.info(f"Multi-site mode: {len(sites)} sites, concurrency {concurrency}")
+    if Config.BULK_PUSH:
+        exit_codes = run_sites_bulk(sites, dispatcher, concurrency, query_loaders, metrics)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="site") as executor:
+            exit_codes = list(executor.map(
+                lambda site: run_site(site, dispatcher, query_loaders.get(site.queries_file), metrics), sites))
 
+    failed = [site.name for site, code in zip(sites, exit_codes) if code != 0]
+    if failed:
+        logger.error(f"{len(failed)}/{len(sites)} sites failed: {', '.join(failed)}")
         return 1
 
+    logger.info(f"All {len(sites)} sites completed successfully")
+    return 0
+
+
+def run_forever(sites: List[SiteConfig], dispatcher: PushDispatcher, concurrency: int,
+                interval: int) -> int:
+    """
+    Run cycles every interval seconds until SIGTERM or SIGINT
+
+    Queries files are loaded once and watched; a changed file is validated
+    in the background and swapped in before the next cycle. With
+    PA_METRICS_PORT set, the latest metrics are also served for scraping,
+    and with PA_CHANGE_FEED each site's feed counts are kept live. Between
+    cycles, sites' trigger rules are evaluated every PA_TRIGGER_TICK seconds
+    and a site whose rule fires runs an immediate cycle; the regular schedule
+    is unchanged.
+    """
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    query_loaders = {}
+    for site in sites:
+        if site.queries_file not in query_loaders:
+            loader = QueryLoader(site.queries_file)
+            loader.watch(Config.QUERIES_POLL_INTERVAL)
+            query_loaders[site.queries_file] = loader
+    if Config.CHANGE_FEED:
+        sync_change_feeds(sites, query_loaders)
+
+    metrics = metrics_server = None
+    if Config.METRICS_PORT > 0:
+        from .metrics_server import MetricsCache, MetricsServer
+        metrics = MetricsCache(Config.get_version())
+        metrics_server = MetricsServer(metrics, Config.METRICS_HOST, Config.METRICS_PORT)
+        metrics_server.start()
+
+    samplers = {}
+    if Config.TRIGGER_TICK > 0:
+        from .triggers import TriggerSampler
+        samplers = {site.name: TriggerSampler(site, query_loaders[site.queries_file], Config.TRIGGER_MAX_PUSHES)
+                    for site in sites}
+
+    logger.info(f"Long-running mode: a cycle every {interval}s")
+    exit_code = 0
+    try:
+        while not stop.is_set():
+            started = time.monotonic()
+            reloaded = {path for path, loader in query_loaders.items() if loader.apply_pending() is not None}
+            if Config.CHANGE_FEED and reloaded:
+                sync_change_feeds(sites, query_loaders)
+            for site in sites:
+                if site.queries_file in reloaded and site.name in samplers:
+                    samplers[site.name].reload()
+
+            exit_code = run_once(sites, dispatcher, concurrency, query_loaders, metrics)
+
+            next_cycle = started + interval
+            while not stop.is_set() and time.monotonic() < next_cycle:
+                if not any(sampler.rules for sampler in samplers.values()):
+                    stop.wait(next_cycle - time.monotonic())
+                    break
+                stop.wait(min(Config.TRIGGER_TICK, max(0.0, next_cycle - time.monotonic())))
+                if not stop.is_set() and time.monotonic() < next_cycle:
+                    run_triggers(sites, samplers, dispatcher, concurrency, query_loaders, metrics)
+    finally:
+        for sampler in samplers.values():
+            sampler.close()
+        for loader in query_loaders.values():
+            loader.stop_watching()
+        if metrics_server is not None:
+            metrics_server.stop()
+        for site in sites:
+            if site.change_feed is not None:
+                site.change_feed.stop()
+                site.change_feed = None
+
+    logger.info("Pulse Agent stopped")
+    return exit_code
+
+
+def run_triggers(sites: List[SiteConfig], samplers: Dict[str, "TriggerSampler"],
+                 dispatcher: PushDispatcher, concurrency: int,
+                 query_loaders: Dict[Path, QueryLoader],
+                 metrics: Optional["MetricsCache"] = None):
+    """Evaluate every site's trigger rules and run an immediate cycle for sites whose rules fired"""
+    def tick(site: SiteConfig):
+        sampler = samplers.get(site.name)
+        if sampler is None or not sampler.rules:
+            return
+        try:
+            with site_logging(site):
+                fired = sampler.tick()
+        except Exception as e:
+            logger.error(f"[{site.name}] Trigger evaluation failed: {e}", exc_info=True)
+            return
+        if fired:
+            logger.warning(f"[{site.name}] Triggers fired: {', '.join(detail['rule'] for detail in fired)}; "
+                           f"pushing now")
+            run_site(site, dispatcher, query_loaders.get(site.queries_file), metrics, fired)
+
+    if len(sites) == 1:
+        tick(sites[0])
+        return
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="trigger") as executor:
+        list(executor.map(tick, sites))
+
+
+def sync_change_feeds(sites: List[SiteConfig], query_loaders: Dict[Path, QueryLoader]):
+    """Start, restart or stop each site's change feed to match its queries file"""
+    for site in sites:
+        config = query_loaders[site.queries_file].get_change_feed()
+        feed = site.change_feed
+        if feed is not None and feed.config == config:
+            continue
+        if feed is not None:
+            feed.stop()
+            site.change_feed = None
+        if not config:
+            continue
+        db = site.sources.get(config["source"])
+        if db is None or db["type"] != "postgresql":
+            logger.warning(f"[{site.name}] The change feed needs PostgreSQL data source "
+                           f"'{config['source']}'; feed queries keep running as SQL")
+            continue
+        site.change_feed = ChangeFeed(site.name, db, config, Config.CHANGE_FEED_RECONCILE)
+        site.change_feed.start()
+
+
+def open_site(site: SiteConfig, dispatcher: PushDispatcher):
+    """
+    Lock a site's state and open its history and per-site dispatcher
+
+    Returns:
+        Tuple of (state manager, history, site dispatcher), or None when
+        another run holds the site's state lock
+    """
+    logger.info(f"[{site.name}] Data File Path: {site.data_filepath}")
+    logger.info(f"[{site.name}] Database: {site.describe_db()}")
+
+    # Initialize state manager and keep overlapping runs apart
+    state_manager = StateManager(site.data_filepath)
+    if not state_manager.acquire_lock():
+        logger.error(f"[{site.name}] Another Pulse Agent run holds the state lock "
+                     f"({state_manager.lock_filepath}), skipping")
+        return None
+
+    history = build_history(site.history_filepath)
+    site_dispatcher = dispatcher.with_outboxes(
+        build_outbox_factory(history, site.data_filepath.parent / "outbox"))
+    return state_manager, history, site_dispatcher
+
+
+def close_site(site: SiteConfig, state_manager: StateManager, history: Optional[HistoryStore],
+               dispatcher: Optional[PushDispatcher] = None, acked: Optional[List[str]] = None) -> bool:
+    """
+    Persist a site's state, flush outboxes, and release its lock and history
+
+    Outboxes of the destinations in acked are flushed only after the state
+    is written, so a backlog never delays the cycle's commit. The lock and
+    history are released even when the state write fails, so a long-running
+    agent keeps running the site on later cycles.
+
+    Returns:
+        True if the state was persisted
+    """
+    try:
+        persisted = True
+        try:
+            # Persist all state changes of this cycle in a single atomic write
+            state_manager.commit()
+        except Exception as e:
+            logger.error(f"[{site.name}] Failed to persist state: {e}", exc_info=True)
+            persisted = False
+        if dispatcher is not None and acked:
+            dispatcher.flush_outboxes(acked)
+        return persisted
+    finally:
+        try:
+            state_manager.release_lock()
+        finally:
+            if history is not None:
+                history.close()
+
+
+def run_site(site: SiteConfig, dispatcher: PushDispatcher,
+             query_loader: Optional[QueryLoader] = None,
+             metrics: Optional["MetricsCache"] = None,
+             triggers: Optional[List[Dict]] = None) -> int:
+    """Run one cycle for a site with its own state, history and outboxes"""
+    with site_logging(site):
+        opened = open_site(site, dispatcher)
+        if opened is None:
+            return 1
+
+        state_manager, history, site_dispatcher = opened
+        exit_code, acked = 1, []
+        try:
+            exit_code, acked = run_cycle(site, state_manager, history, site_dispatcher,
+                                         query_loader, metrics, triggers)
+        except Exception as e:
+            logger.error(f"[{site.name}] Cycle failed: {e}", exc_info=True)
+        finally:
+            if not close_site(site, state_manager, history, site_dispatcher, acked):
+                exit_code = 1
+        return exit_code
+
+
+def site_logging(site: SiteConfig):
+    """Tag log records with the site in multi-site mode (single-site logs stay as they were)"""
+    return log_site(site.name if Config.SITES_FILE else None)
+
+
+def run_cycle(site: SiteConfig, state_manager: StateManager,
+              history: Optional[HistoryStore], dispatcher: PushDispatcher,
+              query_loader: Optional[QueryLoader] = None,
+              metrics: Optional["MetricsCache"] = None,
+              triggers: Optional[List[Dict]] = None) -> Tuple[int, List[str]]:
+    """
+    Run one collect-and-push cycle for a site
+
+    Returns:
+        Tuple of (process exit code, names of the destinations that
+        acknowledged the payload, whose outboxes can be flushed)
+    """
+    cycle = Cycle(site, state_manager, history, query_loader, triggers)
+    payload = cycle.collect()
+
+    # Push data to destinations
+    logger.info("=== PUSH REQUEST ===")
+    logger.info(f"Using UUID: {payload['uuid']}")
+    logger.info(f"Using batch_index: {payload['batch_index']}")
+
+    cycle.record()
+    push_start = time.monotonic()
+    with cycle.profile_push():
+        push_result = dispatcher.push(payload)
+    cycle.timings["push_ms"] = int((time.monotonic() - push_start) * 1000)
+
+    exit_code = cycle.finish(push_result)
+    if metrics is not None:
+        metrics.update(site.name, payload, cycle.timings, cycle.started_at, push_result.committed)
+    return exit_code, push_result.acked
+
+
+def run_sites_bulk(sites: List[SiteConfig], dispatcher: PushDispatcher,
+                   concurrency: int,
+                   query_loaders: Optional[Dict[Path, QueryLoader]] = None,
+                   metrics: Optional["MetricsCache"] = None) -> List[int]:
+    """
+    Run one cycle for every site, delivering all payloads in bulk requests
+
+    Sites are collected concurrently, their payloads pushed together, and
+    each site's state is then updated from its own per-item acknowledgement,
+    so only the payloads that were not acknowledged are retried.
+
+    Returns:
+        Exit code per site, in the order of sites
+    """
+    def prepare(site: SiteConfig):
+        with site_logging(site):
+            opened = open_site(site, dispatcher)
+            if opened is None:
+                return None
+            state_manager, history, site_dispatcher = opened
+            try:
+                cycle = Cycle(site, state_manager, history,
+                              (query_loaders or {}).get(site.queries_file))
+                cycle.collect()
+                cycle.record()
+                return cycle, site_dispatcher
+            except Exception as e:
+                logger.error(f"[{site.name}] Cycle failed: {e}", exc_info=True)
+                close_site(site, state_manager, history)
+                return None
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="site") as executor:
+        prepared = list(executor.map(prepare, sites))
+
+    ready = [entry for entry in prepared if entry is not None]
+    payloads = [cycle.payload for cycle, _ in ready]
+
+    logger.info(f"=== BULK PUSH REQUEST === ({len(payloads)} payloads)")
+    push_start = time.monotonic()
+    acked_by = dispatcher.push_bulk(payloads) if payloads else {}
+    push_ms = int((time.monotonic() - push_start) * 1000)
+
+    exit_codes = [1] * len(prepared)
+    acked_names: Dict[int, List[str]] = {}
+    for index, entry in enumerate(prepared):
+        if entry is None:
+            continue
+        cycle, site_dispatcher = entry
+        with site_logging(cycle.site):
+            try:
+                cycle.timings["push_ms"] = push_ms
+                push_result = site_dispatcher.settle(cycle.payload, acked_by.get(cycle.push_uuid, []))
+                exit_codes[index] = cycle.finish(push_result)
+                acked_names[index] = push_result.acked
+                if metrics is not None:
+                    metrics.update(cycle.site.name, cycle.payload, cycle.timings, cycle.started_at,
+                                   push_result.committed)
+            except Exception as e:
+                logger.error(f"[{cycle.site.name}] Cycle failed: {e}", exc_info=True)
+
+    def close(index: int):
+        # Writes the state, then flushes the backlogs of the acknowledging destinations
+        cycle, site_dispatcher = prepared[index]
+        with site_logging(cycle.site):
+            if not close_site(cycle.site, cycle.state_manager, cycle.history,
+                              site_dispatcher, acked_names.get(index)):
+                exit_codes[index] = 1
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="site") as executor:
+        list(executor.map(close, [index for index, entry in enumerate(prepared) if entry is not None]))
+    return exit_codes
+
 
 if __name__ == "__main__":
     sys.exit(main())
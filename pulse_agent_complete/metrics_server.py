@@ -0,0 +1,308 @@
+"""
+Local metrics endpoint for Pulse Agent
+Serves the latest collected metrics and the agent's own timings in OpenMetrics
+text format for local scraping in long-running mode
+
+The exposition is rendered (and gzip-compressed) once per cycle into a cache;
+a scrape only writes those bytes out, so it never queries a database or the
+Docker daemon and costs the same however often it happens. A site's sample
+lines are formatted once per update of that site and only joined for the
+others, so the render holds the GIL (and delays concurrent scrapes) briefly.
+"""
+
+import gzip
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+METRICS_PATH = "/metrics"
+
+# Metric families: name -> (type, help). Host and Docker families found in the
+# payload are added as gauges as they appear.
+FAMILIES = {
+    "pulse_agent_build_info": ("gauge", "Pulse Agent version, always 1"),
+    "pulse_agent_cycles": ("counter", "Cycles run since the agent started, by result"),
+    "pulse_agent_cycle_duration_seconds": ("gauge", "Duration of the last cycle's phases"),
+    "pulse_agent_last_cycle_timestamp_seconds": ("gauge", "Start time of the last cycle"),
+    "pulse_agent_last_success_timestamp_seconds": ("gauge", "Start time of the last cycle whose push committed"),
+    "pulse_agent_batch_index": ("gauge", "Batch index of the last cycle's payload"),
+    "pulse_agent_query_timeouts": ("gauge", "Queries cancelled for their timeout in the last cycle"),
+    "pulse_agent_source_errors": ("gauge", "Data sources that failed in the last cycle"),
+    "pulse_agent_collectors_killed": ("gauge", "Isolated collectors killed for their deadline in the last cycle"),
+    "pulse_query_value": ("gauge", "Latest value of a configured query"),
+    "pulse_docker_container_running": ("gauge", "Whether a container is running"),
+    "pulse_docker_container_healthy": ("gauge", "Whether a container with a health check is healthy"),
+}
+
+# Sections of system_metrics with numeric leaves exported as pulse_host_<section>_<key>
+HOST_SECTIONS = ("system", "memory", "processes", "services")
+
+# Stats keys that are not query values
+STATS_META = ("status", "start_time", "end_time", "error_message", "system_metrics", "docker_metrics")
+
+Sample = Tuple[Dict[str, str], Any]
+
+
+class MetricsCache:
+    """
+    Latest metrics of every site, pre-rendered for scraping
+
+    update() runs on the cycle's thread after a site's cycle, formats that
+    site's sample lines and re-joins the exposition; body() hands out the
+    current bytes. A failed cycle updates the agent's own metrics and keeps
+    the site's last collected values.
+    """
+
+    def __init__(self, version: str = ""):
+        """
+        Initialize metrics cache
+
+        Args:
+            version: Agent version for pulse_agent_build_info
+        """
+        self.version = version
+        self._lock = threading.Lock()
+        # site -> family -> formatted sample lines; data lines are replaced on success only
+        self._data: Dict[str, Dict[str, List[str]]] = {}
+        self._agent: Dict[str, Dict[str, List[str]]] = {}
+        self._cycles: Dict[Tuple[str, str], int] = {}
+        self._last_success: Dict[str, float] = {}
+        self._help: Dict[str, Tuple[str, str]] = dict(FAMILIES)
+        self._body = b"# EOF\n"
+        self._gzip_body = gzip.compress(self._body)
+        self.render_ms = 0.0
+
+    def body(self, gzipped: bool = False) -> bytes:
+        """Current exposition, optionally gzip-compressed"""
+        return self._gzip_body if gzipped else self._body
+
+    def update(self, site: str, payload: Dict[str, Any], timings: Dict[str, Any],
+               started_at: float, committed: bool):
+        """
+        Record a site's cycle and re-render the exposition
+
+        Args:
+            site: Site name
+            payload: Payload the cycle pushed
+            timings: Cycle timings in milliseconds (collect_ms, push_ms)
+            started_at: Cycle start as epoch seconds
+            committed: Whether the push committed
+        """
+        start = time.perf_counter()
+        stats = payload.get("stats", {})
+        additional = payload.get("additional", {})
+        success = committed and stats.get("status") == "success"
+
+        agent = {
+            "pulse_agent_cycle_duration_seconds": [
+                ({"phase": name[:-3]}, value / 1000) for name, value in sorted(timings.items())
+                if name.endswith("_ms") and isinstance(value, (int, float))
+            ],
+            "pulse_agent_last_cycle_timestamp_seconds": [({}, round(started_at, 3))],
+            "pulse_agent_batch_index": [({}, payload.get("batch_index", 0))],
+            "pulse_agent_query_timeouts": [({}, len(additional.get("timeouts", [])))],
+            "pulse_agent_source_errors": [({}, len(additional.get("source_errors", {})))],
+            "pulse_agent_collectors_killed": [({}, len(additional.get("killed_collectors", [])))],
+        }
+
+        with self._lock:
+            result = "success" if success else "failure"
+            self._cycles[(site, result)] = self._cycles.get((site, result), 0) + 1
+            if success:
+                self._last_success[site] = started_at
+                self._data[site] = _format_samples(site, self._collect_data(stats))
+            if site in self._last_success:
+                agent["pulse_agent_last_success_timestamp_seconds"] = [({}, round(self._last_success[site], 3))]
+            self._agent[site] = _format_samples(site, agent)
+            self._render()
+        self.render_ms = (time.perf_counter() - start) * 1000
+
+    def _collect_data(self, stats: Dict[str, Any]) -> Dict[str, List[Sample]]:
+        """Samples of the query, host and Docker metrics in a payload's stats"""
+        families: Dict[str, List[Sample]] = {"pulse_query_value": [
+            ({"query": name}, value) for name, value in stats.items()
+            if name not in STATS_META and _is_number(value)
+        ]}
+
+        system = stats.get("system_metrics") or {}
+        for section in HOST_SECTIONS:
+            for key, value in (system.get(section) or {}).items():
+                if _is_number(value):
+                    self._add(families, f"pulse_host_{section}_{key}", {}, value,
+                              f"system_metrics.{section}.{key}")
+        for disk in system.get("disks") or []:
+            labels = {"mountpoint": str(disk.get("mountpoint", "")), "device": str(disk.get("device", ""))}
+            for key, value in disk.items():
+                if _is_number(value):
+                    self._add(families, f"pulse_host_disk_{key}", labels, value, f"system_metrics.disks[].{key}")
+
+        docker = stats.get("docker_metrics") or {}
+        if docker:
+            daemon = docker.get("system", {}).get("daemon_status")
+            self._add(families, "pulse_docker_daemon_up", {}, int(daemon == "running"),
+                      "docker_metrics.system.daemon_status is running")
+            for key, value in (docker.get("summary") or {}).items():
+                if _is_number(value):
+                    self._add(families, f"pulse_docker_{key}", {}, value, f"docker_metrics.summary.{key}")
+            for container in docker.get("containers") or []:
+                labels = {"container": str(container.get("name", ""))}
+                families.setdefault("pulse_docker_container_running", []).append(
+                    (labels, int(container.get("status") == "running")))
+                if container.get("health"):
+                    families.setdefault("pulse_docker_container_healthy", []).append(
+                        (labels, int(container["health"] == "healthy")))
+        return families
+
+    def _add(self, families: Dict[str, List[Sample]], name: str, labels: Dict[str, str],
+             value: Any, source: str):
+        """Add a sample to a gauge family named after payload keys"""
+        name = _metric_name(name)
+        if name not in self._help:
+            self._help[name] = ("gauge", f"Latest {source}")
+        families.setdefault(name, []).append((labels, value))
+
+    def _render(self):
+        """Join every family from the sites' formatted lines"""
+        families: Dict[str, List[str]] = {}
+        if self.version:
+            families["pulse_agent_build_info"] = [f'pulse_agent_build_info{{version="{_escape(self.version)}"}} 1']
+        for (site, result), count in sorted(self._cycles.items()):
+            families.setdefault("pulse_agent_cycles", []).append(
+                f'pulse_agent_cycles_total{{site="{_escape(site)}",result="{result}"}} {count}')
+        for per_site in (self._agent, self._data):
+            for site in sorted(per_site):
+                for name, lines in per_site[site].items():
+                    families.setdefault(name, []).extend(lines)
+
+        out = []
+        for name in sorted(families):
+            metric_type, help_text = self._help[name]
+            out.append(f"# TYPE {name} {metric_type}")
+            out.append(f"# HELP {name} {help_text}")
+            out.extend(families[name])
+        out.append("# EOF")
+        body = ("\n".join(out) + "\n").encode("utf-8")
+        # Swapped together; a scrape reads whichever pair is current
+        self._body, self._gzip_body = body, gzip.compress(body, compresslevel=6)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves the cached exposition at /metrics"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """Handle a scrape"""
+        if self.path.split("?", 1)[0] != METRICS_PATH:
+            self.send_error(404)
+            return
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        body = self.server.cache.body(gzipped)
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Route access logs through the logging module"""
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class MetricsServer:
+    """HTTP server for a MetricsCache, running on a background thread"""
+
+    def __init__(self, cache: MetricsCache, host: str = "127.0.0.1", port: int = 9464):
+        """
+        Initialize metrics server
+
+        Args:
+            cache: Metrics to serve
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+        """
+        self.cache = cache
+        self.host = host
+        self.port = port
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        """Scrape URL"""
+        return f"http://{self.host}:{self.port}{METRICS_PATH}"
+
+    def start(self):
+        """Start serving on a background thread"""
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.cache = self.cache
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Serving metrics on {self.url}")
+
+    def stop(self):
+        """Stop serving"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        """Context manager entry"""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit"""
+        self.stop()
+
+
+def _is_number(value: Any) -> bool:
+    """Whether a payload value is exported as a sample"""
+    return isinstance(value, (int, float)) and not (isinstance(value, float) and math.isnan(value))
+
+
+def _metric_name(name: str) -> str:
+    """Metric name with characters outside [a-zA-Z0-9_] replaced"""
+    return "".join(char if char.isalnum() or char == "_" else "_" for char in name)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value"""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_samples(site: str, families: Dict[str, List[Sample]]) -> Dict[str, List[str]]:
+    """Exposition lines of a site's samples, by family"""
+    site_label = f'{{site="{_escape(site)}"'
+    # A container's or disk's label set is shared by its samples; render it once
+    rendered: Dict[int, str] = {}
+    formatted = {}
+    for name, samples in families.items():
+        prefix = name + site_label
+        lines = formatted[name] = []
+        for labels, value in samples:
+            text = rendered.get(id(labels))
+            if text is None:
+                text = rendered[id(labels)] = "".join(
+                    f',{key}="{_escape(label)}"' for key, label in labels.items()) + "} "
+            lines.append(prefix + text + _format(value))
+    return formatted
+
+
+def _format(value: Any) -> str:
+    """Render a sample value"""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(value)
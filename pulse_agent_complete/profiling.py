@@ -0,0 +1,218 @@
+"""
+Cycle profiling for Pulse Agent
+Runs a cycle under cProfile and/or tracemalloc (PA_PROFILE=cpu|mem|both),
+writes the reports to the site's data directory and summarizes wall time, CPU
+time and allocations per phase for the payload's additional.profile
+
+cProfile and tracemalloc are only imported when a cycle is profiled.
+"""
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cpu", "mem", "both")
+
+# Phases in the order they are reported
+PHASES = ("connect", "queries", "docker", "system", "serialize", "push")
+
+# Frames tracemalloc keeps per allocation; the report groups by the innermost line
+TRACE_FRAMES = 1
+
+
+class CycleProfiler:
+    """
+    Profiles one site's cycle
+
+    cProfile only sees the thread that enabled it, so it is resumed and paused
+    around the parts of the cycle that run on the cycle's own thread
+    (collect and push); queries run on per-source threads are still timed by
+    their phases. tracemalloc is process-wide: once started it keeps tracing
+    for the rest of the run, and concurrent sites in multi-site mode show up
+    in each other's allocation figures.
+
+    Reports written per cycle, keeping the newest `keep` of each kind:
+        <stem>.pstats      cProfile statistics (python -m pstats <file>)
+        <stem>.alloc.txt   top allocations made during the cycle, by line
+        <stem>.json        the phase summary, including the push phase
+    """
+
+    def __init__(self, mode: str, output_dir: Path, keep: int = 10, top: int = 25):
+        """
+        Initialize cycle profiler
+
+        Args:
+            mode: "cpu", "mem" or "both"
+            output_dir: Directory for the reports
+            keep: Reports of each kind to keep (0 = all)
+            top: Allocation sites listed in the allocation report
+        """
+        self.mode = mode
+        self.cpu = mode in ("cpu", "both")
+        self.mem = mode in ("mem", "both")
+        self.output_dir = output_dir
+        self.keep = keep
+        self.top = top
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._profile = None
+        self._start_snapshot = None
+        self._alloc_stats: List[Any] = []
+        self._peak_kb = 0
+        self._started = None
+        self._wall_ms = 0.0
+
+    @classmethod
+    def from_config(cls, mode: str, output_dir: Path, keep: int, top: int) -> Optional["CycleProfiler"]:
+        """Build a profiler for PA_PROFILE, or None when profiling is off"""
+        if not mode:
+            return None
+        if mode not in PROFILE_MODES:
+            logger.warning(f"Ignoring PA_PROFILE={mode!r}, expected one of {', '.join(PROFILE_MODES)}")
+            return None
+        return cls(mode, output_dir, keep, top)
+
+    def start(self):
+        """Start profiling the cycle on the calling thread"""
+        if self.mem:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACE_FRAMES)
+            self._start_snapshot = _take_snapshot()
+            tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+        if self.cpu:
+            import cProfile
+            self._profile = cProfile.Profile()
+        self.resume()
+
+    def resume(self):
+        """Resume cProfile on the calling thread"""
+        if self._profile is None:
+            return
+        try:
+            self._profile.enable()
+        except ValueError as e:
+            # Python 3.12+ allows one active profiler per process
+            logger.warning(f"CPU profiling unavailable for this cycle: {e}")
+            self._profile = None
+
+    def pause(self):
+        """Pause cProfile on the calling thread"""
+        if self._profile is not None:
+            self._profile.disable()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the wall time, CPU time and net allocations of the block to a phase"""
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        traced_start = _traced_bytes() if self.mem else 0
+        try:
+            yield
+        finally:
+            wall_ms = (time.perf_counter() - start) * 1000
+            cpu_ms = (time.thread_time() - cpu_start) * 1000
+            alloc_kb = (_traced_bytes() - traced_start) / 1024 if self.mem else 0
+            with self._lock:
+                phase = self.phases.setdefault(name, {"ms": 0.0, "cpu_ms": 0.0, "alloc_kb": 0.0})
+                phase["ms"] += wall_ms
+                phase["cpu_ms"] += cpu_ms
+                phase["alloc_kb"] += alloc_kb
+
+    @contextmanager
+    def profiled_phase(self, name: str) -> Iterator[None]:
+        """A phase that also runs under cProfile on the calling thread"""
+        self.resume()
+        try:
+            with self.phase(name):
+                yield
+        finally:
+            self.pause()
+
+    def stop_collect(self):
+        """Record the collection's allocations and pause cProfile"""
+        self.pause()
+        self._wall_ms = (time.perf_counter() - self._started) * 1000
+        if self.mem and self._start_snapshot is not None:
+            import tracemalloc
+            self._peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+            growth = _take_snapshot().compare_to(self._start_snapshot, "lineno")
+            self._alloc_stats = [stat for stat in growth if stat.size_diff > 0][:self.top]
+            self._start_snapshot = None
+
+    def summary(self, previous_push: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Compact per-phase summary for additional.profile
+
+        The push phase runs after the payload is built, so the payload carries
+        the previous cycle's push phase, from its stored summary.
+        """
+        phases = {}
+        for name in PHASES:
+            phase = self.phases.get(name) or (previous_push if name == "push" else None)
+            if phase:
+                phases[name] = {key: round(value, 1) for key, value in phase.items()
+                                if key in ("ms", "cpu_ms") or (key == "alloc_kb" and self.mem)}
+        if "push" in phases and "push" not in self.phases:
+            phases["push"]["previous_cycle"] = True
+        summary = {"mode": self.mode, "collect_ms": round(self._wall_ms, 1), "phases": phases}
+        if self.mem:
+            summary["peak_kb"] = self._peak_kb
+        return summary
+
+    def previous_push(self) -> Optional[Dict[str, float]]:
+        """Push phase of the newest stored summary, if any"""
+        summaries = sorted(self.output_dir.glob("*.json"))
+        if not summaries:
+            return None
+        try:
+            return json.loads(summaries[-1].read_text())["phases"].get("push")
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"Cannot read profile summary {summaries[-1]}: {e}")
+            return None
+
+    def write(self, stem: str):
+        """Write this cycle's reports and remove the oldest beyond keep"""
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            if self._profile is not None:
+                self._profile.dump_stats(str(self.output_dir / f"{stem}.pstats"))
+            if self._alloc_stats:
+                lines = [f"Top {len(self._alloc_stats)} allocation sites during the cycle "
+                         f"(peak traced {self._peak_kb} KiB)"]
+                lines.extend(str(stat) for stat in self._alloc_stats)
+                (self.output_dir / f"{stem}.alloc.txt").write_text("\n".join(lines) + "\n")
+            (self.output_dir / f"{stem}.json").write_text(json.dumps(self.summary()))
+            for pattern in ("*.pstats", "*.alloc.txt", "*.json"):
+                for old in sorted(self.output_dir.glob(pattern))[:-self.keep]:
+                    old.unlink()
+            logger.info(f"Profile written to {self.output_dir / stem}.*")
+        except OSError as e:
+            logger.warning(f"Failed to write profile: {e}")
+
+
+def _traced_bytes() -> int:
+    """Size of the memory blocks currently traced by tracemalloc"""
+    import tracemalloc
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _take_snapshot():
+    """tracemalloc snapshot, leaving out tracemalloc and the import system"""
+    import tracemalloc
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")
+    ))
+
+
+def phase(profiler: Optional[CycleProfiler], name: str):
+    """Context manager timing a phase, or doing nothing when not profiling"""
+    return profiler.phase(name) if profiler is not None else nullcontext()
@@ -0,0 +1,391 @@
+"""
+Push dispatch for Pulse Agent
+Delivers payloads to one or more destinations concurrently with a commit policy
+"""
+
+import contextvars
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .bulk import build_envelopes, parse_acks
+from .config import Config
+from .http_client import HttpClient
+
+logger = logging.getLogger(__name__)
+
+COMMIT_POLICIES = ("all", "quorum", "primary")
+
+
+class Outbox:
+    """
+    Per-destination queue of payloads awaiting delivery
+
+    Payloads land here when a batch was committed (the commit policy was met)
+    but this destination did not acknowledge it. Each entry is one JSON file,
+    named so that lexical order is delivery order.
+    """
+
+    def __init__(self, directory: Path, max_items: int = 1000):
+        """
+        Initialize outbox
+
+        Args:
+            directory: Directory holding queued payloads
+            max_items: Maximum queued payloads; the oldest are dropped beyond this
+        """
+        self.directory = directory
+        self.max_items = max_items
+
+    def add(self, payload: Dict[str, Any]):
+        """Queue a payload for later delivery"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{payload.get('batch_index', 0):012d}-{payload.get('uuid', 'unknown')}.json"
+        path = self.directory / name
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+        self._trim()
+
+    def entries(self) -> List[Path]:
+        """Queued payload files, oldest first"""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("*.json"))
+
+    def load(self, entry: Path) -> Optional[Dict[str, Any]]:
+        """Load a queued payload, dropping it if unreadable"""
+        try:
+            with open(entry, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Dropping unreadable outbox entry {entry}: {e}")
+            self.remove(entry)
+            return None
+
+    def remove(self, entry: Path):
+        """Remove a delivered payload"""
+        try:
+            entry.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __len__(self) -> int:
+        """Number of queued payloads"""
+        return len(self.entries())
+
+    def _trim(self):
+        """Drop the oldest payloads beyond max_items"""
+        entries = self.entries()
+        for entry in entries[:max(0, len(entries) - self.max_items)]:
+            logger.warning(f"Outbox full, dropping {entry.name}")
+            self.remove(entry)
+
+
+class PushDestination:
+    """A single push endpoint with its own token, timeout and outbox"""
+
+    def __init__(self, name: str, url: str, token: str = "", timeout: int = 30,
+                 primary: bool = False, outbox: Optional[Outbox] = None,
+                 http_client: Optional[HttpClient] = None, bulk_url: str = ""):
+        """
+        Initialize push destination
+
+        Args:
+            name: Destination name (used for logs and the outbox directory)
+            url: Push URL
+            token: Bearer token
+            timeout: Request timeout in seconds
+            primary: Whether this is the primary destination
+            outbox: Outbox for payloads this destination missed
+            http_client: HTTP client (one per destination by default)
+            bulk_url: Bulk push URL (empty when the destination has none)
+        """
+        self.name = name
+        self.url = url
+        self.bulk_url = bulk_url
+        self.token = token
+        self.timeout = timeout
+        self.primary = primary
+        self.outbox = outbox
+        self.http_client = http_client or HttpClient(timeout=timeout, user_agent=Config.USER_AGENT)
+
+    def with_outbox(self, outbox: Optional[Outbox]) -> "PushDestination":
+        """Copy of this destination using another outbox but the same HTTP client"""
+        return PushDestination(self.name, self.url, self.token, self.timeout,
+                               self.primary, outbox, self.http_client, self.bulk_url)
+
+    def headers(self) -> Dict[str, str]:
+        """Request headers for this destination"""
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def push(self, payload: Dict[str, Any]) -> bool:
+        """Push a payload, returning True when acknowledged"""
+        logger.info(f"Pushing data to {self.name}: {self.url}")
+        response = self.http_client.make_post_request(self.url, payload, self.headers())
+        return response is not None
+
+    def push_bulk(self, payloads: List[Dict[str, Any]], max_items: int,
+                  max_bytes: int) -> Set[str]:
+        """
+        Push several payloads in as few requests as the limits allow
+
+        Without a bulk URL the payloads are pushed one by one.
+
+        Args:
+            payloads: Payloads to push (each with a uuid)
+            max_items: Maximum payloads per request
+            max_bytes: Maximum encoded request size
+
+        Returns:
+            uuids of the acknowledged payloads
+        """
+        if not self.bulk_url:
+            return {payload["uuid"] for payload in payloads if self.push(payload)}
+
+        by_uuid = {payload["uuid"]: payload for payload in payloads}
+        acked = set()
+        for body, uuids in build_envelopes(payloads, self.http_client.serializer, max_items, max_bytes):
+            logger.info(f"Bulk pushing {len(uuids)} payload(s) to {self.name}: {self.bulk_url}")
+            serializer = self.http_client.serializer
+            response = self.http_client.make_raw_post_request(self.bulk_url, body, self.headers())
+            if response is None and self.http_client.serializer is not serializer:
+                # The encoding was rejected and negotiated down; re-encode once
+                batch = [by_uuid[uuid_str] for uuid_str in uuids]
+                for body, _ in build_envelopes(batch, self.http_client.serializer, len(batch), float("inf")):
+                    response = self.http_client.make_raw_post_request(self.bulk_url, body, self.headers())
+            acked |= parse_acks(response, uuids)
+        return acked
+
+    def flush_outbox(self) -> int:
+        """
+        Deliver queued payloads oldest first, stopping at the first failure
+
+        Returns:
+            Number of payloads delivered
+        """
+        if self.outbox is None:
+            return 0
+
+        delivered = 0
+        for entry in self.outbox.entries():
+            payload = self.outbox.load(entry)
+            if payload is None:
+                continue
+            response = self.http_client.make_post_request(self.url, payload, self.headers())
+            if response is None:
+                logger.warning(f"Outbox flush to {self.name} stopped: {entry} not delivered")
+                break
+            self.outbox.remove(entry)
+            delivered += 1
+
+        if delivered:
+            logger.info(f"Delivered {delivered} queued payload(s) to {self.name}")
+        return delivered
+
+
+class PushResult:
+    """Outcome of pushing one payload to all destinations"""
+
+    def __init__(self, acked: List[str], failed: List[str], committed: bool):
+        """
+        Initialize push result
+
+        Args:
+            acked: Names of destinations that acknowledged the payload
+            failed: Names of destinations that did not
+            committed: Whether the commit policy was satisfied
+        """
+        self.acked = acked
+        self.failed = failed
+        self.committed = committed
+
+
+class PushDispatcher:
+    """Fans a payload out to all destinations concurrently"""
+
+    def __init__(self, destinations: List[PushDestination], policy: str = "all"):
+        """
+        Initialize push dispatcher
+
+        Args:
+            destinations: Push destinations (at least one)
+            policy: Commit policy - 'all', 'quorum' or 'primary'
+        """
+        if not destinations:
+            raise ValueError("At least one push destination is required")
+        if policy not in COMMIT_POLICIES:
+            raise ValueError(f"Unsupported commit policy: {policy}. Supported: {', '.join(COMMIT_POLICIES)}")
+
+        self.destinations = destinations
+        self.policy = policy
+        self.primary = next((d for d in destinations if d.primary), destinations[0])
+
+    @classmethod
+    def from_config(cls, destinations_config: List[Dict[str, Any]], policy: str,
+                    outbox_factory: Optional[Callable[[str], Any]] = None,
+                    pool_size: Optional[int] = None) -> "PushDispatcher":
+        """
+        Build a dispatcher from destination dictionaries
+
+        Args:
+            destinations_config: Dicts with name, url, bulk_url, token, timeout and primary
+            policy: Commit policy
+            outbox_factory: Builds the outbox for a destination name
+                (Outbox, HistoryOutbox, or None for no outbox)
+            pool_size: HTTP connections kept per destination
+        """
+        destinations = []
+        for index, dest in enumerate(destinations_config):
+            name = dest.get("name") or f"destination-{index}"
+            destinations.append(PushDestination(
+                name=name,
+                url=dest["url"],
+                bulk_url=dest.get("bulk_url", ""),
+                token=dest.get("token", ""),
+                timeout=int(dest.get("timeout", 30)),
+                primary=bool(dest.get("primary", False)),
+                outbox=outbox_factory(name) if outbox_factory else None,
+                http_client=HttpClient(timeout=int(dest.get("timeout", 30)),
+                                       user_agent=Config.USER_AGENT, pool_size=pool_size)
+            ))
+        return cls(destinations, policy)
+
+    def with_outboxes(self, outbox_factory: Optional[Callable[[str], Any]]) -> "PushDispatcher":
+        """
+        Copy of this dispatcher with other outboxes
+
+        HTTP clients (and their connection pools) are shared with the copy,
+        so per-site dispatchers reuse one set of connections.
+        """
+        destinations = [
+            dest.with_outbox(outbox_factory(dest.name) if outbox_factory else None)
+            for dest in self.destinations
+        ]
+        return PushDispatcher(destinations, self.policy)
+
+    def get_destination(self, name: str) -> Optional[PushDestination]:
+        """Get a destination by name"""
+        return next((dest for dest in self.destinations if dest.name == name), None)
+
+    def push(self, payload: Dict[str, Any]) -> PushResult:
+        """
+        Push a payload to every destination and apply the commit policy
+
+        Destinations that miss a committed payload get it queued in their
+        outbox. Queued payloads are not sent here: the caller flushes the
+        outboxes of the acknowledging destinations with flush_outboxes() once
+        the cycle is settled and its state written, so a long backlog does not
+        hold up the current payload.
+
+        Returns:
+            PushResult
+        """
+        outcomes = self._map(lambda dest: self._deliver(dest, payload))
+        return self.settle(payload, [dest.name for dest, ok in outcomes if ok])
+
+    def push_bulk(self, payloads: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Push several payloads to every destination using bulk requests
+
+        The commit policy is not applied here: payloads may belong to
+        different sites, each settled with its own dispatcher (and outboxes)
+        through settle().
+
+        Returns:
+            Names of the acknowledging destinations, keyed by payload uuid
+        """
+        outcomes = self._map(lambda dest: self._deliver_bulk(dest, payloads))
+
+        acked_by = {payload["uuid"]: [] for payload in payloads}
+        for dest, acked in outcomes:
+            for uuid_str in acked:
+                acked_by[uuid_str].append(dest.name)
+        return acked_by
+
+    def settle(self, payload: Dict[str, Any], acked: List[str]) -> PushResult:
+        """
+        Apply the commit policy to a pushed payload
+
+        Destinations that miss a committed payload get it queued in their outbox.
+
+        Args:
+            payload: The pushed payload
+            acked: Names of destinations that acknowledged it
+
+        Returns:
+            PushResult
+        """
+        failed = [dest.name for dest in self.destinations if dest.name not in acked]
+        committed = self._is_committed(acked)
+
+        if committed:
+            for dest in self.destinations:
+                if dest.name in failed and dest.outbox is not None:
+                    logger.warning(f"Queueing payload {payload.get('uuid')} in outbox for {dest.name}")
+                    dest.outbox.add(payload)
+
+        logger.info(f"Push acknowledged by {len(acked)}/{len(self.destinations)} destination(s), "
+                    f"policy '{self.policy}': {'committed' if committed else 'not committed'}")
+        return PushResult(list(acked), failed, committed)
+
+    def flush_outboxes(self, names: Optional[List[str]] = None):
+        """
+        Deliver queued payloads of the destinations
+
+        Args:
+            names: Destinations to flush, typically those that just
+                acknowledged a push (None = every destination)
+        """
+        def flush(dest: PushDestination) -> int:
+            if names is not None and dest.name not in names:
+                return 0
+            try:
+                return dest.flush_outbox()
+            except Exception as e:
+                logger.error(f"Outbox flush to {dest.name} failed: {e}")
+                return 0
+
+        self._map(flush)
+
+    def _deliver(self, dest: PushDestination, payload: Dict[str, Any]) -> bool:
+        """Push the payload to a destination, returning True when acknowledged"""
+        try:
+            return dest.push(payload)
+        except Exception as e:
+            logger.error(f"Push to {dest.name} failed: {e}")
+            return False
+
+    def _deliver_bulk(self, dest: PushDestination, payloads: List[Dict[str, Any]]) -> Set[str]:
+        """Bulk push payloads to a destination, returning the acknowledged uuids"""
+        try:
+            return dest.push_bulk(payloads, Config.BULK_MAX_ITEMS, Config.BULK_MAX_BYTES)
+        except Exception as e:
+            logger.error(f"Bulk push to {dest.name} failed: {e}")
+            return set()
+
+    def _map(self, func) -> List[tuple]:
+        """Run func for every destination concurrently, returning (dest, result) pairs"""
+        if len(self.destinations) == 1:
+            dest = self.destinations[0]
+            return [(dest, func(dest))]
+
+        # Each call runs in a copy of this thread's context, so log records keep the site tag
+        contexts = [contextvars.copy_context() for _ in self.destinations]
+        with ThreadPoolExecutor(max_workers=len(self.destinations),
+                                thread_name_prefix="push") as executor:
+            results = list(executor.map(lambda context, dest: context.run(func, dest),
+                                        contexts, self.destinations))
+        return list(zip(self.destinations, results))
+
+    def _is_committed(self, acked: List[str]) -> bool:
+        """Apply the commit policy to the acknowledged destination names"""
+        if self.policy == "all":
+            return len(acked) == len(self.destinations)
+        if self.policy == "quorum":
+            return len(acked) > len(self.destinations) // 2
+        return self.primary.name in acked
@@ -0,0 +1,90 @@
+"""
+Per-query collection scheduling for Pulse Agent
+Lets expensive queries run less often than the push cadence
+
+A query with "every_n_cycles" and/or "min_interval_seconds" is only run when
+both are satisfied; on other cycles its last value is carried forward.
+"""
+
+import logging
+import time
+from typing import Dict, Any, Optional
+
+from .state_manager import StateManager
+
+logger = logging.getLogger(__name__)
+
+
+class QueryScheduler:
+    """
+    Decides which queries run this cycle and remembers their last values
+
+    Scheduling state lives in the site state under "query_schedule":
+    {"cycle": N, "queries": {name: {"cycle": n, "run_at": epoch, "value": v,
+    "fingerprint": f}}}. A query whose definition changed (different
+    fingerprint) is due immediately, so its old value is never carried forward.
+    Changes are kept in memory until save(), and persisted with the rest of
+    the state when the cycle commits.
+    """
+
+    def __init__(self, state_manager: StateManager, now: Optional[float] = None):
+        """
+        Initialize query scheduler
+
+        Args:
+            state_manager: Site state holding the schedule
+            now: Current time as epoch seconds (defaults to time.time())
+        """
+        self.state_manager = state_manager
+        self.now = time.time() if now is None else now
+
+        schedule = state_manager.get_query_schedule()
+        self.cycle = schedule.get("cycle", 0) + 1
+        self.queries: Dict[str, Dict[str, Any]] = dict(schedule.get("queries", {}))
+
+    @staticmethod
+    def is_scheduled(query_config: Dict[str, Any]) -> bool:
+        """Whether a query runs less often than every cycle"""
+        return (int(query_config.get("every_n_cycles", 1)) > 1
+                or float(query_config.get("min_interval_seconds", 0)) > 0)
+
+    def is_due(self, query_name: str, query_config: Dict[str, Any],
+               fingerprint: Optional[str] = None) -> bool:
+        """Whether a query should run this cycle"""
+        if not self.is_scheduled(query_config):
+            return True
+
+        last = self.queries.get(query_name)
+        if last is None or last.get("fingerprint") != fingerprint:
+            return True
+
+        every_n_cycles = int(query_config.get("every_n_cycles", 1))
+        min_interval = float(query_config.get("min_interval_seconds", 0))
+        return (self.cycle - last["cycle"] >= every_n_cycles
+                and self.now - last["run_at"] >= min_interval)
+
+    def carried_value(self, query_name: str) -> Any:
+        """Last value of a skipped query"""
+        return self.queries[query_name]["value"]
+
+    def age(self, query_name: str) -> int:
+        """Seconds since a skipped query last ran"""
+        return int(self.now - self.queries[query_name]["run_at"])
+
+    def record(self, query_name: str, value: Any, fingerprint: Optional[str] = None):
+        """Remember the value of a query that ran this cycle"""
+        self.queries[query_name] = {"cycle": self.cycle, "run_at": self.now, "value": value,
+                                    "fingerprint": fingerprint}
+
+    def save(self, query_names):
+        """
+        Store the schedule in the state
+
+        Args:
+            query_names: Scheduled queries still configured; others are dropped
+        """
+        keep = set(query_names)
+        self.state_manager.save_query_schedule({
+            "cycle": self.cycle,
+            "queries": {name: entry for name, entry in self.queries.items() if name in keep}
+        })
@@ -0,0 +1,262 @@
+"""
+Payload serializers for Pulse Agent
+Encodes push payloads as JSON (stdlib or orjson) or compact columnar JSON
+"""
+
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Any, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JSON_CONTENT_TYPE = "application/json"
+COLUMNAR_CONTENT_TYPE = "application/vnd.pulse.columnar+json"
+
+# Marker key identifying a columnar block; its value is the number of rows
+COLUMNAR_MARKER = "__columnar__"
+
+
+def _default(value: Any) -> Any:
+    """Convert values the JSON encoders do not handle natively"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JsonSerializer:
+    """Standard library JSON serializer"""
+
+    name = "json"
+    content_type = JSON_CONTENT_TYPE
+    fallback = None
+
+    def encode(self, payload: Dict[str, Any]) -> bytes:
+        """Encode payload to UTF-8 JSON bytes"""
+        return json.dumps(payload, separators=(",", ":"), allow_nan=False,
+                          default=_default).encode("utf-8")
+
+    def iter_encode(self, payload: Dict[str, Any]) -> Iterator[bytes]:
+        """Encode payload incrementally, yielding UTF-8 JSON fragments"""
+        return iter_json(payload, self.encode)
+
+
+class OrjsonSerializer:
+    """orjson serializer (requires the optional orjson package)"""
+
+    name = "orjson"
+    content_type = JSON_CONTENT_TYPE
+    fallback = None
+
+    def __init__(self):
+        """Initialize orjson serializer"""
+        import orjson
+        self.orjson = orjson
+
+    def encode(self, payload: Dict[str, Any]) -> bytes:
+        """Encode payload to UTF-8 JSON bytes"""
+        return self.orjson.dumps(payload, default=_default,
+                                 option=self.orjson.OPT_NON_STR_KEYS)
+
+    def iter_encode(self, payload: Dict[str, Any]) -> Iterator[bytes]:
+        """Encode payload incrementally, yielding UTF-8 JSON fragments"""
+        return iter_json(payload, self.encode)
+
+
+class ColumnarSerializer:
+    """
+    Compact columnar serializer
+
+    Lists of two or more dicts (e.g. docker containers, disks) are encoded as
+    a single object mapping each key to an array of values, so repeated keys
+    are written once. Keys missing from a record are encoded as null.
+    """
+
+    name = "columnar"
+    content_type = COLUMNAR_CONTENT_TYPE
+
+    def __init__(self, base=None):
+        """
+        Initialize columnar serializer
+
+        Args:
+            base: Serializer used for the final byte encoding. It is also used
+                as the fallback when the server rejects the columnar format.
+        """
+        self.base = base or JsonSerializer()
+        self.fallback = self.base
+
+    def encode(self, payload: Dict[str, Any]) -> bytes:
+        """Encode payload to columnar JSON bytes"""
+        return self.base.encode(to_columnar(payload))
+
+    def iter_encode(self, payload: Dict[str, Any]) -> Iterator[bytes]:
+        """
+        Encode payload incrementally
+
+        Columnar blocks need every record up front, so each list (or generator)
+        is materialized and converted when the walk reaches it; memory holds
+        one list at a time rather than the whole converted payload.
+        """
+        return iter_columnar(payload, self.base.encode)
+
+
+def iter_json(value: Any, encode_leaf) -> Iterator[bytes]:
+    """
+    Walk a payload and yield JSON fragments
+
+    Dicts, lists, tuples and iterators (e.g. generators of records) are
+    expanded in place, so only one leaf value is encoded at a time.
+
+    Args:
+        value: Payload or sub-value to encode
+        encode_leaf: Function encoding a scalar value to JSON bytes
+    """
+    if isinstance(value, dict):
+        yield b"{"
+        first = True
+        for key, item in value.items():
+            if not first:
+                yield b","
+            first = False
+            yield encode_leaf(str(key))
+            yield b":"
+            yield from iter_json(item, encode_leaf)
+        yield b"}"
+    elif isinstance(value, (list, tuple)) or _is_iterator(value):
+        yield b"["
+        first = True
+        for item in value:
+            if not first:
+                yield b","
+            first = False
+            yield from iter_json(item, encode_leaf)
+        yield b"]"
+    else:
+        yield encode_leaf(value)
+
+
+def iter_columnar(value: Any, encode_leaf) -> Iterator[bytes]:
+    """
+    Walk a payload and yield columnar JSON fragments
+
+    Like iter_json, but each list of two or more dicts is converted with
+    _columnize just before it is encoded.
+
+    Args:
+        value: Payload or sub-value to encode
+        encode_leaf: Function encoding a scalar value to JSON bytes
+    """
+    if isinstance(value, dict):
+        yield b"{"
+        first = True
+        for key, item in value.items():
+            if not first:
+                yield b","
+            first = False
+            yield encode_leaf(str(key))
+            yield b":"
+            yield from iter_columnar(item, encode_leaf)
+        yield b"}"
+    elif isinstance(value, list) or _is_iterator(value):
+        items = value if isinstance(value, list) else list(value)
+        if len(items) > 1 and all(isinstance(item, dict) for item in items):
+            yield from iter_json(_columnize(items), encode_leaf)
+            return
+        yield b"["
+        first = True
+        for item in items:
+            if not first:
+                yield b","
+            first = False
+            yield from iter_columnar(item, encode_leaf)
+        yield b"]"
+    else:
+        yield from iter_json(value, encode_leaf)
+
+
+def _is_iterator(value: Any) -> bool:
+    """Check if value is a lazy iterator (generator, map, etc.)"""
+    return hasattr(value, "__next__") and hasattr(value, "__iter__")
+
+
+def to_columnar(value: Any) -> Any:
+    """Recursively convert lists of dicts into columnar blocks"""
+    if isinstance(value, dict):
+        return {key: to_columnar(item) for key, item in value.items()}
+    if _is_iterator(value):
+        value = list(value)
+    if isinstance(value, list):
+        if len(value) > 1 and all(isinstance(item, dict) for item in value):
+            return _columnize(value)
+        return [to_columnar(item) for item in value]
+    return value
+
+
+def _columnize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert a list of dicts into a key -> array mapping"""
+    keys = {}
+    for record in records:
+        for key in record:
+            keys.setdefault(key, None)
+
+    block = {COLUMNAR_MARKER: len(records)}
+    for key in keys:
+        block[key] = [to_columnar(record.get(key)) for record in records]
+    return block
+
+
+def from_columnar(value: Any) -> Any:
+    """Inverse of to_columnar, used by receivers and test servers"""
+    if isinstance(value, dict):
+        if COLUMNAR_MARKER in value:
+            rows = value[COLUMNAR_MARKER]
+            columns = [(key, items) for key, items in value.items() if key != COLUMNAR_MARKER]
+            return [
+                {key: from_columnar(items[i]) for key, items in columns}
+                for i in range(rows)
+            ]
+        return {key: from_columnar(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [from_columnar(item) for item in value]
+    return value
+
+
+def orjson_available() -> bool:
+    """Check if orjson is installed"""
+    try:
+        import orjson  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_serializer(name: Optional[str] = None):
+    """
+    Build a serializer by name
+
+    Args:
+        name: 'json', 'orjson', 'auto' (orjson when installed, else json)
+            or 'columnar' (columnar encoding on top of 'auto')
+
+    Returns:
+        Serializer instance
+    """
+    name = (name or "auto").lower()
+
+    if name == "json":
+        return JsonSerializer()
+    if name == "orjson":
+        if orjson_available():
+            return OrjsonSerializer()
+        logger.warning("orjson not installed, falling back to json. Install with: pip install orjson")
+        return JsonSerializer()
+    if name == "auto":
+        return OrjsonSerializer() if orjson_available() else JsonSerializer()
+    if name == "columnar":
+        return ColumnarSerializer(get_serializer("auto"))
+
+    raise ValueError(f"Unsupported push encoding: {name}. Supported: json, orjson, auto, columnar")
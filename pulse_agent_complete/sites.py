@@ -0,0 +1,219 @@
+"""
+Site configuration for Pulse Agent
+A site is one on-prem installation with its own database, identifiers and state
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+
+from .aggregator import DEFAULT_SOURCE
+from .config import Config
+from .db_client import DatabaseClient
+
+logger = logging.getLogger(__name__)
+
+
+class SiteConfig:
+    """Configuration of a single site"""
+
+    def __init__(self, name: str, client_id: str, site_id: str, db: Dict[str, Any],
+                 data_filepath: Path, history_filepath: Path,
+                 queries_file: Optional[Path] = None,
+                 sources: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Initialize site configuration
+
+        Args:
+            name: Site name (used for logs and default file locations)
+            client_id: Client identifier sent in payloads
+            site_id: Site identifier sent in payloads
+            db: Database settings (type, host, port, name, user, password, ssl_mode)
+            data_filepath: State file for this site
+            history_filepath: Run-history database for this site
+            queries_file: queries.json for this site (defaults to the global one)
+            sources: Named data sources besides db; missing settings fall back to db
+
+        Raises:
+            ValueError: If sources is not an object of named settings objects
+        """
+        self.name = name
+        self.client_id = client_id
+        self.site_id = site_id
+        self.db = db
+        self.data_filepath = data_filepath
+        self.history_filepath = history_filepath
+        self.queries_file = queries_file or Config.get_queries_filepath()
+        # Live counts of the site's feed tables, set while running long-running
+        # with PA_CHANGE_FEED
+        self.change_feed = None
+        self.sources = {DEFAULT_SOURCE: db}
+        if sources is not None and not isinstance(sources, dict):
+            raise ValueError(f"Site '{name}' has invalid sources: expected an object of named data sources")
+        for source_name, settings in (sources or {}).items():
+            if not isinstance(settings, dict):
+                raise ValueError(f"Site '{name}' data source '{source_name}' must be an object")
+            source = dict(db)
+            source.update(settings)
+            self.sources[source_name] = _db_settings(name, source_name, source)
+
+    @classmethod
+    def from_env(cls) -> "SiteConfig":
+        """Build the single site described by PA_* environment variables"""
+        return cls(
+            name=Config.SITE_ID,
+            client_id=Config.CLIENT_ID,
+            site_id=Config.SITE_ID,
+            db={
+                "type": Config.DB_TYPE,
+                "host": Config.DB_HOST,
+                "port": Config.DB_PORT,
+                "name": Config.DB_NAME,
+                "user": Config.DB_USER,
+                "password": Config.DB_PASSWORD,
+                "ssl_mode": Config.DB_SSL_MODE
+            },
+            data_filepath=Config.get_data_filepath(),
+            history_filepath=Config.get_history_filepath(),
+            sources=Config.get_data_sources()
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SiteConfig":
+        """
+        Build a site from a sites-file entry
+
+        Missing database settings fall back to the PA_DB_* defaults, and state
+        and history default to <data dir>/sites/<name>/.
+
+        Raises:
+            ValueError: If the entry, its db or its sources are malformed
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"Each site must be an object, got {type(data).__name__}")
+        name = data.get("name") or data.get("site_id")
+        if not name or not isinstance(name, str):
+            raise ValueError("Each site needs a name or site_id")
+        site_dir = Config.get_data_dir() / "sites" / name
+
+        db = {
+            "type": Config.DB_TYPE,
+            "host": Config.DB_HOST,
+            "port": Config.DB_PORT,
+            "name": Config.DB_NAME,
+            "user": Config.DB_USER,
+            "password": Config.DB_PASSWORD,
+            "ssl_mode": Config.DB_SSL_MODE
+        }
+        if not isinstance(data.get("db", {}), dict):
+            raise ValueError(f"Site '{name}' db must be an object")
+        db.update(data.get("db", {}))
+        db = _db_settings(name, DEFAULT_SOURCE, db)
+
+        return cls(
+            name=name,
+            client_id=data.get("client_id", Config.CLIENT_ID),
+            site_id=data.get("site_id", name),
+            db=db,
+            data_filepath=Path(data["state_file"]) if data.get("state_file") else site_dir / "pulse.data",
+            history_filepath=Path(data["history_file"]) if data.get("history_file") else site_dir / "history.db",
+            queries_file=Path(data["queries_file"]) if data.get("queries_file") else None,
+            sources=data.get("sources")
+        )
+
+    def build_db_client(self, source: str = DEFAULT_SOURCE) -> DatabaseClient:
+        """Create a database client for one of this site's data sources"""
+        db = self.sources[source]
+        return DatabaseClient(
+            db_type=db["type"],
+            host=db["host"],
+            port=db["port"],
+            database=db["name"],
+            user=db["user"],
+            password=db["password"],
+            ssl_mode=db.get("ssl_mode", "prefer")
+        )
+
+    def build_db_clients(self, sources: Optional[Iterable[str]] = None) -> Dict[str, DatabaseClient]:
+        """
+        Create one database client per data source
+
+        Creating a client imports its driver, so only the sources that
+        queries use are passed in (see aggregator.db_sources); a site whose
+        queries are all docker/system needs no driver at all. A named source
+        whose client cannot be created (e.g. its driver is not installed) is
+        left out, so only its queries fall back to defaults; errors for the
+        default source propagate.
+
+        Args:
+            sources: Sources to create clients for (all of the site's if omitted)
+        """
+        wanted = set(self.sources if sources is None else sources)
+        clients = {}
+        if DEFAULT_SOURCE in wanted:
+            clients[DEFAULT_SOURCE] = self.build_db_client()
+        for source in self.sources:
+            if source == DEFAULT_SOURCE or source not in wanted:
+                continue
+            try:
+                clients[source] = self.build_db_client(source)
+            except Exception as e:
+                logger.error(f"[{self.name}] Data source '{source}' unavailable: {e}")
+        return clients
+
+    def describe_db(self) -> str:
+        """Database connection strings without passwords"""
+        descriptions = []
+        for source, db in self.sources.items():
+            description = f"{db['type']}://{db['user']}@{db['host']}:{db['port']}/{db['name']}"
+            if source != DEFAULT_SOURCE:
+                description = f"{source}={description}"
+            descriptions.append(description)
+        return ", ".join(descriptions)
+
+
+def _db_settings(site: str, source: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Database settings with the type lowercased and the port an int"""
+    if not isinstance(settings.get("type"), str):
+        raise ValueError(f"Site '{site}' data source '{source}' has an invalid type: {settings.get('type')!r}")
+    try:
+        port = int(settings.get("port"))
+    except (TypeError, ValueError):
+        raise ValueError(f"Site '{site}' data source '{source}' has an invalid port: "
+                         f"{settings.get('port')!r}") from None
+    return dict(settings, type=settings["type"].lower(), port=port)
+
+
+def load_sites(sites_file: Path) -> List[SiteConfig]:
+    """
+    Load sites from a JSON file
+
+    The file holds either a list of sites or {"sites": [...]}; each site has
+    name, client_id, site_id, db and optionally sources (named data sources),
+    state_file, history_file and queries_file.
+    """
+    with open(sites_file, 'r') as f:
+        data = json.load(f)
+
+    entries = data.get("sites", []) if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise ValueError(f"Sites in {sites_file} must be a list")
+    if not entries:
+        raise ValueError(f"No sites in {sites_file}")
+    sites = [SiteConfig.from_dict(entry) for entry in entries]
+
+    names = [site.name for site in sites]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate site names in {sites_file}: {', '.join(sorted(duplicates))}")
+
+    logger.info(f"Loaded {len(sites)} sites from {sites_file}")
+    return sites
+
+
+def get_sites() -> List[SiteConfig]:
+    """Sites to collect: PA_SITES_FILE when set, otherwise the single env-configured site"""
+    if Config.SITES_FILE:
+        return load_sites(Path(Config.SITES_FILE))
+    return [SiteConfig.from_env()]
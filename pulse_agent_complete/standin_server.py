@@ -0,0 +1,365 @@
+"""
+Local stand-in for the Pulse push endpoint
+Accepts pushes (plain, chunked and/or gzip-encoded) and bulk pushes for local
+testing and benchmarks, optionally injecting latency, errors, connection resets
+and Retry-After responses
+
+Usage: python3 -m pulse_agent_complete.standin_server [--port 5151] [--error-rate 0.1]
+"""
+
+import argparse
+import json
+import logging
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+from .serializers import COLUMNAR_CONTENT_TYPE, from_columnar
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 65536
+BULK_PATH = "/push/bulk/"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler delegating to the owning StandinCollector"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY the body
+    # waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        """Handle a push request"""
+        collector = self.server.collector
+        status, body, headers = collector.handle(self)
+
+        if status is None:
+            self.reset()
+            return
+
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def reset(self):
+        """Abort the connection with a TCP reset instead of responding"""
+        self.close_connection = True
+        # SO_LINGER with a zero timeout makes close() send RST
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        self.connection.close()
+
+    def iter_body(self) -> Iterator[bytes]:
+        """Yield the raw request body, decoding chunked transfer encoding"""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size_line = self.rfile.readline().split(b";", 1)[0].strip()
+                size = int(size_line, 16)
+                if size == 0:
+                    # Consume optional trailers up to the terminating blank line
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                remaining = size
+                while remaining:
+                    data = self.rfile.read(min(remaining, READ_SIZE))
+                    if not data:
+                        return
+                    remaining -= len(data)
+                    yield data
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length", "0"))
+            while remaining:
+                data = self.rfile.read(min(remaining, READ_SIZE))
+                if not data:
+                    return
+                remaining -= len(data)
+                yield data
+
+    def log_message(self, format, *args):
+        """Route access logs through the logging module"""
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class Faults:
+    """
+    Faults injected into stand-in responses
+
+    Each request is delayed by latency_ms (plus up to jitter_ms) after its body
+    was read, then answered normally or, with the given probabilities, reset
+    without a response, answered with error_status, or answered with 429 and
+    a Retry-After header.
+    """
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0, error_status: int = 503,
+                 reset_rate: float = 0, retry_after_rate: float = 0,
+                 retry_after: int = 1, seed: Optional[int] = None):
+        """
+        Initialize faults
+
+        Args:
+            latency_ms: Delay before every response
+            jitter_ms: Additional random delay of up to this many milliseconds
+            error_rate: Probability of an error_status response
+            error_status: HTTP status of injected errors
+            reset_rate: Probability of resetting the connection instead of responding
+            retry_after_rate: Probability of a 429 response with Retry-After
+            retry_after: Retry-After value in seconds
+            seed: Random seed, for reproducible runs
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reset_rate = reset_rate
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def pick(self) -> Tuple[float, Optional[str]]:
+        """
+        Choose the delay and fault of one request
+
+        Returns:
+            Tuple of (delay in seconds, "reset", "error", "retry_after" or None)
+        """
+        with self._lock:
+            delay = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+            draw = self._random.random()
+
+        fault = None
+        if draw < self.reset_rate:
+            fault = "reset"
+        elif draw < self.reset_rate + self.error_rate:
+            fault = "error"
+        elif draw < self.reset_rate + self.error_rate + self.retry_after_rate:
+            fault = "retry_after"
+        return delay, fault
+
+
+class StandinCollector:
+    """
+    Local stand-in push server running on a background thread
+
+    Every request is recorded in `requests` with its headers, wire size,
+    decoded size, response status and injected fault. With
+    keep_payloads=False bodies are decoded and discarded chunk by chunk, so
+    the server itself uses bounded memory.
+
+    Bulk pushes to bulk_url are always parsed and answered with per-item
+    results; ack_filter decides which items are acknowledged.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, keep_payloads: bool = True,
+                 ack_filter: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                 faults: Optional[Faults] = None):
+        """
+        Initialize stand-in collector
+
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            keep_payloads: Parse and keep decoded JSON payloads
+            ack_filter: Returns False for bulk items to reject (all acknowledged by default)
+            faults: Faults to inject (none by default)
+        """
+        self.host = host
+        self.port = port
+        self.keep_payloads = keep_payloads
+        self.ack_filter = ack_filter
+        self.faults = faults
+        self.requests: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Push URL served by this collector"""
+        return f"http://{self.host}:{self.port}/push/"
+
+    @property
+    def bulk_url(self) -> str:
+        """Bulk push URL served by this collector"""
+        return f"http://{self.host}:{self.port}{BULK_PATH}"
+
+    def start(self):
+        """Start serving on a background thread"""
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.collector = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="standin-collector", daemon=True)
+        self._thread.start()
+        logger.info(f"Stand-in collector listening on {self.url}")
+
+    def stop(self):
+        """Stop serving"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        """Context manager entry"""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit"""
+        self.stop()
+
+    def handle(self, handler: _Handler) -> Tuple[Optional[int], Dict[str, Any], Dict[str, str]]:
+        """
+        Read and record one request
+
+        Returns:
+            Tuple of (HTTP status or None to reset the connection, JSON
+            response body, extra response headers)
+        """
+        record = {
+            "path": handler.path,
+            "received_at": time.time(),
+            "headers": dict(handler.headers),
+            "chunked": handler.headers.get("Transfer-Encoding", "").lower() == "chunked",
+            "wire_bytes": 0,
+            "decoded_bytes": 0,
+            "payload": None,
+            "status": None,
+            "fault": None
+        }
+
+        decompressor = None
+        if handler.headers.get("Content-Encoding", "").lower() == "gzip":
+            decompressor = zlib.decompressobj(31)
+
+        bulk = handler.path.startswith(BULK_PATH)
+        parts = [] if self.keep_payloads or bulk else None
+        for data in handler.iter_body():
+            record["wire_bytes"] += len(data)
+            for decoded in self._decompress(decompressor, data):
+                record["decoded_bytes"] += len(decoded)
+                if parts is not None:
+                    parts.append(decoded)
+
+        if decompressor:
+            tail = decompressor.flush()
+            record["decoded_bytes"] += len(tail)
+            if parts is not None:
+                parts.append(tail)
+
+        if parts is not None:
+            record["payload"] = self._decode(b"".join(parts), handler.headers.get("Content-Type", ""))
+
+        logger.info(f"Received push: {record['wire_bytes']} bytes on the wire, "
+                    f"{record['decoded_bytes']} decoded")
+
+        headers = {}
+        fault = None
+        if self.faults is not None:
+            delay, fault = self.faults.pick()
+            if delay:
+                time.sleep(delay)
+
+        if fault == "reset":
+            status, body = None, {}
+        elif fault == "error":
+            status, body = self.faults.error_status, {"status": "error", "error": "injected fault"}
+        elif fault == "retry_after":
+            status, body = 429, {"status": "error", "error": "rate limited"}
+            headers["Retry-After"] = str(self.faults.retry_after)
+        elif bulk:
+            status, body = self._bulk_results(record["payload"])
+        else:
+            status, body = 200, {"status": "ok"}
+
+        record["status"] = status
+        record["fault"] = fault
+        with self._lock:
+            self.requests.append(record)
+        return status, body, headers
+
+    def _bulk_results(self, envelope: Optional[Any]) -> Tuple[int, Dict[str, Any]]:
+        """Per-item results for a bulk envelope"""
+        if not isinstance(envelope, dict) or not isinstance(envelope.get("items"), list):
+            return 400, {"status": "error", "error": "expected {\"items\": [...]}"}
+
+        results = []
+        for item in envelope["items"]:
+            if self.ack_filter is None or self.ack_filter(item):
+                results.append({"uuid": item.get("uuid"), "status": "ok"})
+            else:
+                results.append({"uuid": item.get("uuid"), "status": "error", "error": "rejected"})
+        return 200, {"results": results}
+
+    @staticmethod
+    def _decompress(decompressor, data: bytes) -> Iterator[bytes]:
+        """Yield decompressed output in pieces of at most READ_SIZE bytes"""
+        if decompressor is None:
+            yield data
+            return
+        while data:
+            yield decompressor.decompress(data, READ_SIZE)
+            data = decompressor.unconsumed_tail
+
+    @staticmethod
+    def _decode(body: bytes, content_type: str) -> Optional[Any]:
+        """Decode a JSON or columnar JSON body"""
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            logger.warning("Stand-in collector received a non-JSON body")
+            return None
+        if content_type.startswith(COLUMNAR_CONTENT_TYPE):
+            payload = from_columnar(payload)
+        return payload
+
+
+def main() -> int:
+    """Run the stand-in collector in the foreground"""
+    parser = argparse.ArgumentParser(description="Local stand-in for the Pulse push endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5151)
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay before every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="additional random delay")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--reset-rate", type=float, default=0, help="fraction of connections reset")
+    parser.add_argument("--retry-after-rate", type=float, default=0,
+                        help="fraction of requests answered with 429 and Retry-After")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible faults")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status,
+                    args.reset_rate, args.retry_after_rate, args.retry_after, args.seed)
+    collector = StandinCollector(args.host, args.port, faults=faults)
+    collector.start()
+    try:
+        collector._thread.join()
+    except KeyboardInterrupt:
+        collector.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
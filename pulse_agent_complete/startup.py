@@ -0,0 +1,77 @@
+"""
+Start-up profiling for Pulse Agent
+Measures what importing the agent costs in a fresh interpreter, using the
+interpreter's own import timing (python -X importtime)
+"""
+
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List
+
+# Module imported by the entry point
+ENTRY_MODULE = "pulse_agent_complete.main"
+
+# Heavy collector and driver modules that must not be imported at start-up;
+# they are loaded when a query type, push or command needs them
+LAZY_MODULES = ("requests", "docker", "psutil", "psycopg2", "mysql", "dotenv", "ctypes",
+                "cProfile", "tracemalloc")
+
+# Documented cold-start budget for importing the entry point, in milliseconds
+STARTUP_BUDGET_MS = 150
+
+
+def profile_startup(top: int = 15) -> Dict[str, Any]:
+    """
+    Import the entry point in a fresh interpreter and report the cost
+
+    Args:
+        top: Number of most expensive modules to list
+
+    Returns:
+        Report with the interpreter wall time, the entry point's cumulative
+        import time, the most expensive modules by self time and any
+        LAZY_MODULES that were imported
+    """
+    check = f"import sys, {ENTRY_MODULE}; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", check],
+                            capture_output=True, text=True, env=os.environ.copy(), check=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    modules = _parse_importtime(result.stderr)
+    entry = next((module for module in modules if module["module"] == ENTRY_MODULE), None)
+    own = [module for module in modules if module["module"].split(".")[0] == ENTRY_MODULE.split(".")[0]]
+
+    return {
+        "python": sys.version.split()[0],
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(entry["cumulative_us"] / 1000, 1) if entry else None,
+        "budget_ms": STARTUP_BUDGET_MS,
+        "package_self_ms": round(sum(module["self_us"] for module in own) / 1000, 1),
+        "eager_heavy_modules": [name for name in result.stdout.strip().split(",") if name],
+        "slowest_modules": [
+            {"module": module["module"], "self_ms": round(module["self_us"] / 1000, 2),
+             "cumulative_ms": round(module["cumulative_us"] / 1000, 2)}
+            for module in sorted(modules, key=lambda module: module["self_us"], reverse=True)[:top]
+        ]
+    }
+
+
+def _parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """Parse `-X importtime` lines: 'import time: self | cumulative | name'"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # Header line
+            continue
+        modules.append({
+            "module": fields[2].strip(),
+            "self_us": int(fields[0]),
+            "cumulative_us": int(fields[1])
+        })
+    return modules
@@ -1,15 +1,25 @@
 """
 State management for Pulse Agent
 Handles file I/O, timestamps, UUIDs, and batch tracking
+
+State is loaded once and mutated in memory; commit() persists it once per
+cycle with write-temp + fsync + atomic rename, so a crash can never leave a
+truncated state file. An advisory lock keeps overlapping runs apart.
 """
 
 import json
 import logging
+import os
 import uuid
 from pathlib import Path
 from typing import Optional, Tuple
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,13 +34,24 @@ class StateManager:
             data_filepath: Path to state file
         """
         self.data_filepath = data_filepath
+        self.lock_filepath = data_filepath.with_name(data_filepath.name + ".lock")
+        self._state = None
+        self._dirty = False
+        self._lock_fd = None
         self._ensure_data_dir()
 
     def _ensure_data_dir(self):
         """Ensure data directory exists"""
         self.data_filepath.parent.mkdir(parents=True, exist_ok=True)
 
-    def read_state(self) -> dict:
+    @property
+    def state(self) -> dict:
+        """In-memory state, loaded from file on first access"""
+        if self._state is None:
+            self._state = self._load()
+        return self._state
+
+    def _load(self) -> dict:
         """Read state from file"""
         if not self.data_filepath.exists():
             return {}
@@ -45,45 +66,108 @@ class StateManager:
             logger.error(f"Failed to read state file: {e}")
             return {}
 
+    def read_state(self) -> dict:
+        """Get a copy of the current state"""
+        return dict(self.state)
+
+    def reload(self):
+        """Discard in-memory state and re-read the file"""
+        self._state = self._load()
+        self._dirty = False
+
     def write_state(self, state: dict):
-        """Write state to file"""
+        """Replace state and write it to file atomically"""
         try:
             self._ensure_data_dir()
-            with open(self.data_filepath, 'w') as f:
-                json.dump(state, f, indent=2)
+            tmp_path = self.data_filepath.with_name(self.data_filepath.name + ".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.data_filepath)
+            self._fsync_dir()
+            self._state = state
+            self._dirty = False
             logger.debug(f"State written to {self.data_filepath}")
         except Exception as e:
             logger.error(f"Failed to write state file: {e}")
             raise
 
+    def commit(self):
+        """Persist in-memory changes, if any"""
+        if self._dirty:
+            self.write_state(self.state)
+
+    def _set(self, key: str, value):
+        """Set a state key in memory"""
+        self.state[key] = value
+        self._dirty = True
+
+    def _fsync_dir(self):
+        """Flush the directory entry so the rename survives a crash"""
+        if os.name != "posix":
+            return
+        fd = os.open(self.data_filepath.parent, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def acquire_lock(self) -> bool:
+        """
+        Take the advisory state lock without blocking
+
+        Returns:
+            True if the lock is held, False if another run holds it
+        """
+        if self._lock_fd is not None:
+            return True
+        if fcntl is None:
+            logger.debug("Advisory file locking not available on this platform")
+            return True
+
+        fd = os.open(self.lock_filepath, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        self._lock_fd = fd
+        # Another run may have committed while we waited for the lock
+        self.reload()
+        return True
+
+    def release_lock(self):
+        """Release the advisory state lock"""
+        if self._lock_fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        os.close(self._lock_fd)
+        self._lock_fd = None
+
     def get_batch_index(self) -> int:
         """Get current batch index"""
-        state = self.read_state()
-        return state.get("batch_index", 0)
+        return self.state.get("batch_index", 0)
 
     def update_batch_index(self, batch_index: int):
         """Update batch index in state"""
-        state = self.read_state()
-        state["batch_index"] = batch_index
-        self.write_state(state)
+        self._set("batch_index", batch_index)
 
     def get_last_successful_timestamp(self) -> Optional[str]:
         """Get last successful timestamp"""
-        state = self.read_state()
-        return state.get("last_successful_timestamp")
+        return self.state.get("last_successful_timestamp")
 
     def save_successful_timestamp(self, timestamp: str):
         """Save successful timestamp and clear failed UUID"""
-        state = self.read_state()
-        state["last_successful_timestamp"] = timestamp
+        self._set("last_successful_timestamp", timestamp)
         # Remove failed UUID if it exists
-        if "last_failed_uuid" in state:
-            del state["last_failed_uuid"]
-        self.write_state(state)
+        self.state.pop("last_failed_uuid", None)
 
     def get_or_generate_push_uuid(self) -> str:
         """Get failed UUID if exists, otherwise generate new UUID"""
-        state = self.read_state()
+        state = self.state
         if "last_failed_uuid" in state:
             uuid_str = state["last_failed_uuid"]
             logger.info(f"Reusing failed UUID: {uuid_str}")
@@ -95,9 +179,31 @@ class StateManager:
 
     def save_failed_push_uuid(self, uuid_str: str):
         """Save failed push UUID for retry"""
-        state = self.read_state()
-        state["last_failed_uuid"] = uuid_str
-        self.write_state(state)
+        self._set("last_failed_uuid", uuid_str)
+
+    def get_query_schedule(self) -> dict:
+        """Get per-query scheduling state (last runs and carried-forward values)"""
+        return self.state.get("query_schedule", {})
+
+    def save_query_schedule(self, schedule: dict):
+        """Save per-query scheduling state"""
+        self._set("query_schedule", schedule)
+
+    def get_keyset_marks(self) -> dict:
+        """Get the high-water marks of keyset queries"""
+        return self.state.get("keyset_marks", {})
+
+    def save_keyset_marks(self, marks: dict):
+        """Save the high-water marks of keyset queries"""
+        self._set("keyset_marks", marks)
+
+    def get_host_facts(self) -> dict:
+        """Get the cached host facts and the hash of the facts last pushed"""
+        return self.state.get("host_facts", {})
+
+    def save_host_facts(self, entry: dict):
+        """Save the cached host facts"""
+        self._set("host_facts", entry)
 
     def get_start_end_times(self) -> Tuple[str, str]:
         """
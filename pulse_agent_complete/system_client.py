@@ -3,13 +3,64 @@ System metrics client for Pulse Agent
 Collects system, memory, disk, process, and service metrics
 """
 
+import hashlib
+import json
 import logging
 import platform
-from typing import Dict, Any, List
-from datetime import datetime
+import time
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
+# Changes on every boot; Linux only
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+
+# Facts in system_metrics.system, left out of pushes while unchanged
+# (PA_SEND_HOST_FACTS=changed)
+HOST_FACT_FIELDS = ("hostname", "cpu_count", "os_version")
+
+
+def read_boot_id() -> Optional[str]:
+    """The kernel's boot id, or None where there is none"""
+    try:
+        with open(BOOT_ID_PATH) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def facts_hash(facts: Dict[str, Any]) -> str:
+    """Short hash identifying a set of host facts"""
+    return hashlib.sha256(json.dumps(facts, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def cached_host_facts(entry: Dict[str, Any], ttl: float) -> Optional[Dict[str, Any]]:
+    """
+    Host facts from a state entry, if still valid
+
+    The entry is valid on the same boot and hostname within ttl seconds of
+    being computed. Without a boot id (not Linux) nothing is cached, since a
+    reboot could not be told apart.
+
+    Args:
+        entry: Stored entry ({"facts", "boot_id", "computed_at", ...})
+        ttl: Seconds the facts are kept (0 = not cached)
+
+    Returns:
+        The facts, or None when they must be computed again
+    """
+    facts = entry.get("facts")
+    if not facts or ttl <= 0:
+        return None
+    boot_id = read_boot_id()
+    if boot_id is None or entry.get("boot_id") != boot_id:
+        return None
+    if facts.get("hostname") != platform.node():
+        return None
+    if not 0 <= time.time() - entry.get("computed_at", 0) < ttl:
+        return None
+    return facts
+
 
 class SystemClient:
     """System metrics client for collecting local system information"""
@@ -33,25 +84,44 @@ class SystemClient:
         """Check if psutil is available"""
         return self.psutil is not None
 
-    def get_system_info(self) -> Dict[str, Any]:
+    def get_host_facts(self) -> Dict[str, Any]:
+        """
+        Host facts that only change with a reboot, a rename or an OS upgrade
+
+        Returns:
+            Dictionary with hostname, os_version, cpu_count and boot_time
+        """
+        # Build os_version string
+        os_version = f"{platform.system()} {platform.release()}"
+        try:
+            # Try to get more detailed version info on Linux
+            import distro
+            os_version = f"{distro.name()} {distro.version()}"
+        except ImportError:
+            pass
+
+        return {
+            "hostname": platform.node(),
+            "os_version": os_version,
+            "cpu_count": self.psutil.cpu_count(logical=True),
+            "boot_time": int(self.psutil.boot_time())
+        }
+
+    def get_system_info(self, facts: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Get system information (OS, CPU, uptime, etc.)
 
+        Args:
+            facts: Cached host facts (computed if omitted)
+
         Returns:
-            Dictionary with system information
+            Dictionary with system information and the hash of its host facts
         """
         if not self.is_available():
             return {}
 
         try:
-            boot_time = datetime.fromtimestamp(self.psutil.boot_time())
-            uptime_seconds = (datetime.now() - boot_time).total_seconds()
-
-            cpu_count = self.psutil.cpu_count(logical=False)
-            cpu_count_logical = self.psutil.cpu_count(logical=True)
-
-            # Get CPU usage
-            cpu_percent = self.psutil.cpu_percent(interval=0.1)
+            facts = facts or self.get_host_facts()
 
             # Get load average (Unix-like systems)
             load_avg = [0.0, 0.0, 0.0]
@@ -60,21 +130,13 @@ class SystemClient:
             except (AttributeError, OSError):
                 pass  # Not available on Windows
 
-            # Build os_version string
-            os_version = f"{platform.system()} {platform.release()}"
-            try:
-                # Try to get more detailed version info on Linux
-                import distro
-                os_version = f"{distro.name()} {distro.version()}"
-            except ImportError:
-                pass
-
             return {
-                "hostname": platform.node(),
-                "cpu_count": cpu_count_logical,
+                "hostname": facts["hostname"],
+                "cpu_count": facts["cpu_count"],
                 "load_average_1min": round(load_avg[0], 2) if len(load_avg) > 0 else 0,
-                "uptime_seconds": int(uptime_seconds),
-                "os_version": os_version
+                "uptime_seconds": int(time.time() - facts["boot_time"]),
+                "os_version": facts["os_version"],
+                "facts_hash": facts_hash(facts)
             }
         except Exception as e:
             logger.error(f"Failed to get system info: {e}")
@@ -232,12 +294,16 @@ class SystemClient:
 
         return service_info
 
-    def get_all_metrics(self) -> Dict[str, Any]:
+    def get_all_metrics(self, facts: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Get all system metrics in one call
 
+        Args:
+            facts: Cached host facts (computed if omitted)
+
         Returns:
-            Dictionary with all system metrics
+            Dictionary with all system metrics, plus "facts" with the host
+            facts used, for the caller to cache
         """
         if not self.is_available():
             logger.warning("psutil not available, returning empty metrics")
@@ -262,9 +328,18 @@ class SystemClient:
                 }
             }
 
-        return {
-            "system": self.get_system_info(),
+        if facts is None:
+            try:
+                facts = self.get_host_facts()
+            except Exception as e:
+                logger.error(f"Failed to get host facts: {e}")
+
+        metrics = {
+            "system": self.get_system_info(facts),
             "memory": self.get_memory_info(),
             "disks": self.get_disk_info(),
             "services": self.get_service_info()
         }
+        if facts:
+            metrics["facts"] = facts
+        return metrics
@@ -0,0 +1,327 @@
+"""
+Trigger rules for Pulse Agent
+Evaluates the "triggers" section of queries.json on a short sampler tick
+between long-running cycles (PA_TRIGGER_TICK) and starts an immediate cycle,
+an out-of-band push, for a site whose rule fires
+
+A tick only runs the queries the rules reference (feed queries are read from
+the change feed) and lists container health in one Docker request, so an
+alert arrives within a tick instead of a cycle interval without collecting
+more often.
+"""
+
+import fnmatch
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from .aggregator import DEFAULT_SOURCE, DataAggregator
+from .db_client import QueryLoader
+from .docker_client import DockerClient
+from .isolation import get_collector_pool
+from .sites import SiteConfig
+
+logger = logging.getLogger(__name__)
+
+# Query types a metric rule can sample
+SAMPLED_TYPES = ("count", "single_value")
+
+# Container conditions a containers rule watches for
+CONTAINER_CONDITIONS = ("unhealthy", "stopped")
+
+DEFAULT_WINDOW_SECONDS = 300
+DEFAULT_COOLDOWN_SECONDS = 300
+
+# Window of the per-site push rate limit, in seconds
+PUSH_LIMIT_WINDOW = 3600
+
+
+def validate_triggers(config: Any, queries: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Validate the "triggers" section of queries.json
+
+    Args:
+        config: Rule name -> rule definition
+        queries: The file's queries
+
+    Returns:
+        The section unchanged
+
+    Raises:
+        ValueError: If a rule is invalid
+    """
+    if not isinstance(config, dict):
+        raise ValueError("\"triggers\" must be an object")
+    for name, rule in config.items():
+        TriggerRule(name, rule, queries)
+    return config
+
+
+class TriggerRule:
+    """
+    One trigger rule and its evaluation state
+
+    Kinds:
+        {"metric": m, "above": x} or {"metric": m, "below": x}
+            the value of count or single_value query m crosses x
+        {"metric": m, "rise_above": x, "within_seconds": s}
+            m rises by more than x within s seconds
+        {"containers": "unhealthy" | "stopped", "match": "api-*"}
+            a container (optionally matching a glob) turns unhealthy or stops
+
+    Queries with %(start_time)s and %(end_time)s are sampled over the last
+    window_seconds. Rules fire on a transition: a condition must hold for
+    for_seconds (0 = on the first tick it holds), and a rule that fired stays
+    quiet until its condition clears and cooldown_seconds have passed. A
+    condition already true on the first tick is taken as the baseline and
+    does not fire.
+    """
+
+    def __init__(self, name: str, config: Dict[str, Any], queries: Dict[str, Dict[str, Any]]):
+        """
+        Validate and initialize a rule
+
+        Args:
+            name: Rule name
+            config: Rule definition from queries.json
+            queries: The file's queries, to check the metric
+
+        Raises:
+            ValueError: If the definition is invalid
+        """
+        if not isinstance(config, dict):
+            raise ValueError(f"Trigger '{name}' must be an object")
+        kinds = [kind for kind in ("above", "below", "rise_above", "containers") if kind in config]
+        if len(kinds) != 1:
+            raise ValueError(f"Trigger '{name}' needs exactly one of above, below, rise_above or containers")
+        self.name = name
+        self.kind = kinds[0]
+        self.for_seconds = _seconds(name, config, "for_seconds", 0)
+        self.cooldown_seconds = _seconds(name, config, "cooldown_seconds", DEFAULT_COOLDOWN_SECONDS)
+        self.window_seconds = _seconds(name, config, "window_seconds", DEFAULT_WINDOW_SECONDS)
+        self.within_seconds = _seconds(name, config, "within_seconds", DEFAULT_WINDOW_SECONDS)
+
+        if self.kind == "containers":
+            self.metric = None
+            self.condition = config["containers"]
+            if self.condition not in CONTAINER_CONDITIONS:
+                raise ValueError(f"Trigger '{name}' watches containers for one of "
+                                 f"{', '.join(CONTAINER_CONDITIONS)}")
+            self.match = config.get("match", "*")
+            if not isinstance(self.match, str):
+                raise ValueError(f"Trigger '{name}' has an invalid match")
+        else:
+            self.metric = config.get("metric")
+            query = queries.get(self.metric) if isinstance(self.metric, str) else None
+            if not isinstance(query, dict) or query.get("type", "count") not in SAMPLED_TYPES:
+                raise ValueError(f"Trigger '{name}' needs a \"metric\" naming a count or single_value query")
+            self.threshold = config[self.kind]
+            if isinstance(self.threshold, bool) or not isinstance(self.threshold, (int, float)):
+                raise ValueError(f"Trigger '{name}' needs a number for {self.kind}")
+
+        # Evaluation state
+        self._baseline = True
+        self._armed = True
+        self._since: Optional[float] = None
+        self._fired_at: Optional[float] = None
+        self._values: deque = deque()
+        # containers rule: name -> first tick seen in the condition; alerted names
+        self._bad_since: Dict[str, float] = {}
+        self._alerted: set = set()
+
+    @property
+    def sample_key(self) -> Optional[Tuple[str, float]]:
+        """(metric, window) this rule reads from a sample, or None for a containers rule"""
+        return (self.metric, self.window_seconds) if self.metric else None
+
+    def evaluate(self, sample: Dict[str, Any], now: float) -> Optional[Dict[str, Any]]:
+        """
+        Evaluate the rule on one tick's sample
+
+        Args:
+            sample: {"metrics": {(metric, window): value}, "containers": {name: {...}} or None}
+            now: time.monotonic() of the tick
+
+        Returns:
+            What fired (rule name and details), or None
+        """
+        if self.kind == "containers":
+            return self._evaluate_containers(sample.get("containers"), now)
+
+        value = sample["metrics"].get(self.sample_key)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            # Not sampled this tick; keep the state as it is
+            return None
+        detail = {"rule": self.name, "metric": self.metric, "value": value, self.kind: self.threshold}
+        if self.kind == "above":
+            holds = value > self.threshold
+        elif self.kind == "below":
+            holds = value < self.threshold
+        else:
+            self._values.append((now, value))
+            while self._values[0][0] < now - self.within_seconds:
+                self._values.popleft()
+            low = min(previous for _, previous in self._values)
+            holds = len(self._values) > 1 and value - low > self.threshold
+            detail.update(rise=value - low, within_seconds=self.within_seconds)
+
+        baseline, self._baseline = self._baseline, False
+        if not holds:
+            self._since = None
+            self._armed = True
+            return None
+        if baseline:
+            self._armed = False
+        if self._since is None:
+            self._since = now
+        if not self._armed or now - self._since < self.for_seconds or self._cooling(now):
+            return None
+        self._armed = False
+        self._fired_at = now
+        return detail
+
+    def _evaluate_containers(self, containers: Optional[Dict[str, Dict[str, str]]],
+                             now: float) -> Optional[Dict[str, Any]]:
+        """Fire for containers that entered the condition since they were last alerted"""
+        if containers is None:
+            return None
+        bad = {name for name, info in containers.items()
+               if fnmatch.fnmatchcase(name, self.match) and self._in_condition(info)}
+        for name in set(self._bad_since) - bad:
+            del self._bad_since[name]
+        self._alerted &= bad
+        for name in bad:
+            self._bad_since.setdefault(name, now)
+
+        baseline, self._baseline = self._baseline, False
+        if baseline:
+            self._alerted = set(bad)
+            return None
+        due = sorted(name for name in bad - self._alerted if now - self._bad_since[name] >= self.for_seconds)
+        if not due or self._cooling(now):
+            return None
+        self._alerted.update(due)
+        self._fired_at = now
+        return {"rule": self.name, "containers": due, "condition": self.condition}
+
+    def _in_condition(self, info: Dict[str, str]) -> bool:
+        """Whether a container is in the watched condition"""
+        if self.condition == "unhealthy":
+            return info.get("health") == "unhealthy"
+        return info.get("state") != "running"
+
+    def _cooling(self, now: float) -> bool:
+        """Whether the rule fired less than cooldown_seconds ago"""
+        return self._fired_at is not None and now - self._fired_at < self.cooldown_seconds
+
+
+class TriggerSampler:
+    """
+    Samples what one site's trigger rules read and evaluates them
+
+    The sampler keeps its own database connections open between ticks, with
+    no transaction left open after a sample, and creates the Docker client on the first tick with a containers rule.
+    Fired rules are limited to max_pushes per site per hour; a rule that
+    fires over the limit is logged and counts as fired for its cooldown.
+    """
+
+    def __init__(self, site: SiteConfig, query_loader: QueryLoader, max_pushes: int = 6):
+        """
+        Initialize trigger sampler
+
+        Args:
+            site: Site whose rules are evaluated
+            query_loader: Loaded queries of the site, with its "triggers" section
+            max_pushes: Out-of-band pushes allowed per hour (0 = no limit)
+        """
+        self.site = site
+        self.query_loader = query_loader
+        self.max_pushes = max_pushes
+        self.rules: List[TriggerRule] = []
+        self._db_clients = None
+        self._docker_client = None
+        self._pushes: deque = deque()
+        self.reload()
+
+    def reload(self):
+        """Rebuild the rules from the query loader; their state starts over from a new baseline"""
+        # The rules' data sources may have changed; clients are rebuilt on the next sample
+        self.close()
+        queries = self.query_loader.get_all_queries()
+        self.rules = [TriggerRule(name, config, queries)
+                      for name, config in self.query_loader.get_triggers().items()]
+
+    def tick(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Sample and evaluate every rule
+
+        Returns:
+            The rules that fired, empty when none did or the push limit is reached
+        """
+        now = time.monotonic() if now is None else now
+        sample = self.sample()
+        fired = [detail for detail in (rule.evaluate(sample, now) for rule in self.rules) if detail]
+        if not fired:
+            return []
+
+        while self._pushes and self._pushes[0] <= now - PUSH_LIMIT_WINDOW:
+            self._pushes.popleft()
+        if self.max_pushes and len(self._pushes) >= self.max_pushes:
+            logger.warning(f"[{self.site.name}] Triggers {', '.join(d['rule'] for d in fired)} fired, but "
+                           f"{self.max_pushes} out-of-band pushes were already sent this hour")
+            return []
+        self._pushes.append(now)
+        return fired
+
+    def sample(self) -> Dict[str, Any]:
+        """Values of the rules' metrics and, if a rule needs it, container health"""
+        keys = {rule.sample_key for rule in self.rules if rule.sample_key}
+        metrics = {}
+        if keys:
+            if self._db_clients is None:
+                sources = {self.query_loader.get_query(metric).get("source", DEFAULT_SOURCE)
+                           for metric, _ in keys}
+                self._db_clients = self.site.build_db_clients(sources)
+            aggregator = DataAggregator(self._db_clients.get(DEFAULT_SOURCE), self.query_loader,
+                                        sources=self._db_clients, change_feed=self.site.change_feed)
+            end = datetime.now(timezone.utc)
+            for window in sorted({window for _, window in keys}):
+                names = sorted({metric for metric, metric_window in keys if metric_window == window})
+                values = aggregator.sample(names, {"start_time": _timestamp(end - timedelta(seconds=window)),
+                                                   "end_time": _timestamp(end)})
+                metrics.update({(name, window): value for name, value in values.items()})
+
+        containers = None
+        if any(rule.kind == "containers" for rule in self.rules):
+            try:
+                pool = get_collector_pool()
+                if pool is not None and "docker" in pool.kinds:
+                    containers = pool.collect("docker", "get_container_health")
+                else:
+                    if self._docker_client is None:
+                        self._docker_client = DockerClient()
+                    containers = self._docker_client.get_container_health()
+            except Exception as e:
+                logger.warning(f"[{self.site.name}] Trigger sample of container health failed: {e}")
+        return {"metrics": metrics, "containers": containers}
+
+    def close(self):
+        """Close the sampler's database connections"""
+        for db_client in (self._db_clients or {}).values():
+            db_client.disconnect()
+        self._db_clients = None
+
+
+def _seconds(name: str, config: Dict[str, Any], key: str, default: float) -> float:
+    """A non-negative number of seconds from a rule, or its default"""
+    value = config.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"Trigger '{name}' has an invalid {key}")
+    return value
+
+
+def _timestamp(moment: datetime) -> str:
+    """ISO 8601 UTC timestamp in the agent's query parameter format"""
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
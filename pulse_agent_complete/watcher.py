@@ -0,0 +1,163 @@
+"""
+File watcher for Pulse Agent
+Notices changes to a single file using inotify where available (Linux) and
+falls back to polling its modification time elsewhere
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+# Quiet period after the last event before the callback runs, so an editor's
+# write-then-rename settles into a single notification
+SETTLE_SECONDS = 0.2
+
+
+def _load_inotify():
+    """Load libc inotify functions, or None when unavailable"""
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """
+    Calls a callback from a background thread whenever a file changes
+
+    The file's directory is watched rather than the file itself, so changes
+    made by replacing the file (write to a temp file, then rename) are seen.
+    """
+
+    def __init__(self, path: Path, callback: Callable[[], None], poll_interval: float = 2.0):
+        """
+        Initialize file watcher
+
+        Args:
+            path: File to watch
+            callback: Called after the file changed
+            poll_interval: Seconds between checks when polling
+        """
+        self.path = Path(path)
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.mode = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+
+    def start(self):
+        """Start watching on a background thread"""
+        self._fd = self._open_inotify()
+        self.mode = "inotify" if self._fd is not None else "poll"
+        target = self._watch_inotify if self._fd is not None else self._watch_poll
+        self._thread = threading.Thread(target=target, name="file-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.path} for changes ({self.mode})")
+
+    def stop(self):
+        """Stop watching"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _open_inotify(self) -> Optional[int]:
+        """Create an inotify watch on the file's directory"""
+        libc = _load_inotify()
+        if libc is None:
+            return None
+
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.debug(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+            return None
+        directory = str(self.path.parent.resolve()).encode()
+        if libc.inotify_add_watch(fd, directory, WATCH_MASK) < 0:
+            logger.debug(f"inotify_add_watch failed: {os.strerror(ctypes.get_errno())}")
+            os.close(fd)
+            return None
+        return fd
+
+    def _watch_inotify(self):
+        """Wait for inotify events naming the watched file"""
+        name = self.path.name.encode()
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._fd], [], [], self.poll_interval)
+            if not readable or not self._read_events(name):
+                continue
+
+            # Let a burst of events settle before reporting once
+            while select.select([self._fd], [], [], SETTLE_SECONDS)[0]:
+                self._read_events(name)
+            self._notify()
+
+    def _read_events(self, name: bytes) -> bool:
+        """Drain pending inotify events, returning True if any names the file"""
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return False
+
+        matched = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            event_name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if event_name == name:
+                matched = True
+        return matched
+
+    def _watch_poll(self):
+        """Compare the file's modification time and size periodically"""
+        last = self._signature()
+        while not self._stop.wait(self.poll_interval):
+            current = self._signature()
+            if current != last:
+                last = current
+                self._notify()
+
+    def _signature(self):
+        """Modification time and size of the file, or None when missing"""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _notify(self):
+        """Run the callback, keeping the watcher alive if it fails"""
+        try:
+            self.callback()
+        except Exception as e:
+            logger.error(f"File change handler for {self.path} failed: {e}", exc_info=True)